@@ -1,18 +1,43 @@
+import importlib
 import sys
 
-if sys.version_info[:2] >= (3, 8):
-    # TODO: Import directly (no need for conditional) when `python_requires = >= 3.8`
-    from importlib.metadata import PackageNotFoundError, version  # pragma: no cover
-else:
-    from importlib_metadata import PackageNotFoundError, version  # pragma: no cover
-
-try:
-    # Change here if project is renamed and does not equal the package name
-    dist_name = "moon-clock"
-    __version__ = version(dist_name)
-except PackageNotFoundError:  # pragma: no cover
-    __version__ = "unknown"
-finally:
-    del version, PackageNotFoundError
-
-from .clock import MoonClock
+# Everything is imported on first use (PEP 562): ``import moon_clock`` must
+# stay cheap for the CLI and for applications that only need part of it.
+# Pillow, NumPy, geopy and timezonefinder load with the modules using them.
+
+_LAZY = {
+    "MoonClock": "moon_clock.clock",
+    "MoonClockRenderer": "moon_clock.renderer",
+}
+
+__all__ = ["MoonClock", "MoonClockRenderer", "__version__"]
+
+
+def _version() -> str:
+    if sys.version_info[:2] >= (3, 8):
+        # TODO: Import directly (no need for conditional) when `python_requires = >= 3.8`
+        from importlib.metadata import PackageNotFoundError, version  # pragma: no cover
+    else:
+        from importlib_metadata import PackageNotFoundError, version  # pragma: no cover
+
+    try:
+        # Change here if project is renamed and does not equal the package name
+        dist_name = "moon-clock"
+        return version(dist_name)
+    except PackageNotFoundError:  # pragma: no cover
+        return "unknown"
+
+
+def __getattr__(name: str):
+    if name == "__version__":
+        value = _version()
+    elif name in _LAZY:
+        value = getattr(importlib.import_module(_LAZY[name]), name)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,274 @@
+"""
+suncalc's formulas, vectorized with NumPy.
+
+Every function takes arrays (or scalars) of POSIX timestamps and
+latitudes/longitudes in degrees, broadcast against each other, and
+returns arrays. Times in the results are POSIX timestamps too; NaN where
+there is no such event (e.g. no sunrise in a polar night).
+
+The results agree with suncalcPy called with the same instants as
+machine local naive datetimes, which is how suncalc reads its input:
+
+import numpy as np
+from moon_clock import astronomy
+ts = np.arange(start, end, 60.0)
+illumination = astronomy.moon_illumination(ts)
+times = astronomy.sun_times(ts, -33.87, 151.21)
+"""
+
+import datetime
+from typing import NamedTuple
+
+import numpy as np
+
+
+RAD = np.pi / 180.0
+DAY = 24 * 60 * 60
+J1970 = 2440588
+J2000 = 2451545
+J0 = 0.0009
+E = RAD * 23.4397  # obliquity of the Earth
+SUN_DISTANCE = 149598000  # km
+
+SUNRISE_ANGLE = -0.833  # degrees, sunrise/sunset as in suncalc.getTimes()
+MOON_ANGLE = 0.133  # degrees, moonrise/moonset as in suncalc.getMoonTimes()
+
+
+class SunPosition(NamedTuple):
+    azimuth: np.ndarray
+    altitude: np.ndarray
+
+
+class MoonPosition(NamedTuple):
+    azimuth: np.ndarray
+    altitude: np.ndarray
+    distance: np.ndarray
+
+
+class MoonIllumination(NamedTuple):
+    fraction: np.ndarray
+    phase: np.ndarray
+    angle: np.ndarray
+
+
+class SunTimes(NamedTuple):
+    rise: np.ndarray
+    set: np.ndarray
+    noon: np.ndarray
+
+
+class MoonTimes(NamedTuple):
+    rise: np.ndarray
+    set: np.ndarray
+
+
+def timestamps(values) -> np.ndarray:
+    """
+    POSIX timestamps from timestamps, ``datetime64`` values or
+    (timezone aware) datetimes.
+    """
+    if isinstance(values, datetime.datetime):
+        return np.float64(values.timestamp())
+    array = np.asarray(values)
+    if np.issubdtype(array.dtype, np.datetime64):
+        return array.astype("datetime64[us]").astype(np.int64) / 1e6
+    if array.dtype == object:
+        return np.vectorize(lambda value: value.timestamp(), otypes=[np.float64])(array)
+    return array.astype(np.float64)
+
+
+def to_days(ts) -> np.ndarray:
+    return np.asarray(ts, dtype=np.float64) / DAY - 0.5 + J1970 - J2000
+
+
+def from_days(d) -> np.ndarray:
+    return (np.asarray(d) + J2000 + 0.5 - J1970) * DAY
+
+
+def _right_ascension(l, b):
+    return np.arctan2(np.sin(l) * np.cos(E) - np.tan(b) * np.sin(E), np.cos(l))
+
+
+def _declination(l, b):
+    return np.arcsin(np.sin(b) * np.cos(E) + np.cos(b) * np.sin(E) * np.sin(l))
+
+
+def _azimuth(H, phi, dec):
+    return np.arctan2(np.sin(H), np.cos(H) * np.sin(phi) - np.tan(dec) * np.cos(phi))
+
+
+def _altitude(H, phi, dec):
+    return np.arcsin(np.sin(phi) * np.sin(dec) + np.cos(phi) * np.cos(dec) * np.cos(H))
+
+
+def _sidereal_time(d, lw):
+    return RAD * (280.16 + 360.9856235 * d) - lw
+
+
+def _solar_mean_anomaly(d):
+    return RAD * (357.5291 + 0.98560028 * d)
+
+
+def _ecliptic_longitude(M):
+    C = RAD * (1.9148 * np.sin(M) + 0.02 * np.sin(2 * M) + 0.0003 * np.sin(3 * M))  # equation of center
+    P = RAD * 102.9372  # perihelion of the Earth
+    return M + C + P + np.pi
+
+
+def _sun_coords(d):
+    L = _ecliptic_longitude(_solar_mean_anomaly(d))
+    return _declination(L, 0), _right_ascension(L, 0)
+
+
+def _moon_coords(d):
+    L = RAD * (218.316 + 13.176396 * d)
+    M = RAD * (134.963 + 13.064993 * d)
+    F = RAD * (93.272 + 13.229350 * d)
+
+    l = L + RAD * 6.289 * np.sin(M)  # noqa: E741
+    b = RAD * 5.128 * np.sin(F)
+    dist = 385001 - 20905 * np.cos(M)
+
+    return _declination(l, b), _right_ascension(l, b), dist
+
+
+def sun_position(ts, latitude, longitude) -> SunPosition:
+    lw = RAD * -np.asarray(longitude, dtype=np.float64)
+    phi = RAD * np.asarray(latitude, dtype=np.float64)
+    d = to_days(ts)
+
+    dec, ra = _sun_coords(d)
+    H = _sidereal_time(d, lw) - ra
+    return SunPosition(_azimuth(H, phi, dec), _altitude(H, phi, dec))
+
+
+def moon_position(ts, latitude, longitude) -> MoonPosition:
+    lw = RAD * -np.asarray(longitude, dtype=np.float64)
+    phi = RAD * np.asarray(latitude, dtype=np.float64)
+    d = to_days(ts)
+
+    dec, ra, dist = _moon_coords(d)
+    H = _sidereal_time(d, lw) - ra
+    h = _altitude(H, phi, dec)
+    # altitude correction for refraction
+    h = h + RAD * 0.017 / np.tan(h + RAD * 10.26 / (h + RAD * 5.10))
+
+    return MoonPosition(_azimuth(H, phi, dec), h, dist)
+
+
+def moon_illumination(ts) -> MoonIllumination:
+    """
+    ``phase``: 0 new moon, 0.25 first quarter, 0.5 full, 0.75 last quarter.
+    """
+    d = to_days(ts)
+    s_dec, s_ra = _sun_coords(d)
+    m_dec, m_ra, m_dist = _moon_coords(d)
+
+    phi = np.arccos(
+        np.clip(np.sin(s_dec) * np.sin(m_dec) + np.cos(s_dec) * np.cos(m_dec) * np.cos(s_ra - m_ra), -1.0, 1.0)
+    )
+    inc = np.arctan2(SUN_DISTANCE * np.sin(phi), m_dist - SUN_DISTANCE * np.cos(phi))
+    angle = np.arctan2(
+        np.cos(s_dec) * np.sin(s_ra - m_ra),
+        np.sin(s_dec) * np.cos(m_dec) - np.cos(s_dec) * np.sin(m_dec) * np.cos(s_ra - m_ra),
+    )
+
+    return MoonIllumination(
+        (1 + np.cos(inc)) / 2,
+        0.5 + 0.5 * inc * np.where(angle < 0, -1.0, 1.0) / np.pi,
+        angle,
+    )
+
+
+def solar_cycle(ts, longitude) -> np.ndarray:
+    """
+    Number of the solar transit nearest to ``ts``, the day
+    suncalc.getTimes() reports on.
+    """
+    lw = RAD * -np.asarray(longitude, dtype=np.float64)
+    return np.round(to_days(ts) - J0 - lw / (2 * np.pi))
+
+
+def sun_times(ts, latitude, longitude, angle: float = SUNRISE_ANGLE) -> SunTimes:
+    """
+    Sunrise, sunset (the sun's upper limb at ``angle`` degrees) and solar
+    noon of the solar day nearest to ``ts``.
+    """
+    lw = RAD * -np.asarray(longitude, dtype=np.float64)
+    phi = RAD * np.asarray(latitude, dtype=np.float64)
+
+    n = solar_cycle(ts, longitude)
+    ds = J0 + lw / (2 * np.pi) + n
+
+    M = _solar_mean_anomaly(ds)
+    L = _ecliptic_longitude(M)
+    dec = _declination(L, 0)
+
+    def transit(d):
+        return d + 0.0053 * np.sin(M) - 0.0069 * np.sin(2 * L)
+
+    noon = transit(ds)
+    with np.errstate(invalid="ignore"):
+        # NaN if the sun does not reach the angle that day
+        w = np.arccos((np.sin(angle * RAD) - np.sin(phi) * np.sin(dec)) / (np.cos(phi) * np.cos(dec)))
+    set_ = transit(J0 + (w + lw) / (2 * np.pi) + n)
+    rise = noon - (set_ - noon)
+
+    return SunTimes(from_days(rise), from_days(set_), from_days(noon))
+
+
+def moon_times(start, latitude, longitude) -> MoonTimes:
+    """
+    The first moonrise and moonset within 24 hours from ``start``
+    (normally local midnight), found like suncalc.getMoonTimes(): fit a
+    parabola to the moon's altitude over each 2 hour step.
+    """
+    start, latitude, longitude = np.broadcast_arrays(
+        np.asarray(start, dtype=np.float64),
+        np.asarray(latitude, dtype=np.float64),
+        np.asarray(longitude, dtype=np.float64),
+    )
+    hc = MOON_ANGLE * RAD
+
+    def altitude(hours):
+        return moon_position(start + hours * 3600.0, latitude, longitude).altitude - hc
+
+    rise = np.zeros(start.shape)
+    set_ = np.zeros(start.shape)
+    done = np.zeros(start.shape, dtype=bool)
+
+    h0 = altitude(0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for i in range(1, 24, 2):
+            h1 = altitude(i)
+            h2 = altitude(i + 1)
+
+            a = (h0 + h2) / 2 - h1
+            b = (h2 - h0) / 2
+            xe = -b / (2 * a)
+            ye = (a * xe + b) * xe + h1
+            d = b * b - 4 * a * h1
+
+            dx = np.sqrt(d) / (np.abs(a) * 2)
+            x1 = xe - dx
+            x2 = xe + dx
+            real = d >= 0
+            roots = (real & (np.abs(x1) <= 1)).astype(int) + (real & (np.abs(x2) <= 1)).astype(int)
+            x1 = np.where(real & (x1 < -1), x2, x1)
+
+            one = ~done & (roots == 1)
+            two = ~done & (roots == 2)
+            rise = np.where(one & (h0 < 0), i + x1, rise)
+            set_ = np.where(one & (h0 >= 0), i + x1, set_)
+            rise = np.where(two, i + np.where(ye < 0, x2, x1), rise)
+            set_ = np.where(two, i + np.where(ye < 0, x1, x2), set_)
+
+            done |= (rise != 0) & (set_ != 0)
+            if done.all():
+                break
+            h0 = h2
+
+    return MoonTimes(
+        np.where(rise != 0, start + rise * 3600.0, np.nan),
+        np.where(set_ != 0, start + set_ * 3600.0, np.nan),
+    )
@@ -0,0 +1,109 @@
+"""
+Parallel batch rendering on a process pool.
+
+Frames are independent, so a batch is spread over worker processes.
+The renderer's read-only assets (dial, background, text masks, moon
+texture) are prepared once in the parent before the pool starts and
+handed to every worker with the pool initializer: inherited with
+``fork`` and pickled once per worker (not per frame) otherwise. Results
+come back in submission order; at most ``workers * queue`` frames are in
+flight, so memory stays bounded however long the batch is.
+
+from moon_clock import MoonClockRenderer
+renderer = MoonClockRenderer(address="Sydney")
+for at, path in renderer.save_series("clock_%Y%m%d_%H%M.png", start, end, step, workers=8):
+    ...
+"""
+
+import collections
+import concurrent.futures
+import logging
+import os
+from typing import Callable, Iterable, Iterator
+
+from moon_clock.settings import Settings
+
+
+LOG = logging.getLogger(__name__)
+
+
+_renderer = None  # per worker process
+
+
+def _init_worker(renderer) -> None:
+    global _renderer
+    _renderer = renderer
+
+
+def _run_in_worker(func: Callable, job):
+    return func(_renderer, job)
+
+
+def render_job(renderer, at):
+    return at, renderer.render(at=at)
+
+
+def save_job(renderer, job):
+    at, path, encoder = job
+    image = renderer.render(at=at)
+    if encoder is None:
+        image.save(path)
+    else:
+        encoder.save(image, path)
+    return at, path
+
+
+def resolve_workers(workers: [None, int]) -> int:
+    """
+    None or 1: render in this process, 0: one worker per CPU.
+    """
+    if workers is None:
+        return 1
+    if workers == 0:
+        return os.cpu_count() or 1
+    if workers < 0:
+        raise ValueError(f"workers must be >= 0, got {workers}")
+    return workers
+
+
+def imap(
+        renderer,
+        func: Callable,
+        jobs: Iterable,
+        workers: [None, int] = None,
+        queue: [None, int] = None,
+) -> Iterator:
+    """
+    ``func(renderer, job)`` for every job, in order; in a worker process
+    with the worker's copy of ``renderer``. ``func`` must be a module
+    level function (it is pickled by reference).
+    """
+    workers = resolve_workers(workers)
+    queue = Settings.BATCH_QUEUE_PER_WORKER.value if queue is None else queue
+
+    # build the shared assets once, before they are handed to the workers
+    renderer._prepare()
+
+    if workers == 1:
+        for job in jobs:
+            yield func(renderer, job)
+        return
+
+    LOG.info(f"Rendering on {workers} worker processes")
+
+    with concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(renderer,),
+    ) as pool:
+        pending = collections.deque()
+        try:
+            for job in jobs:
+                pending.append(pool.submit(_run_in_worker, func, job))
+                if len(pending) >= workers * queue:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
@@ -0,0 +1,363 @@
+"""
+Offline benchmarks of the render pipeline.
+
+python -m moon_clock.benchmark -o bench.json
+python -m moon_clock.benchmark --quick --compare bench.json
+
+Every render case runs in a fresh process (so peak memory and cold
+start are per case) with geocoding stubbed by a FixedGeocoder and the
+caches in a temporary directory (``--cache-dir`` to keep them), so no
+network is needed and branches can be compared. Measured:
+
+- render: ``get_clock()`` latency (cold and warm), ``render()`` of a
+  kept renderer, peak RSS growth and peak traced (Python/NumPy)
+  allocations, for sizes, 12/24 hours, every ``draw_*`` option, blur,
+  the mask options and the presets
+- batch: ``render_series()`` throughput, in process and on a pool
+- startup: cold-start import time over a bare interpreter
+
+The results are JSON (see ``--output``); ``--compare`` prints the
+ratios against an earlier run.
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+__author__ = "Michael Mussato"
+__copyright__ = "Michael Mussato"
+__license__ = "MIT"
+
+LOG = logging.getLogger(__name__)
+
+
+VERSION = 1  # of the result format
+
+LOCATION = (-33.8688, 151.2093, "Sydney, Australia")
+AT = "2024-11-20T22:50:00+11:00"  # moon and sun arcs, moon above the horizon
+
+SIZES = [128, 256, 448, 896]
+QUICK_SIZES = [128, 448]
+
+# (name, get_clock() keyword arguments) on top of size 448
+OPTIONS = [
+    ("hours_12", {"hours": 12}),
+    ("no_text", {"draw_text": False}),
+    ("no_tz", {"draw_tz": False}),
+    ("no_date", {"draw_date": False}),
+    ("no_sun", {"draw_sun": False}),
+    ("no_moon", {"draw_moon": False}),
+    ("no_moon_tex", {"draw_moon_tex": False}),
+    ("no_moon_phase", {"draw_moon_phase": False}),
+    ("blur", {"blur": True}),
+    ("phase_mask_drawn", {"phase_mask": "drawn"}),
+    ("no_mask_moon_shadow", {"mask_moon_shadow": False}),
+    ("mask_square", {"mask_square": True}),
+    ("preset_draft", {"preset": "draft"}),
+    ("preset_print", {"preset": "print"}),
+]
+QUICK_OPTIONS = ["hours_12", "blur", "phase_mask_drawn", "preset_draft"]
+
+STARTUP = [
+    ("python", "pass"),
+    ("import_moon_clock", "import moon_clock"),
+    ("import_renderer", "import moon_clock.renderer"),
+    ("cli_parse_args", "from moon_clock.clock import parse_args; parse_args(['-a', 'Sydney', '-f', 'clock.png'])"),
+]
+
+
+# ---- Python API ----
+
+
+def _stats(values: list[float]) -> dict:
+    return {
+        "n": len(values),
+        "min": min(values),
+        "median": statistics.median(values),
+        "mean": statistics.fmean(values),
+    }
+
+
+def _max_rss_kib() -> [None, int]:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == "darwin" else rss  # bytes on macOS
+
+
+def render_cases(quick: bool = False) -> list[dict]:
+    """
+    The render cases: every size with the defaults (size_448 is the
+    baseline), then every option at size 448.
+    """
+    cases = []
+    for size in (QUICK_SIZES if quick else SIZES):
+        cases.append({"name": f"size_{size}", "options": {"size": size}})
+    for name, options in OPTIONS:
+        if quick and name not in QUICK_OPTIONS:
+            continue
+        cases.append({"name": name, "options": dict(options, size=448)})
+    return cases
+
+
+def measure_render(case: dict, repeat: int = 5) -> dict:
+    """
+    Measure one case in this process (``run_render_case()`` runs it in
+    a fresh one).
+    """
+    import tracemalloc
+
+    from moon_clock import geocoders
+    from moon_clock.clock import MoonClock
+    from moon_clock.renderer import MoonClockRenderer
+
+    geocoder = geocoders.FixedGeocoder(*LOCATION[:2], address=LOCATION[2])
+    options = case["options"]
+    rss_before = _max_rss_kib()
+
+    def get_clock():
+        return MoonClock.get_clock(address=LOCATION[2], iso=AT, geocoder=geocoder, **options)
+
+    start = time.perf_counter()
+    image = get_clock()
+    cold = time.perf_counter() - start
+    rss_after = _max_rss_kib()
+
+    get_clock_times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        get_clock()
+        get_clock_times.append(time.perf_counter() - start)
+
+    renderer = MoonClockRenderer(geocoder=geocoder, **options)
+    renderer.render(at=AT)
+    render_times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        renderer.render(at=AT)
+        render_times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    renderer.render(at=AT)
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    _, profile = renderer.render_profiled(at=AT)
+
+    return {
+        "name": case["name"],
+        "options": options,
+        "image_size": list(image.size),
+        "cold_s": cold,
+        "get_clock_s": _stats(get_clock_times),
+        "render_s": _stats(render_times),
+        "peak_rss_growth_kib": None if rss_before is None else rss_after - rss_before,
+        "traced_peak_kib": traced_peak // 1024,
+        # one warm render, see moon_clock.profiling
+        "stages_s": {name: seconds for name, (_, seconds, _) in profile.totals().items()},
+    }
+
+
+def _child_env(cache_dir: str) -> dict:
+    env = dict(os.environ)
+    env["MOON_CLOCK_CACHE_DIR"] = cache_dir
+    return env
+
+
+def run_render_case(case: dict, repeat: int, cache_dir: str) -> dict:
+    result = subprocess.run(
+        [sys.executable, "-m", "moon_clock.benchmark", "--child", "--repeat", str(repeat)],
+        input=json.dumps(case),
+        capture_output=True,
+        text=True,
+        env=_child_env(cache_dir),
+    )
+    if result.returncode:
+        LOG.error(result.stderr)
+        return {"name": case["name"], "options": case["options"], "error": result.stderr.strip().splitlines()[-1]}
+    return json.loads(result.stdout)
+
+
+def measure_batch(frames: int = 24, workers: [None, int] = None, size: int = 448) -> dict:
+    import datetime
+
+    from moon_clock import batch, geocoders
+    from moon_clock.renderer import MoonClockRenderer
+
+    renderer = MoonClockRenderer(geocoder=geocoders.FixedGeocoder(*LOCATION[:2]), size=size)
+    start = datetime.datetime.fromisoformat(AT)
+    end = start + datetime.timedelta(hours=frames - 1)
+
+    begin = time.perf_counter()
+    count = sum(1 for _ in renderer.render_series(start, end, datetime.timedelta(hours=1), workers=workers))
+    elapsed = time.perf_counter() - begin
+    return {
+        "workers": batch.resolve_workers(workers),
+        "requested_workers": workers,
+        "frames": count,
+        "size": size,
+        "elapsed_s": elapsed,
+        "frames_per_s": count / elapsed,
+    }
+
+
+def run_batch(frames: int, workers: [None, int], cache_dir: str) -> dict:
+    code = (
+        "import json; from moon_clock import benchmark; "
+        f"print(json.dumps(benchmark.measure_batch({frames}, {workers!r})))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, env=_child_env(cache_dir), check=True
+    )
+    return json.loads(result.stdout)
+
+
+def measure_startup(repeat: int = 5) -> dict:
+    """
+    Best of ``repeat`` fresh interpreters per statement; ``overhead_s``
+    is the time over a bare interpreter.
+    """
+    results = {}
+    for name, code in STARTUP:
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, "-c", code], check=True, capture_output=True)
+            times.append(time.perf_counter() - start)
+        results[name] = {"min_s": min(times), "median_s": statistics.median(times)}
+    for name, result in results.items():
+        result["overhead_s"] = result["min_s"] - results["python"]["min_s"]
+    return results
+
+
+def metadata() -> dict:
+    import numpy
+    import PIL
+
+    import moon_clock
+
+    return {
+        "format": VERSION,
+        "moon_clock": moon_clock.__version__,
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "numpy": numpy.__version__,
+        "pillow": PIL.__version__,
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def run_benchmarks(
+        quick: bool = False,
+        repeat: [None, int] = None,
+        only: [None, str] = None,
+        cache_dir: [None, str] = None,
+) -> dict:
+    repeat = (2 if quick else 5) if repeat is None else repeat
+    with tempfile.TemporaryDirectory(prefix="moon-clock-bench-") as tmp:
+        cache_dir = cache_dir or tmp
+        results = {"meta": metadata(), "render": [], "batch": [], "startup": {}}
+
+        for case in render_cases(quick):
+            if only and only not in case["name"]:
+                continue
+            LOG.info(f"render {case['name']}")
+            results["render"].append(run_render_case(case, repeat, cache_dir))
+
+        if not only or "batch" in only:
+            frames = 8 if quick else 24
+            for workers in (None, 0):
+                LOG.info(f"batch workers={workers}")
+                results["batch"].append(run_batch(frames, workers, cache_dir))
+
+        if not only or "startup" in only:
+            LOG.info("startup")
+            results["startup"] = measure_startup(repeat=3 if quick else 7)
+
+    return results
+
+
+def compare(base: dict, new: dict) -> list[tuple[str, float, float, float]]:
+    """
+    (metric, base, new, new / base) for every metric in both results;
+    lower is better except for throughput.
+    """
+    def flatten(results: dict) -> dict:
+        values = {}
+        for case in results.get("render", []):
+            if "error" in case:
+                continue
+            values[f"render/{case['name']}/get_clock_median_s"] = case["get_clock_s"]["median"]
+            values[f"render/{case['name']}/render_median_s"] = case["render_s"]["median"]
+            values[f"render/{case['name']}/traced_peak_kib"] = case["traced_peak_kib"]
+            if case.get("peak_rss_growth_kib") is not None:
+                values[f"render/{case['name']}/peak_rss_growth_kib"] = case["peak_rss_growth_kib"]
+        for batch in results.get("batch", []):
+            values[f"batch/workers_{batch['requested_workers']}/frames_per_s"] = batch["frames_per_s"]
+        for name, startup in results.get("startup", {}).items():
+            values[f"startup/{name}/min_s"] = startup["min_s"]
+        return values
+
+    a, b = flatten(base), flatten(new)
+    return [(key, a[key], b[key], b[key] / a[key] if a[key] else float("nan")) for key in a if key in b]
+
+
+# ---- CLI ----
+
+
+def parse_args(args):
+    parser = argparse.ArgumentParser(prog="python -m moon_clock.benchmark", description=__doc__.split("\n\n")[0])
+    parser.add_argument("-o", "--output", dest="output", help="Write the results here (default: stdout).")
+    parser.add_argument("--quick", dest="quick", action="store_true", help="Fewer cases and repeats.")
+    parser.add_argument("--repeat", dest="repeat", type=int, default=None, help="Timed runs per case.")
+    parser.add_argument("--only", dest="only", default=None, help="Only cases whose name contains this.")
+    parser.add_argument("--cache-dir", dest="cache_dir", default=None, help="Keep the caches here.")
+    parser.add_argument("--compare", dest="compare", default=None, help="Print ratios against these results.")
+    parser.add_argument("--child", dest="child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("-v", "--verbose", dest="loglevel", action="store_const", const=logging.INFO)
+    return parser.parse_args(args)
+
+
+def main(args):
+    args = parse_args(args)
+    logging.basicConfig(level=args.loglevel or logging.WARNING, stream=sys.stderr, format="%(message)s")
+
+    if args.child:
+        # one render case from stdin, results to stdout
+        logging.disable(logging.CRITICAL)
+        print(json.dumps(measure_render(json.load(sys.stdin), repeat=args.repeat or 5)))
+        return
+
+    results = run_benchmarks(quick=args.quick, repeat=args.repeat, only=args.only, cache_dir=args.cache_dir)
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            base = json.load(f)
+        for key, a, b, ratio in compare(base, results):
+            print(f"{key:60s} {a:12.4f} {b:12.4f} {ratio:7.2f}x", file=sys.stderr)
+
+
+def run():
+    main(sys.argv[1:])
+
+
+if __name__ == "__main__":
+    run()
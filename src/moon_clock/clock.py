@@ -1,23 +1,23 @@
+from __future__ import annotations
+
+import datetime
 import pathlib
+import re
+import signal
 import sys
 import argparse
-import datetime
-import zoneinfo
 import logging
-import math
-import numpy as np
-import time
+from typing import TYPE_CHECKING, Callable
 
-from geopy.geocoders import Nominatim
-from geopy.exc import GeocoderTimedOut
-from timezonefinder import TimezoneFinder
+from moon_clock import encoders, geocoders
+from moon_clock.exceptions import MoonClockException  # noqa: F401 (re-exported)
+from moon_clock.settings import Preset, Settings
 
-from PIL import ImageFile, Image, ImageDraw, ImageFont, ImageOps, ImageChops, ImageEnhance, ImageFilter
-from suncalcPy import suncalc
+if TYPE_CHECKING:
+    from PIL import Image
 
-import moon_clock
-from moon_clock.images import Resource
-from moon_clock.settings import Settings
+    from moon_clock.profiling import Profile
+    from moon_clock.renderer import MoonClockRenderer
 
 __author__ = "Michael Mussato"
 __copyright__ = "Michael Mussato"
@@ -25,34 +25,18 @@ __license__ = "MIT"
 
 LOG = logging.getLogger(__name__)
 
-
-ImageFile.LOAD_TRUNCATED_IMAGES = True
+# Pillow, NumPy and the renderer are imported by the functions that
+# render: parsing arguments (and --help) stays fast.
 
 
 # ---- Python API ----
 
 
-class MoonClockException(Exception):
-    pass
-
-
 class MoonClock(object):
 
     @staticmethod
-    def _get_coords(address) -> tuple[float, float]:
-        geolocator = Nominatim(user_agent="moon-clock")
-        max_tries = 5
-        tries = 0
-        while True:
-            try:
-                location = geolocator.geocode(address)
-                break
-            except GeocoderTimedOut as e:
-                tries += 1
-                time.sleep(1)
-                if tries >= max_tries:
-                    raise MoonClockException(f"Giving up - tried {max_tries} times.") from e
-
+    def _get_coords(address, geocoder=None) -> tuple[float, float]:
+        location = geocoders.get_geocoder(geocoder).geocode(address)
         LOG.info(f"Writing Clock PNG for location: {location.address}")
         return location.latitude, location.longitude
 
@@ -70,542 +54,82 @@ class MoonClock(object):
             draw_moon_tex: bool = True,
             draw_moon_phase: bool = True,
             blur: bool = False,
+            blur_softness: [None, float] = None,
+            phase_mask: [None, str] = None,
+            preset: [None, str] = None,
             dial_shadow_opacity: int = 255,
             mask_moon_shadow: bool = True,
             mask_square: bool = False,  # Todo: True is probably better
+            geocoder: [None, str, tuple[float, float], geocoders.Geocoder] = None,
+            profile_callback: [None, Callable[[Profile], None]] = None,
+            max_memory: [None, int] = None,
     ) -> Image:
-
-        try:
-            lat, long = MoonClock._get_coords(address=address)
-
-            tf = TimezoneFinder().timezone_at(lng=long, lat=lat)
-            LOG.info(f"Timezone: {tf}")
-            tz = zoneinfo.ZoneInfo(key=tf)
-        except MoonClockException as e:
-            LOG.exception(e)
-            LOG.warning("Using default timezone.")
-            tz = None
-
-        if iso is None:
-            now = datetime.datetime.now(tz=tz)
-        else:
-            now = datetime.datetime.fromisoformat(iso)
-
-        LOG.info(f"{now = }")
-
-        LOG.info(f"{size = }")
-        _size = size * Settings.ANTIALIAS.value
-        LOG.info(f"{_size = } (for Antialiasing)")
-
-        if hours not in Settings.HOURS.value:
-            raise MoonClockException('hours can only be 12 or 24')
-
-        bg = Image.new(mode='RGBA', size=(_size, _size), color=(0, 0, 0, 0))
-        draw_bg = ImageDraw.Draw(bg)
-        edge_compensation = 1  # top and left edge to make sure, AA takes place in pixels adjacent to edges
-        _edge_comp_2 = 1  # bottom and right edge in addition to edge_compensation
-
-        # MASKS
-        # Get rid of ugly rim
-        # and create perfect circle out of
-        # imperfect moon texture
-        # rect:
-        if mask_square:
-            draw_bg.rectangle(
-                (
-                    edge_compensation,
-                    edge_compensation,
-                    _size-edge_compensation - _edge_comp_2,
-                    _size-edge_compensation - _edge_comp_2
-                ),
-                fill=(0, 0, 0, 255)
-            )
-        # circle:
-        if mask_moon_shadow:
-            draw_bg.ellipse(
-                (
-                    edge_compensation,
-                    edge_compensation,
-                    _size-edge_compensation - _edge_comp_2,
-                    _size-edge_compensation - _edge_comp_2
-                ),
-                fill=(0, 0, 0, dial_shadow_opacity)
-            )
-
-        _clock = Image.new(mode='RGBA', size=(_size, _size), color=(0, 0, 0, 0))
-
-        draw = ImageDraw.Draw(_clock)
-
-        if hours == 24:
-            arc_twelve = 90.0
-        else:
-            arc_twelve = 270.0
-
-        # dial fg
-        white = (255, 255, 255, 255)
-
-        # center dot
-        draw.ellipse(
-            [
-                (
-                    round(_size * 0.482),
-                    round(_size * 0.482)
-                ),
-                (
-                    round(_size - _size * 0.482),
-                    round(_size - _size * 0.482)
-                )
-            ],
-            fill=white,
-            outline=None,
-            width=round(_size * 0.312)
-        )
-
-        color = white
-        if hours == 24:
-            intervals = [
-                (0.5, 3.0),
-                # (0.0, 3.0),
-                (14.0, 16.0),
-                (29.0, 31.0),
-                # (42.0, 48.0),
-                (42.0, 44.5),
-                (45.5, 48.0),
-                (59.0, 61.0),
-                (74.0, 76.0),
-                # (87.0, 93.0),
-                (87.0, 89.5),
-                (90.5, 93.0),
-                (104.0, 106.0),
-                (119.0, 121.0),
-                # (132.0, 138.0),
-                (132.0, 134.5),
-                (135.5, 138.0),
-                (149.0, 151.0),
-                (164.0, 166.0),
-                # (177.0, 183.0),
-                (177.0, 179.5),
-                (180.5, 183.0),
-                (194.0, 196.0),
-                (209.0, 211.0),
-                # (222.0, 228.0),
-                (222.0, 224.5),
-                (225.5, 228.0),
-                (239.0, 241.0),
-                (254.0, 256.0),
-                # (267.0, 273.0),
-                (267.0, 269.5),
-                (270.5, 273.0),
-                (284.0, 286.0),
-                (299.0, 301.0),
-                # (312.0, 318.0),
-                (312.0, 314.5),
-                (315.5, 318.0),
-                (329.0, 331.0),
-                (344.0, 346.0),
-                # (357.0, 359.99),
-                (357.0, 359.5),
-            ]
-        else:
-            intervals = [(0.0, 3.0),
-                         (29.0, 31.0),
-                         (59.0, 61.0),
-                         (87.0, 93.0),
-                         (119.0, 121.0),
-                         (149.0, 151.0),
-                         (177.0, 183.0),
-                         (209.0, 211.0),
-                         (239.0, 241.0),
-                         (267.0, 273.0),
-                         (299.0, 301.0),
-                         (329.0, 331.0),
-                         (357.0, 359.99),
-                         ]
-
-        for start, end in intervals[::-1]:  # reversed
-            draw.arc(
-                [
-                    (
-                        round(_size * 0.022),
-                        round(_size * 0.022)
-                    ),
-                    (
-                        round(_size - _size * 0.022),
-                        round(_size - _size * 0.022)
-                    )
-                ],
-                start=start,
-                end=end,
-                fill=color,
-                width=round(_size * 0.060)
-            )
-
-        decimal_h = float(now.strftime('%H')) + float(now.strftime('%M')) / 60
-        arc_length_h = decimal_h / hours * 360.0
-
-        # indicator
-        color = white
-        size_h = [
-            (
-                round(_size * 0.112),
-                round(_size * 0.112)
-            ),
-            (
-                round(_size - _size * 0.112),
-                round(_size - _size * 0.112)
-            )
-        ]
-        width = round(_size * 0.134)
-        indicator_thickness = 6
-        draw.arc(
-            size_h,
-            start=(arc_twelve + arc_length_h - indicator_thickness/2),
-            end=(arc_twelve + arc_length_h + indicator_thickness/2),
-            fill=color,
-            width=width
-        )
-
-        if draw_text:
-            logo_img = Image.new(mode='RGBA', size=(_size, _size), color=(0, 0, 0, 0))
-            logo_draw = ImageDraw.Draw(logo_img)
-            font_logo = ImageFont.truetype(Settings.CALLIGRAPHIC.value, round(_size * 0.140))
-            length_logo = font_logo.getlength(draw_text)
-            logo_draw.text(
-                (
-                    round(_size / 2) - length_logo / 2,
-                    round(_size * 0.536)
-                ),
-                draw_text,
-                fill=white,
-                font=font_logo
-            )
-
-            _logo_inv = ImageOps.invert(_clock.convert('RGB'))
-            _clock.paste(_logo_inv, mask=logo_img)
-
-        if draw_tz:
-            tz_img = Image.new(mode='RGBA', size=(_size, _size), color=(0, 0, 0, 0))
-            tz_draw = ImageDraw.Draw(tz_img)
-            font_tz = ImageFont.truetype(Settings.CALLIGRAPHIC.value, round(_size * 0.050))
-            strs = [
-                f"{tz.key} ({tz.tzname(now)})",
-                tz.key,  # "Australia/Sydney"
-                tz.tzname(now),  # "AEDT"
-            ]
-            text_tz = strs[1]
-            length_tz = font_tz.getlength(text_tz)
-            tz_draw.text(
-                (
-                    round(_size / 2) - length_tz / 2,
-                    round(_size * 0.3)
-                ),
-                text_tz,
-                fill=white,
-                font=font_tz
-            )
-
-            _date_inv = ImageOps.invert(_clock.convert('RGB'))
-            _clock.paste(_date_inv, mask=tz_img)
-
-        if draw_date:
-            date_img = Image.new(mode='RGBA', size=(_size, _size), color=(0, 0, 0, 0))
-            tz_draw = ImageDraw.Draw(date_img)
-            font_tz = ImageFont.truetype(Settings.CALLIGRAPHIC.value, round(_size * 0.120))
-            text_tz = now.strftime(Settings.DATE_FORMAT.value)
-            length_tz = font_tz.getlength(text_tz)
-            tz_draw.text(
-                (
-                    round(_size / 2) - length_tz / 2,
-                    round(_size * 0.315)
-                ),
-                text_tz,
-                fill=white,
-                font=font_tz
-            )
-
-            _date_inv = ImageOps.invert(_clock.convert('RGB'))
-            _clock.paste(_date_inv, mask=date_img)
-
-        comp = Image.new(mode='RGBA', size=(_size, _size), color=(0, 0, 0, 0))
-        comp = Image.alpha_composite(comp, bg)
-        comp = Image.alpha_composite(comp, _clock)
-
-        if draw_moon_phase:
-            _draw_moon_image = Image.new(mode='RGBA', size=(_size, _size), color=(0, 0, 0, 0))
-            _draw_moon = ImageDraw.Draw(_draw_moon_image)
-            _draw_moon.ellipse(((edge_compensation-1, edge_compensation), (_size-edge_compensation-_edge_comp_2, _size-edge_compensation-_edge_comp_2+1)), fill=white)
-            phase = round(
-                float(
-                    suncalc.getMoonIllumination(
-                        now
-                    )['phase']) * 2,
-                4
-            )
-            LOG.info(f'Moon phase: {phase} / 4')
-
-            spherical = math.cos(phase * math.pi)
-
-            center = _size / 2
-
-            if 0.0 <= phase <= 0.5:  # new to half moon
-                _draw_moon.rectangle(
-                    (0, 0, _size / 2, _size),
-                    fill=(0, 0, 0, 0)
-                )
-                _draw_moon.ellipse(
-                    (
-                        center - (spherical * center) + edge_compensation,
-                        0 + edge_compensation,
-                        center + (spherical * center) - edge_compensation,
-                        _size - edge_compensation
-                    ),
-                    fill=(0, 0, 0, 0)
-                )
-
-            elif 0.5 <= phase <= 1.0:  # half to full moon
-                _draw_moon.rectangle(
-                    (0, 0, _size / 2, _size),
-                    fill=(0, 0, 0, 0)
-                )
-                _draw_moon.ellipse(
-                    (
-                        center + (spherical * center) + edge_compensation,
-                        0 + edge_compensation,
-                        center - (spherical * center) - edge_compensation -_edge_comp_2,
-                        _size - edge_compensation - _edge_comp_2
-                    ),
-                    fill=white
-                )
-
-                if blur:
-                    blur_weight = 5
-                    for i in range(75):
-                        kernel = np.array(
-                            [
-                                [0, 0, 0, 0, 0],
-                                [0, 0, 0, 0, 0],
-                                [blur_weight, blur_weight, blur_weight, blur_weight, blur_weight],
-                                [0, 0, 0, 0, 0],
-                                [0, 0, 0, 0, 0]
-                            ]
-                        )
-                        _draw_moon_image = _draw_moon_image.filter(
-                            ImageFilter.Kernel(
-                                size=(5, 5),
-                                kernel=kernel.flatten()
-                            )
-                        )
-                        # _temp = _temp.crop((_size/4, 0, _size/4*3, _size))
-                        # _temp = _temp.resize((_size, _size))
-                        # _draw_moon_image = _draw_mo.paste(_temp)
-                        # _draw_moon.rectangle((0, 0, _size / 2, _size), fill=(0, 0, 0, 0))
-                        # _draw_moon.rectangle((_size / 2, 0, _size, _size), fill=(0, 0, 0, 0))
-
-            elif 1.0 < phase <= 1.5:  # full to half moon
-                _draw_moon.rectangle(
-                    (_size / 2, 0, _size, _size),
-                    fill=(0, 0, 0, 0)
-                )
-                _draw_moon.ellipse(
-                    (
-                        center + (spherical * center) + edge_compensation,
-                        0 + edge_compensation,
-                        center - (spherical * center) - edge_compensation-_edge_comp_2,
-                        _size - edge_compensation-_edge_comp_2
-                    ),
-                    fill=white
-                )
-
-            elif 1.5 < phase <= 2.0:  # half to new moon
-                _draw_moon.rectangle(
-                    (_size / 2, 0, _size, _size),
-                    fill=(0, 0, 0, 0)
-                )
-                _draw_moon.ellipse(
-                    (
-                        center - (spherical * center) + edge_compensation,
-                        0 + edge_compensation,
-                        center + (spherical * center) - edge_compensation,
-                        _size - edge_compensation
-                    ),
-                    fill=(0, 0, 0, 0)
-                )
-
-            _comp_inv = ImageOps.invert(comp.convert('RGB'))
-
-            if draw_moon_tex:
-                moon_tex = Resource().MOON_TEXTURE_SQUARE.resize((_size, _size))
-
-                filter_contrast = ImageEnhance.Contrast(moon_tex)
-                moon_tex = filter_contrast.enhance(Settings.CONTRAST.value)
-
-                filter_bright = ImageEnhance.Brightness(moon_tex)
-                moon_tex = filter_bright.enhance(Settings.BRIGHTNESS.value)
-
-                moon_tex.paste(moon_tex, mask=_draw_moon_image)
-                moon_tex = ImageChops.multiply(moon_tex, _comp_inv.convert('RGBA'))
-
-                comp.paste(moon_tex, mask=_draw_moon_image)
-
-            else:
-                comp.paste(_comp_inv, mask=_draw_moon_image)
-
-        if draw_sun:
-            _draw_sun = ImageDraw.Draw(comp)
-            _sun = suncalc.getTimes(now, lat, long)
-
-            decimal_sunrise = float(_sun['sunrise'].strftime('%H')) + float(_sun['sunrise'].strftime('%M')) / 60
-            arc_length_sunrise = decimal_sunrise / hours * 360.0
-            LOG.info(f'Sunrise: {str(_sun["sunrise"].strftime("%H:%M"))}')
-
-            decimal_sunset = float(_sun['sunset'].strftime('%H')) + float(_sun['sunset'].strftime('%M')) / 60
-            arc_length_sunset = decimal_sunset / hours * 360.0
-            LOG.info(f'Sunset: {str(_sun["sunset"].strftime("%H:%M"))}')
-
-            color = (255, 128, 0, 255)
-            _size_astral = 0.17  # TODO: bigger means smaller circle
-            _width = 0.012
-            size_astral = [
-                (
-                    round(_size * _size_astral),
-                    round(_size * _size_astral)
-                ),
-                (
-                    round(_size - _size * _size_astral),
-                    round(_size - _size * _size_astral)
-                )
-            ]
-            width_astral = round(_size * _width)
-            _draw_sun.arc(
-                size_astral,
-                start=arc_length_sunrise+arc_twelve,
-                end=arc_length_sunset+arc_twelve,
-                fill=color,
-                width=width_astral
-            )
-
-        # moon
-        if draw_moon:
-            _draw_moon = ImageDraw.Draw(comp)
-            now = datetime.datetime.today()
-
-            _moon_yesterday = suncalc.getMoonTimes(
-                now - datetime.timedelta(hours=24),
-                lat,
-                long
-            )
-            _moon_today = suncalc.getMoonTimes(
-                now,
-                lat,
-                long
-            )
-            _moon_tomorrow = suncalc.getMoonTimes(
-                now + datetime.timedelta(hours=24),
-                lat,
-                long
-            )
-
-            LOG.debug(f'Moon Yesterday: {_moon_yesterday}')
-            LOG.debug(f'Moon Today: {_moon_today}')
-            LOG.debug(f'Moon Tomorrow: {_moon_tomorrow}')
-
-            # based on the next moonset we can find its corresponding moonrise
-            # moon set plus some extra needs to be in the future
-            moon_sets = []
-            if 'set' in _moon_yesterday:
-                moon_sets.append(_moon_yesterday['set'])
-            if 'set' in _moon_today:
-                moon_sets.append(_moon_today['set'])
-            if 'set' in _moon_tomorrow:
-                moon_sets.append(_moon_tomorrow['set'])
-
-            moon_sets.sort(reverse=False)
-            LOG.debug(f'Moon sets: {moon_sets}')
-            for _set in moon_sets:
-                if _set + datetime.timedelta(hours=2) > datetime.datetime.now():
-                    moon_set = _set
-                    LOG.debug(f'Moon Set for relevant cycle is: {moon_set}')
-                    break
-
-            moon_rises = []
-            if 'rise' in _moon_yesterday:
-                moon_rises.append(_moon_yesterday['rise'])
-            if 'rise' in _moon_today:
-                moon_rises.append(_moon_today['rise'])
-            if 'rise' in _moon_tomorrow:
-                moon_rises.append(_moon_tomorrow['rise'])
-
-            moon_rises.sort(reverse=True)
-            LOG.debug(f'Moon rises: {moon_rises}')
-            for _rise in moon_rises:
-                if _rise < moon_set:
-                    moon_rise = _rise
-                    LOG.debug(f'Moon Rise for relevant cycle is: {moon_rise}')
-                    break
-
-            _moon = dict()
-            try:
-                _moon['rise'] = moon_rise
-
-                _moon['set'] = moon_set
-
-                decimal_moonrise = float(_moon['rise'].strftime('%H')) + float(_moon['rise'].strftime('%M')) / 60
-                arc_length_moonrise = decimal_moonrise / hours * 360.0
-                LOG.info(f'Moonrise: {str(_moon["rise"].strftime("%H:%M"))}')
-
-                decimal_moonset = float(_moon['set'].strftime('%H')) + float(_moon['set'].strftime('%M')) / 60
-                arc_length_moonset = decimal_moonset / hours * 360.0
-                LOG.info(f'Moonset: {str(_moon["set"].strftime("%H:%M"))}')
-
-                color = (0, 128, 255, 255)
-                _size_astral = 0.20  # TODO: bigger means smaller circle
-                _width = 0.012
-                size_astral = [
-                    (
-                        round(_size * _size_astral),
-                        round(_size * _size_astral)
-                    ),
-                    (
-                        round(_size - _size * _size_astral),
-                        round(_size - _size * _size_astral)
-                    )
-                ]
-                width_astral = round(_size * _width)
-                _draw_moon.arc(
-                    size_astral,
-                    start=arc_length_moonrise+arc_twelve,
-                    end=arc_length_moonset+arc_twelve,
-                    fill=color,
-                    width=width_astral
-                )
-
-            except UnboundLocalError:
-                LOG.exception('No Moon Rise found that happens before Moon Set:')
-
-        # Orientation
-        #   0: landscape
-        #  90: portrait (90 CCW)
-        # 180: reverse landscape (180 CCW)
-        # 270: reverse portrait (270 CCW)
-        # comp = comp.rotate(0, expand=False)
-
-        comp = comp.resize(
-            (
-                round(_size/Settings.ANTIALIAS.value),
-                round(_size/Settings.ANTIALIAS.value),
-            ),
-            Image.Resampling.LANCZOS
-        )
-
-        return comp
+        from moon_clock.renderer import MoonClockRenderer
+
+        return MoonClockRenderer(
+            address=address,
+            draw_text=draw_text,
+            draw_tz=draw_tz,
+            draw_date=draw_date,
+            size=size,
+            hours=hours,
+            draw_sun=draw_sun,
+            draw_moon=draw_moon,
+            draw_moon_tex=draw_moon_tex,
+            draw_moon_phase=draw_moon_phase,
+            blur=blur,
+            blur_softness=blur_softness,
+            phase_mask=phase_mask,
+            preset=preset,
+            dial_shadow_opacity=dial_shadow_opacity,
+            mask_moon_shadow=mask_moon_shadow,
+            mask_square=mask_square,
+            geocoder=geocoder,
+            profile_callback=profile_callback,
+            max_memory=max_memory,
+        ).render(at=iso)
 
 
 # ---- CLI ----
 
 
-def parse_args(args):
+STEP_UNITS = {
+    "s": "seconds",
+    "m": "minutes",
+    "h": "hours",
+    "d": "days",
+    "w": "weeks",
+}
 
-    parser = argparse.ArgumentParser()
+
+def parse_step(step: str) -> datetime.timedelta:
+    """
+    '90s', '15m', '1h', '1d', '1w' or combinations like '1h30m'.
+    """
+    parts = re.findall(r"(\d+)([smhdw])", step)
+    if not parts or "".join(n + u for n, u in parts) != step.replace(" ", ""):
+        raise argparse.ArgumentTypeError(f"invalid step: {step!r} (e.g. '15m', '1h', '1d')")
+    delta = datetime.timedelta()
+    for n, u in parts:
+        delta += datetime.timedelta(**{STEP_UNITS[u]: int(n)})
+    if delta <= datetime.timedelta(0):
+        raise argparse.ArgumentTypeError(f"step must be positive: {step!r}")
+    return delta
+
+
+def parse_args(args, daemon: bool = False):
+
+    if daemon:
+        parser = argparse.ArgumentParser(
+            prog="moon-clock daemon",
+            description="Keep --out-file up to date: re-render on every --interval "
+                        "boundary, replacing the file atomically.",
+        )
+    else:
+        parser = argparse.ArgumentParser(
+            epilog="Run 'moon-clock daemon --help' to keep an image up to date in the background "
+                   "or 'moon-clock serve --help' to serve images over HTTP.",
+        )
 
     parser.add_argument(
         "-v",
@@ -635,25 +159,174 @@ def parse_args(args):
         required=False,
     )
 
+    group_save.add_argument(
+        "-g",
+        "--geocoder",
+        dest="geocoder",
+        help="How to resolve the address. 'fixed' requires --lat and --lon.",
+        choices=[*geocoders.GEOCODERS, geocoders.FixedGeocoder.name],
+        default=None,
+        required=False,
+    )
+
+    group_save.add_argument(
+        "--lat",
+        dest="lat",
+        help="Latitude for the 'fixed' geocoder.",
+        type=float,
+        default=None,
+        required=False,
+    )
+
+    group_save.add_argument(
+        "--lon",
+        dest="lon",
+        help="Longitude for the 'fixed' geocoder.",
+        type=float,
+        default=None,
+        required=False,
+    )
+
     group_save.add_argument(
         "-f",
         "--out-file",
         dest="out_file",
-        help="Where to save the PNG to.",
+        help="Where to save the PNG to." if daemon else
+             "Where to save the PNG to. With --start a strftime pattern "
+             "for each frame, e.g. 'clock_%%Y%%m%%d_%%H%%M.png', an animation "
+             "(.webp, .png or .apng) or '-' for raw RGBA frames on stdout. "
+             "Without --start '-' writes the encoded image to stdout.",
         type=pathlib.Path,
         required=False,
     )
 
-    group_save.add_argument(
-        "-i",
-        "--iso",
-        dest="iso",
-        help="ISO timestamp like '2019-01-04T16:41:24+02:00'",
+    if daemon:
+        group_daemon = parser.add_argument_group("daemon")
+
+        group_daemon.add_argument(
+            "--interval",
+            dest="interval",
+            help=f"Minutes between updates (default: {Settings.CLOCK_UPDATE_INTERVAL.value}).",
+            default=Settings.CLOCK_UPDATE_INTERVAL.value,
+            type=int,
+            required=False,
+        )
+
+    else:
+        group_save.add_argument(
+            "-i",
+            "--iso",
+            dest="iso",
+            help="ISO timestamp like '2019-01-04T16:41:24+02:00'",
+            default=None,
+            type=str,
+            required=False,
+        )
+
+        group_series = parser.add_argument_group("series")
+
+        group_series.add_argument(
+            "--start",
+            dest="start",
+            help="Render a series of frames from this ISO timestamp on.",
+            default=None,
+            type=str,
+            required=False,
+        )
+
+        group_series.add_argument(
+            "--end",
+            dest="end",
+            help="Last timestamp of the series (inclusive).",
+            default=None,
+            type=str,
+            required=False,
+        )
+
+        group_series.add_argument(
+            "--step",
+            dest="step",
+            help="Interval between frames like '15m', '1h' or '1d' (default: 1h).",
+            default=datetime.timedelta(hours=1),
+            type=parse_step,
+            required=False,
+        )
+
+        group_series.add_argument(
+            "--workers",
+            "-w",
+            dest="workers",
+            help="Render the series on this many processes (0: one per CPU).",
+            default=None,
+            type=int,
+            required=False,
+        )
+
+        group_series.add_argument(
+            "--frame-duration",
+            dest="frame_duration",
+            help=f"Milliseconds per frame in animations (default: {Settings.ANIMATION_FRAME_DURATION.value}).",
+            default=None,
+            type=int,
+            required=False,
+        )
+
+    group_output = parser.add_argument_group("output")
+
+    group_output.add_argument(
+        "--format",
+        dest="format",
+        help="Output format (default: from the --out-file suffix, png for '-').",
+        choices=list(encoders.CONTENT_TYPES),
+        default=None,
+        required=False,
+    )
+
+    group_output.add_argument(
+        "--compress-level",
+        dest="compress_level",
+        help=f"PNG zlib level, 0 (fast) - 9 (small) (default: {Settings.PNG_COMPRESS_LEVEL.value}).",
+        default=None,
+        type=int,
+        required=False,
+    )
+
+    group_output.add_argument(
+        "--lossless",
+        dest="lossless",
+        help="Lossless WebP.",
+        action="store_true",
+    )
+
+    group_output.add_argument(
+        "--quality",
+        dest="quality",
+        help=f"WebP quality, 0-100 (default: {Settings.WEBP_QUALITY.value}).",
+        default=None,
+        type=int,
+        required=False,
+    )
+
+    group_output.add_argument(
+        "--inky",
+        dest="inky",
+        help="Map to the 7 colours of the Inky Impression with this dither "
+             "('--format index' for raw palette indices).",
+        choices=Settings.DITHERS.value,
         default=None,
-        type=str,
         required=False,
     )
 
+    parser.add_argument(
+        "--preset",
+        "-p",
+        dest="preset",
+        choices=Preset.names(),
+        default=None,
+        required=False,
+        help=f"Quality/performance trade-off (default: {Settings.PRESET.value}).",
+    )
+
     parser.add_argument(
         "--moon-shadow-opacity",
         "-s",
@@ -665,31 +338,361 @@ def parse_args(args):
              "(0<=moon-shadow<=255).",
     )
 
-    return parser.parse_args(args)
+    parser.add_argument(
+        "--max-memory",
+        dest="max_memory",
+        help="Render tile by tile if a full render would need more than MAX_MEMORY MiB "
+             "(for very large sizes; the result is the same).",
+        default=None,
+        type=int,
+        required=False,
+    )
+
+    parser.add_argument(
+        "--profile",
+        dest="profile",
+        help="Print the time and allocated pixels of every render stage to stderr.",
+        action="store_true",
+    )
 
+    args = parser.parse_args(args)
+
+    if args.geocoder in (None, geocoders.FixedGeocoder.name) and (args.lat is not None or args.lon is not None):
+        if args.lat is None or args.lon is None:
+            parser.error("--lat and --lon must be given together")
+        args.geocoder = geocoders.FixedGeocoder(args.lat, args.lon, address=args.address)
+    elif args.geocoder == geocoders.FixedGeocoder.name:
+        parser.error("the 'fixed' geocoder requires --lat and --lon")
+
+    if args.out_file is None:
+        parser.error("--out-file is required")
+
+    if args.max_memory is not None:
+        if args.max_memory < 1:
+            parser.error("--max-memory must be at least 1 MiB")
+        args.max_memory *= 2 ** 20
+
+    if args.format == "index" and args.inky is None:
+        parser.error("--format index requires --inky")
+    try:
+        args.encoder = get_encoder(args)
+    except MoonClockException as e:
+        parser.error(str(e))
+
+    if daemon:
+        if args.interval < 1:
+            parser.error("--interval must be at least 1 minute")
+        if str(args.out_file) == "-":
+            parser.error("the daemon needs a file to write to")
+        return args
+
+    if (args.start is None) != (args.end is None):
+        parser.error("--start and --end must be given together")
+    if args.start is not None and args.iso is not None:
+        parser.error("--iso can not be combined with --start/--end")
+    if args.workers is not None and args.workers < 0:
+        parser.error("--workers must be >= 0")
+
+    return args
+
+
+def get_encoder(args) -> [None, encoders.Encoder]:
+    """
+    Encoder for --out-file from the output options. None (no options, a
+    suffix Pillow knows but moon_clock.encoders does not) leaves it to
+    ``Image.save()``.
+    """
+    options = {}
+    if args.compress_level is not None:
+        options["compress_level"] = args.compress_level
+    if args.quality is not None:
+        options["quality"] = args.quality
+    if args.lossless:
+        options["lossless"] = True
+    if args.inky is not None:
+        from moon_clock.palette import PaletteQuantizer
+
+        options["quantizer"] = PaletteQuantizer(dither=args.inky)
+
+    if str(args.out_file) == "-":
+        return encoders.Encoder(args.format or "png", **options)
+
+    suffix = args.out_file.suffix.lower()
+    if args.format is None and suffix not in encoders.SUFFIXES:
+        if options:
+            raise MoonClockException(f"--format is required for '{suffix or args.out_file.name}' files")
+        return None
+    return encoders.Encoder.for_path(args.out_file, format=args.format, **options)
+
+
+def parse_serve_args(args):
+
+    parser = argparse.ArgumentParser(
+        prog="moon-clock serve",
+        description="Serve clock images over HTTP, e.g. "
+                    "/clock.png?address=Sydney or /clock.webp?lat=-33.87&lon=151.21&size=256.",
+    )
 
-def setup_logging(loglevel):
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        dest="loglevel",
+        help="set loglevel to INFO",
+        action="store_const",
+        const=logging.INFO,
+    )
+    parser.add_argument(
+        "-vv",
+        "--very-verbose",
+        dest="loglevel",
+        help="set loglevel to DEBUG",
+        action="store_const",
+        const=logging.DEBUG,
+    )
+
+    parser.add_argument(
+        "--host",
+        dest="host",
+        help=f"Address to listen on (default: {Settings.SERVER_HOST.value}).",
+        default=Settings.SERVER_HOST.value,
+        type=str,
+        required=False,
+    )
+
+    parser.add_argument(
+        "--port",
+        dest="port",
+        help=f"Port to listen on (default: {Settings.SERVER_PORT.value}).",
+        default=Settings.SERVER_PORT.value,
+        type=int,
+        required=False,
+    )
+
+    parser.add_argument(
+        "-g",
+        "--geocoder",
+        dest="geocoder",
+        help=f"Geocoder for ?address= (default: {Settings.GEOCODER.value}).",
+        choices=list(geocoders.GEOCODERS),
+        default=None,
+        required=False,
+    )
+
+    parser.add_argument(
+        "--workers",
+        "-w",
+        dest="workers",
+        help=f"Render threads (default: {Settings.SERVER_WORKERS.value}).",
+        default=None,
+        type=int,
+        required=False,
+    )
+
+    parser.add_argument(
+        "--compress-level",
+        dest="compress_level",
+        help=f"PNG zlib level, 0 (fast) - 9 (small) (default: {Settings.PNG_COMPRESS_LEVEL.value}).",
+        default=None,
+        type=int,
+        required=False,
+    )
+
+    parser.add_argument(
+        "--lossless",
+        dest="lossless",
+        help="Lossless WebP.",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--quality",
+        dest="quality",
+        help=f"WebP quality, 0-100 (default: {Settings.WEBP_QUALITY.value}).",
+        default=None,
+        type=int,
+        required=False,
+    )
+
+    args = parser.parse_args(args)
+
+    if args.workers is not None and args.workers < 1:
+        parser.error("--workers must be >= 1")
+
+    try:
+        args.encoders = {
+            "png": encoders.Encoder("png", compress_level=args.compress_level),
+            "webp": encoders.Encoder("webp", lossless=args.lossless, quality=args.quality),
+        }
+    except MoonClockException as e:
+        parser.error(str(e))
+
+    return args
+
+
+def setup_logging(loglevel, stream=None):
     """Setup basic logging
 
     Args:
       loglevel (int): minimum loglevel for emitting messages
+      stream: where to log to (default: stdout)
     """
     logformat = "[%(asctime)s] %(levelname)s:%(name)s:%(message)s"
     logging.basicConfig(
-        level=loglevel, stream=sys.stdout, format=logformat, datefmt="%Y-%m-%d %H:%M:%S"
+        level=loglevel, stream=stream or sys.stdout, format=logformat, datefmt="%Y-%m-%d %H:%M:%S"
+    )
+
+
+def print_profile(profile: Profile) -> None:
+    # one write: series workers share stderr
+    sys.stderr.write(f"{profile.format()}\n")
+    sys.stderr.flush()
+
+
+def stream_series(renderer: MoonClockRenderer, args) -> None:
+    from moon_clock import streams
+
+    kwargs = {} if str(args.out_file) == "-" else {"duration": args.frame_duration}
+    count = 0
+    with streams.open_writer(args.out_file, encoder=args.encoder, **kwargs) as writer:
+        for at, image in renderer.render_series(args.start, args.end, args.step, workers=args.workers):
+            writer.write(image)
+            count += 1
+
+    LOG.info(f"Streamed {count} frames to {args.out_file}")
+
+
+def render_series(args) -> None:
+    from moon_clock.renderer import MoonClockRenderer
+
+    renderer = MoonClockRenderer(
+        address=args.address,
+        dial_shadow_opacity=args.moon_shadow_opacity,
+        geocoder=args.geocoder,
+        preset=args.preset,
+        profile_callback=print_profile if args.profile else None,
+        max_memory=args.max_memory,
+    )
+
+    pattern = args.out_file.as_posix()
+    if "%" not in pattern:
+        stream_series(renderer, args)
+        return
+
+    first = pathlib.Path(datetime.datetime.fromisoformat(args.start).strftime(pattern))
+    if not first.resolve().parent.exists():
+        LOG.error(f"Destination directory does not exist: {first.parent.as_posix()}")
+        sys.exit(1)
+
+    count = 0
+    frames = renderer.save_series(pattern, args.start, args.end, args.step, workers=args.workers, encoder=args.encoder)
+    for at, out_file in frames:
+        LOG.info(f"Saved {out_file}")
+        count += 1
+
+    LOG.info(f"Rendered {count} frames")
+
+
+def get_clock(args) -> Image:
+    return MoonClock().get_clock(
+        address=args.address,
+        iso=args.iso,
+        dial_shadow_opacity=args.moon_shadow_opacity,
+        geocoder=args.geocoder,
+        preset=args.preset,
+        profile_callback=print_profile if args.profile else None,
+        max_memory=args.max_memory,
     )
 
 
+def run_daemon(args) -> None:
+    from moon_clock import daemon
+    from moon_clock.renderer import MoonClockRenderer
+
+    renderer = MoonClockRenderer(
+        address=args.address,
+        dial_shadow_opacity=args.moon_shadow_opacity,
+        geocoder=args.geocoder,
+        preset=args.preset,
+        profile_callback=print_profile if args.profile else None,
+        max_memory=args.max_memory,
+    )
+
+    if not args.out_file.resolve().parent.exists():
+        LOG.error(f"Destination directory does not exist: {args.out_file.parent.as_posix()}")
+        sys.exit(1)
+
+    clock_daemon = daemon.ClockDaemon(renderer, args.out_file, interval=args.interval, encoder=args.encoder)
+    # stop cleanly on SIGTERM (systemd, docker) as on Ctrl-C
+    signal.signal(signal.SIGTERM, lambda signum, frame: clock_daemon.stop())
+    try:
+        clock_daemon.run()
+    except KeyboardInterrupt:
+        pass
+
+
+def run_server(args) -> None:
+    import asyncio
+
+    from moon_clock import server
+
+    render_server = server.RenderServer(
+        host=args.host,
+        port=args.port,
+        geocoder=args.geocoder,
+        workers=args.workers,
+        encoders=args.encoders,
+    )
+
+    async def serve():
+        # stop cleanly on SIGTERM (systemd, docker) as on Ctrl-C
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+        await render_server.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+
+
 def main(args):
+    try:
+        _main(args)
+    except MoonClockException as e:
+        # e.g. an unknown address
+        LOG.error(e)
+        sys.exit(1)
+
+
+def _main(args):
+    if args[:1] == ["serve"]:
+        args = parse_serve_args(args[1:])
+        setup_logging(args.loglevel)
+        run_server(args)
+        sys.exit(0)
+
+    if args[:1] == ["daemon"]:
+        args = parse_args(args[1:], daemon=True)
+        setup_logging(args.loglevel)
+        run_daemon(args)
+        sys.exit(0)
+
     args = parse_args(args)
-    setup_logging(args.loglevel)
-
-    if args.out_file.resolve().parent.exists():
-        moon_clock.MoonClock().get_clock(
-            address=args.address,
-            iso=args.iso,
-            dial_shadow_opacity=args.moon_shadow_opacity,
-        ).save(args.out_file)
+    # keep stdout clean for raw frames
+    setup_logging(args.loglevel, stream=sys.stderr if str(args.out_file) == "-" else None)
+
+    if args.start is not None:
+        render_series(args)
+
+    elif str(args.out_file) == "-":
+        args.encoder.write(get_clock(args), sys.stdout.buffer)
+        sys.stdout.buffer.flush()
+
+    elif args.out_file.resolve().parent.exists():
+        image = get_clock(args)
+        if args.encoder is None:
+            image.save(args.out_file)
+        else:
+            args.encoder.save(image, args.out_file)
 
     else:
         LOG.error(f"Destination directory does not exist: {args.out_file.parent.as_posix()}")
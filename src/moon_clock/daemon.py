@@ -0,0 +1,137 @@
+"""
+Keep a clock image up to date.
+
+The daemon keeps one renderer (and with it the geocoded location, the
+prepared assets and the ephemeris) alive, sleeps until the next update
+boundary (a multiple of ``Settings.CLOCK_UPDATE_INTERVAL`` minutes since
+local midnight), renders and replaces the output file atomically, so
+readers never see a partially written image:
+
+from moon_clock import MoonClockRenderer
+from moon_clock.daemon import ClockDaemon
+renderer = MoonClockRenderer(address="Sydney")
+ClockDaemon(renderer, "/var/lib/moon-clock/clock.png").run()
+"""
+
+import datetime
+import logging
+import os
+import pathlib
+import tempfile
+import threading
+
+from PIL import Image
+
+from moon_clock.encoders import Encoder
+from moon_clock.frames import Frame
+from moon_clock.settings import Settings
+
+
+LOG = logging.getLogger(__name__)
+
+
+def atomic_save(image: Image, path: [str, pathlib.Path], encoder: [None, Encoder] = None) -> None:
+    """
+    Save ``image`` (with ``encoder``, or as ``image.save(path)`` would)
+    via a temporary file in the same directory that is renamed over
+    ``path`` once it is complete.
+    """
+    path = pathlib.Path(path)
+
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            if encoder is None:
+                image.save(f, format=Image.registered_extensions().get(path.suffix.lower(), "PNG"))
+            else:
+                encoder.write(image, f)
+        # mkstemp creates the file private: keep the permissions of the
+        # file we replace (or the usual ones for a new file)
+        os.chmod(tmp, _mode(path))
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def _mode(path: pathlib.Path) -> int:
+    try:
+        return path.stat().st_mode & 0o777
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+def next_boundary(now: datetime.datetime, interval: datetime.timedelta) -> datetime.datetime:
+    """
+    The first multiple of ``interval`` since the local midnight of ``now``
+    that is later than ``now``. Intervals that do not divide a day restart
+    at midnight.
+    """
+    midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    boundary = midnight + ((now - midnight) // interval + 1) * interval
+    return min(boundary, midnight + datetime.timedelta(days=1))
+
+
+class ClockDaemon(object):
+    """
+    Re-render ``out_file`` every ``interval`` minutes (default:
+    ``Settings.CLOCK_UPDATE_INTERVAL``) with ``renderer``, encoded with
+    ``encoder`` if given.
+    """
+
+    def __init__(
+            self,
+            renderer,
+            out_file: [str, pathlib.Path],
+            interval: [None, int] = None,
+            encoder: [None, Encoder] = None,
+    ):
+        self.renderer = renderer
+        self.out_file = pathlib.Path(out_file)
+        self.encoder = encoder
+        self.interval = datetime.timedelta(
+            minutes=Settings.CLOCK_UPDATE_INTERVAL.value if interval is None else interval
+        )
+        self.frame = None
+        self._stop = threading.Event()
+
+    def update(self, at: [None, datetime.datetime] = None) -> Frame:
+        """
+        Render ``at`` (default: now) and write it if anything changed
+        since the last update.
+        """
+        self.frame = self.renderer.render_frame(at=at, previous=self.frame)
+        if self.frame.rects:
+            atomic_save(self.frame.image, self.out_file, self.encoder)
+            LOG.info(f"Updated {self.out_file.as_posix()} ({self.frame.state[0]})")
+        else:
+            LOG.debug(f"Nothing changed at {self.frame.state[0]}")
+        return self.frame
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def run(self, updates: [None, int] = None) -> None:
+        """
+        Update now and then on every boundary until ``stop()`` is called
+        (or after ``updates`` updates).
+        """
+        self._stop.clear()
+        self.renderer._prepare()
+
+        count = 0
+        at = None
+        while True:
+            self.update(at)
+            count += 1
+            if updates is not None and count >= updates:
+                return
+
+            at = next_boundary(self.renderer.now(), self.interval)
+            # timestamps: wall clock differences are off across DST changes
+            timeout = at.timestamp() - self.renderer.now().timestamp()
+            LOG.debug(f"Next update at {at.isoformat()}")
+            if self._stop.wait(max(timeout, 0)):
+                return
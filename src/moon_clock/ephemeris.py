@@ -0,0 +1,315 @@
+"""
+Per-location ephemeris tables.
+
+Instead of doing the astronomy for every render, sunrise/sunset,
+moonrise/moonset and moon phase samples are computed once for a span of
+``Settings.EPHEMERIS_SPAN`` days (with moon_clock.astronomy, in a few
+array operations), kept as sorted arrays and looked up by bisection.
+Tables are written to ``Settings.EPHEMERIS_CACHE`` and loaded from there
+by later processes.
+
+All times in a table are POSIX timestamps; the lookups return datetimes
+in the timezone of the queried datetime.
+
+from moon_clock.ephemeris import Ephemeris
+ephemeris = Ephemeris.shared(-33.87, 151.21)
+sunrise, sunset = ephemeris.sun(now)
+"""
+
+import bisect
+import collections
+import datetime
+import logging
+import math
+import os
+import pathlib
+import tempfile
+import threading
+
+import numpy as np
+
+from moon_clock import astronomy
+from moon_clock.settings import Settings
+
+
+LOG = logging.getLogger(__name__)
+
+
+VERSION = 2  # bump when the table contents change
+
+DAY = 24 * 60 * 60
+
+PHASE_JUMP = 0.01  # larger changes between two samples are discontinuities
+
+
+def _local(ts: float) -> datetime.datetime:
+    return datetime.datetime.fromtimestamp(ts)
+
+
+def _timestamp(at: datetime.datetime) -> float:
+    return at.timestamp()
+
+
+def _datetime(ts: float, like: datetime.datetime) -> datetime.datetime:
+    """
+    ``ts`` in the timezone of ``like`` (naive local time for naive ``like``).
+    """
+    if like.tzinfo is None:
+        return datetime.datetime.fromtimestamp(ts)
+    return datetime.datetime.fromtimestamp(ts, tz=like.tzinfo)
+
+
+def _dedupe(events: list[float], tolerance: float = 60.0) -> list[float]:
+    result = []
+    for ts in sorted(events):
+        if not result or ts - result[-1] > tolerance:
+            result.append(ts)
+    return result
+
+
+class EphemerisTable(object):
+    """
+    Events and phase samples of one location from ``start`` to ``end``
+    (timestamps).
+    """
+
+    ARRAYS = ("sun_cycle", "sun_rise", "sun_set", "moon_rise", "moon_set", "phase")
+
+    def __init__(self, longitude: float, start: float, end: float, phase_step: float, **arrays):
+        self.longitude = longitude
+        self.start = start
+        self.end = end
+        self.phase_step = phase_step
+        # lists: bisect on them is faster than on arrays for single lookups
+        for name in self.ARRAYS:
+            setattr(self, name, np.asarray(arrays[name], dtype=np.float64).tolist())
+
+    @classmethod
+    def build(
+            cls,
+            latitude: float,
+            longitude: float,
+            start: float,
+            end: float,
+            tz: [None, datetime.tzinfo] = None,
+            phase_step: [None, float] = None,
+    ):
+        phase_step = Settings.EPHEMERIS_PHASE_STEP.value if phase_step is None else phase_step
+        LOG.debug(f"Building ephemeris table for {latitude}, {longitude} from {_local(start)} to {_local(end)}")
+
+        # sun: one row per solar transit, keyed like suncalc picks them
+        samples = np.arange(start, end + DAY, DAY)
+        cycles, first = np.unique(astronomy.solar_cycle(samples, longitude), return_index=True)
+        sun = astronomy.sun_times(samples[first], latitude, longitude)  # NaN in polar day or night
+
+        # moon: the first rise and set of every local day (in ``tz``)
+        midnights = []
+        day = datetime.datetime.fromtimestamp(start, tz=tz or datetime.timezone.utc)
+        day = day.replace(hour=0, minute=0, second=0, microsecond=0)
+        while _timestamp(day) <= end:
+            midnights.append(_timestamp(day))
+            day += datetime.timedelta(days=1)
+        moon = astronomy.moon_times(np.array(midnights), latitude, longitude)
+
+        phase = astronomy.moon_illumination(np.arange(start, end + phase_step, phase_step)).phase
+
+        return cls(
+            longitude,
+            start,
+            end,
+            phase_step,
+            sun_cycle=cycles,
+            sun_rise=sun.rise,
+            sun_set=sun.set,
+            moon_rise=_dedupe(moon.rise[~np.isnan(moon.rise)].tolist()),
+            moon_set=_dedupe(moon.set[~np.isnan(moon.set)].tolist()),
+            phase=phase,
+        )
+
+    def sun(self, ts: float) -> [None, tuple[float, float]]:
+        """
+        Sunrise and sunset of the solar day nearest to ``ts`` (as
+        suncalc.getTimes() picks it), None if the sun neither rises nor
+        sets.
+        """
+        cycle = float(astronomy.solar_cycle(ts, self.longitude))
+        i = bisect.bisect_left(self.sun_cycle, cycle)
+        if i == len(self.sun_cycle) or self.sun_cycle[i] != cycle:
+            return None
+        rise, set_ = self.sun_rise[i], self.sun_set[i]
+        if math.isnan(rise):
+            return None
+        return rise, set_
+
+    def moon(self, ts: float, after: float = 2 * 60 * 60) -> [None, tuple[float, float]]:
+        """
+        The first moonset later than ``after`` seconds before ``ts`` and
+        the last moonrise before it, None if there is no such pair.
+        """
+        i = bisect.bisect_right(self.moon_set, ts - after)
+        if i == len(self.moon_set):
+            return None
+        set_ = self.moon_set[i]
+        j = bisect.bisect_left(self.moon_rise, set_) - 1
+        if j < 0:
+            return None
+        return self.moon_rise[j], set_
+
+    def phase_at(self, ts: float) -> float:
+        """
+        suncalc's moon phase (0 new, 0.5 full, 1 new) interpolated
+        between the samples.
+        """
+        x = (ts - self.start) / self.phase_step
+        i = min(max(int(x), 0), len(self.phase) - 2)
+        p0, p1 = self.phase[i], self.phase[i + 1]
+        if p0 - p1 > 0.5:
+            p1 += 1.0  # new moon in between
+        if abs(p1 - p0) > PHASE_JUMP:
+            # suncalc's phase jumps across 0.5 at full moon (the sign of
+            # the bright limb angle flips): no interpolation over the jump
+            return float(astronomy.moon_illumination(ts).phase)
+        return (p0 + (p1 - p0) * (x - i)) % 1.0
+
+    def save(self, path: pathlib.Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(
+                    f,
+                    bounds=np.array([self.longitude, self.start, self.end, self.phase_step]),
+                    **{name: np.array(getattr(self, name), dtype=np.float64) for name in self.ARRAYS},
+                )
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    @classmethod
+    def load(cls, path: pathlib.Path):
+        with np.load(path) as data:
+            return cls(*data["bounds"].tolist(), **{name: data[name] for name in cls.ARRAYS})
+
+
+class Ephemeris(object):
+    """
+    Ephemeris of one location, split into tables of
+    ``Settings.EPHEMERIS_SPAN`` days (plus a margin on either side) that
+    are built, stored and loaded as lookups need them.
+    """
+
+    _shared = collections.OrderedDict()
+    _shared_lock = threading.Lock()
+
+    def __init__(
+            self,
+            latitude: float,
+            longitude: float,
+            tz: [None, datetime.tzinfo] = None,
+            directory: [None, pathlib.Path] = None,
+            span: [None, int] = None,
+    ):
+        step = Settings.EPHEMERIS_QUANTIZATION.value
+        self.tz = tz
+        self.latitude = round(round(latitude / step) * step, 6)
+        self.longitude = round(round(longitude / step) * step, 6)
+        self.directory = None if directory is None else pathlib.Path(directory)
+        self.span = (Settings.EPHEMERIS_SPAN.value if span is None else span) * DAY
+        self._tables = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def shared(cls, latitude: float, longitude: float, tz: [None, datetime.tzinfo] = None):
+        """
+        One instance per (quantized) location, timezone and process,
+        persisted to ``Settings.EPHEMERIS_CACHE``.
+        """
+        ephemeris = cls(latitude, longitude, tz=tz, directory=Settings.EPHEMERIS_CACHE.value)
+        key = ephemeris.latitude, ephemeris.longitude, str(tz)
+        with cls._shared_lock:
+            if key in cls._shared:
+                cls._shared.move_to_end(key)
+                return cls._shared[key]
+            cls._shared[key] = ephemeris
+            while len(cls._shared) > Settings.EPHEMERIS_CACHE_SIZE.value:
+                cls._shared.popitem(last=False)
+        return ephemeris
+
+    def _path(self, chunk: int) -> [None, pathlib.Path]:
+        if self.directory is None:
+            return None
+        key = "_".join(
+            str(part) for part in (
+                f"{self.latitude:.6f}",
+                f"{self.longitude:.6f}",
+                str(self.tz or "UTC").replace("/", "-"),
+                self.span,
+                chunk,
+                Settings.EPHEMERIS_MARGIN.value,
+                Settings.EPHEMERIS_PHASE_STEP.value,
+                VERSION,
+            )
+        )
+        return self.directory / f"ephemeris_{key}.npz"
+
+    def table(self, ts: float) -> EphemerisTable:
+        chunk = math.floor(ts / self.span)
+        with self._lock:
+            table = self._tables.get(chunk)
+            if table is None:
+                table = self._load(chunk)
+                if table is None:
+                    margin = Settings.EPHEMERIS_MARGIN.value * DAY
+                    table = EphemerisTable.build(
+                        self.latitude,
+                        self.longitude,
+                        chunk * self.span - margin,
+                        (chunk + 1) * self.span + margin,
+                        tz=self.tz,
+                    )
+                    self._store(chunk, table)
+                self._tables[chunk] = table
+            return table
+
+    def _load(self, chunk: int) -> [None, EphemerisTable]:
+        path = self._path(chunk)
+        if path is None or not path.exists():
+            return None
+        try:
+            LOG.debug(f"Loading ephemeris table from {path}")
+            return EphemerisTable.load(path)
+        except (OSError, ValueError, KeyError) as e:
+            LOG.warning(f"Ephemeris cache unavailable ({path}): {e}")
+            return None
+
+    def _store(self, chunk: int, table: EphemerisTable) -> None:
+        path = self._path(chunk)
+        if path is None:
+            return
+        try:
+            table.save(path)
+        except OSError as e:
+            LOG.warning(f"Ephemeris cache unavailable ({path}): {e}")
+
+    def sun(self, at: datetime.datetime) -> [None, tuple[datetime.datetime, datetime.datetime]]:
+        ts = _timestamp(at)
+        times = self.table(ts).sun(ts)
+        if times is None:
+            return None
+        return tuple(_datetime(t, at) for t in times)
+
+    def moon(self, at: datetime.datetime) -> [None, tuple[datetime.datetime, datetime.datetime]]:
+        ts = _timestamp(at)
+        times = self.table(ts).moon(ts)
+        if times is None:
+            return None
+        return tuple(_datetime(t, at) for t in times)
+
+    def phase(self, at: datetime.datetime) -> float:
+        ts = _timestamp(at)
+        return self.table(ts).phase_at(ts)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._tables.clear()
@@ -0,0 +1,8 @@
+class MoonClockException(Exception):
+    pass
+
+
+class AddressNotFound(MoonClockException):
+    """
+    The geocoder has no location for the address (as opposed to failing).
+    """
@@ -0,0 +1,78 @@
+"""
+Incremental rendering for displays with partial refresh (e.g. e-ink).
+
+A Frame carries the image, the time dependent inputs it was rendered
+from and the rectangles that changed compared to the frame before:
+
+from moon_clock import MoonClockRenderer
+renderer = MoonClockRenderer(address="Sydney", size=448)
+frame = renderer.render_frame()
+...
+frame = renderer.render_frame(previous=frame)
+for box in frame.rects:
+    display.update(frame.image.crop(box), box)
+"""
+
+from typing import NamedTuple
+
+import numpy as np
+from PIL import Image
+
+from moon_clock.settings import Settings
+
+
+class Frame(NamedTuple):
+    image: Image
+    state: tuple  # time dependent inputs of the image
+    rects: list[tuple[int, int, int, int]]  # (left, top, right, bottom), changed since the previous frame
+
+
+def changed_rects(previous: [None, Image], image: Image, tile: [None, int] = None) -> list[tuple[int, int, int, int]]:
+    """
+    Rectangles (``tile`` aligned, clipped to the image) covering every
+    pixel that differs between ``previous`` and ``image``. Changed tiles
+    are merged into horizontal runs and runs spanning the same columns in
+    consecutive tile rows into one rectangle.
+    """
+    width, height = image.size
+    if previous is None or previous.size != image.size or previous.mode != image.mode:
+        return [(0, 0, width, height)]
+
+    tile = tile or Settings.DIRTY_TILE_SIZE.value
+
+    a = np.asarray(previous)
+    b = np.asarray(image)
+    changed = a != b
+    if changed.ndim == 3:
+        changed = changed.any(axis=2)
+
+    # pad to whole tiles and reduce to one flag per tile
+    rows, cols = -(-height // tile), -(-width // tile)
+    padded = np.zeros((rows * tile, cols * tile), dtype=bool)
+    padded[:height, :width] = changed
+    tiles = padded.reshape(rows, tile, cols, tile).any(axis=(1, 3))
+
+    rects = []
+    open_rects = {}  # (first column, last column) -> first row
+    for row in range(rows + 1):
+        spans = set()
+        if row < rows:
+            flags = np.concatenate(([False], tiles[row], [False]))
+            edges = np.flatnonzero(flags[1:] != flags[:-1])
+            spans = set(zip(edges[::2].tolist(), edges[1::2].tolist()))
+
+        for span in list(open_rects):
+            if span not in spans:
+                top = open_rects.pop(span)
+                rects.append(
+                    (
+                        span[0] * tile,
+                        top * tile,
+                        min(span[1] * tile, width),
+                        min(row * tile, height),
+                    )
+                )
+        for span in spans:
+            open_rects.setdefault(span, row)
+
+    return sorted(rects, key=lambda r: (r[1], r[0]))
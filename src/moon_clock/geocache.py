@@ -0,0 +1,137 @@
+import logging
+import pathlib
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+from moon_clock.settings import Settings
+
+
+LOG = logging.getLogger(__name__)
+
+
+class GeocodeCache(object):
+    """
+    Persistent address -> (latitude, longitude, display name) cache.
+
+    Entries live in a small SQLite database so that several processes
+    (cron jobs, batch renders, a display loop) can share it. Entries
+    expire after ``ttl`` seconds and the least recently used ones are
+    evicted once more than ``max_entries`` are stored.
+
+    from moon_clock.geocache import GeocodeCache
+    """
+
+    _SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS geocode ("
+        "key TEXT PRIMARY KEY, "
+        "latitude REAL NOT NULL, "
+        "longitude REAL NOT NULL, "
+        "display_name TEXT, "
+        "created REAL NOT NULL, "
+        "accessed REAL NOT NULL)"
+    )
+
+    def __init__(
+            self,
+            path: [None, pathlib.Path] = None,
+            ttl: [None, float] = None,
+            max_entries: [None, int] = None,
+    ):
+        self.path = pathlib.Path(path or Settings.GEOCODE_CACHE.value)
+        self.ttl = Settings.GEOCODE_CACHE_TTL.value if ttl is None else ttl
+        self.max_entries = Settings.GEOCODE_CACHE_MAX_ENTRIES.value if max_entries is None else max_entries
+        self._initialized = False
+
+    @staticmethod
+    def _key(address: str) -> str:
+        return " ".join(str(address).split()).casefold()
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._initialized:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        # isolation_level=None: we manage transactions ourselves
+        conn = sqlite3.connect(self.path, timeout=10.0, isolation_level=None)
+        if not self._initialized:
+            # WAL lets readers proceed while another process writes
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(self._SCHEMA)
+            self._initialized = True
+        return conn
+
+    def get(self, address: str) -> [None, tuple[float, float, str]]:
+        now = time.time()
+        key = self._key(address)
+        try:
+            with closing(self._connect()) as conn:
+                row = conn.execute(
+                    "SELECT latitude, longitude, display_name, created FROM geocode WHERE key = ?",
+                    (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+                latitude, longitude, display_name, created = row
+                if created + self.ttl <= now:
+                    conn.execute("DELETE FROM geocode WHERE key = ? AND created = ?", (key, created))
+                    return None
+                conn.execute("UPDATE geocode SET accessed = ? WHERE key = ?", (now, key))
+        except sqlite3.Error as e:
+            LOG.warning(f"Geocode cache unavailable ({self.path}): {e}")
+            return None
+
+        return latitude, longitude, display_name
+
+    def set(self, address: str, latitude: float, longitude: float, display_name: [None, str] = None) -> None:
+        now = time.time()
+        key = self._key(address)
+        try:
+            with closing(self._connect()) as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO geocode "
+                        "(key, latitude, longitude, display_name, created, accessed) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (key, latitude, longitude, display_name, now, now)
+                    )
+                    self._evict(conn, now)
+                    conn.execute("COMMIT")
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+        except sqlite3.Error as e:
+            LOG.warning(f"Geocode cache unavailable ({self.path}): {e}")
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        conn.execute("DELETE FROM geocode WHERE created + ? <= ?", (self.ttl, now))
+        conn.execute(
+            "DELETE FROM geocode WHERE key IN ("
+            "SELECT key FROM geocode ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+
+    def clear(self) -> None:
+        try:
+            with closing(self._connect()) as conn:
+                conn.execute("DELETE FROM geocode")
+        except sqlite3.Error as e:
+            LOG.warning(f"Geocode cache unavailable ({self.path}): {e}")
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_cache() -> GeocodeCache:
+    """
+    The GeocodeCache at ``Settings.GEOCODE_CACHE`` shared by all
+    geocoders of the process: the database is set up once, not per
+    geocoder.
+    """
+    global _default
+    path = pathlib.Path(Settings.GEOCODE_CACHE.value)
+    with _default_lock:
+        if _default is None or _default.path != path:
+            _default = GeocodeCache(path)
+        return _default
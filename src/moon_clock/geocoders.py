@@ -0,0 +1,218 @@
+import bisect
+import logging
+import threading
+import time
+import unicodedata
+from typing import NamedTuple
+
+from moon_clock.exceptions import AddressNotFound, MoonClockException
+from moon_clock.geocache import GeocodeCache, default_cache
+from moon_clock.settings import Settings
+
+
+LOG = logging.getLogger(__name__)
+
+
+class Location(NamedTuple):
+    latitude: float
+    longitude: float
+    address: [None, str] = None
+
+
+class Geocoder(object):
+    """
+    Resolves an address to a Location.
+
+    from moon_clock.geocoders import get_geocoder
+    location = get_geocoder("gazetteer").geocode("Sydney")
+    """
+
+    name = None
+
+    def geocode(self, address: str) -> Location:
+        raise NotImplementedError
+
+
+class NominatimGeocoder(Geocoder):
+    """
+    OpenStreetMap Nominatim. One geopy client (and with it one pooled
+    HTTP session) is shared by all instances in a process and results
+    are kept in the on-disk GeocodeCache.
+    """
+
+    name = "nominatim"
+
+    _geolocator = None
+    _geolocator_lock = threading.Lock()
+
+    def __init__(self, cache: [None, GeocodeCache] = None, max_tries: [None, int] = None):
+        self.cache = default_cache() if cache is None else cache
+        self.max_tries = Settings.GEOCODE_MAX_TRIES.value if max_tries is None else max_tries
+
+    @classmethod
+    def geolocator(cls):
+        if cls._geolocator is None:
+            with cls._geolocator_lock:
+                if cls._geolocator is None:
+                    from geopy.geocoders import Nominatim
+                    cls._geolocator = Nominatim(user_agent="moon-clock")
+        return cls._geolocator
+
+    def geocode(self, address: str) -> Location:
+        cached = self.cache.get(address)
+        if cached is not None:
+            return Location(*cached)
+
+        from geopy.exc import GeocoderTimedOut, GeopyError
+
+        tries = 0
+        while True:
+            try:
+                location = self.geolocator().geocode(address)
+                break
+            except GeocoderTimedOut as e:
+                tries += 1
+                time.sleep(1)
+                if tries >= self.max_tries:
+                    raise MoonClockException(f"Giving up - tried {self.max_tries} times.") from e
+            except GeopyError as e:
+                # service unavailable, rate limited, ...
+                raise MoonClockException(f"Geocoding failed: {e}") from e
+
+        if location is None:
+            raise AddressNotFound(f"Address not found: {address}")
+
+        self.cache.set(address, location.latitude, location.longitude, location.address)
+
+        return Location(location.latitude, location.longitude, location.address)
+
+
+class FixedGeocoder(Geocoder):
+    """
+    Always returns the same coordinates, whatever the address.
+    """
+
+    name = "fixed"
+
+    def __init__(self, latitude: float, longitude: float, address: [None, str] = None):
+        self.location = Location(
+            float(latitude),
+            float(longitude),
+            address or f"{float(latitude):.4f}, {float(longitude):.4f}",
+        )
+
+    def geocode(self, address: [None, str] = None) -> Location:
+        return self.location
+
+
+class GazetteerGeocoder(Geocoder):
+    """
+    Offline lookup in the city list bundled under
+    ``moon_clock/data/gazetteer``. Accepts "City" or "City, Country"
+    (country name or ISO code). Exact names are matched first, then
+    prefixes; the most populous candidate wins.
+    """
+
+    name = "gazetteer"
+
+    _indexes = {}
+    _indexes_lock = threading.Lock()
+
+    def __init__(self, path=None):
+        self.path = path or Settings.GAZETTEER.value
+
+    @staticmethod
+    def _fold(text: str) -> str:
+        text = unicodedata.normalize("NFKD", text)
+        text = "".join(c for c in text if not unicodedata.combining(c))
+        return " ".join(text.split()).casefold()
+
+    def _index(self) -> tuple[list, list]:
+        """
+        Parsed once per process and file: the folded names (sorted, for
+        bisection) and their entries, in the same order.
+        """
+        index = GazetteerGeocoder._indexes.get(self.path)
+        if index is None:
+            with GazetteerGeocoder._indexes_lock:
+                index = GazetteerGeocoder._indexes.get(self.path)
+                if index is None:
+                    index = self._load(self.path)
+                    GazetteerGeocoder._indexes[self.path] = index
+        return index
+
+    @staticmethod
+    def _load(path) -> tuple[list, list]:
+        rows = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("#") or not line.strip():
+                    continue
+                name, country_code, country, latitude, longitude, population = line.rstrip("\n").split("\t")
+                rows.append(
+                    (
+                        GazetteerGeocoder._fold(name),
+                        (
+                            name,
+                            country_code.casefold(),
+                            GazetteerGeocoder._fold(country),
+                            float(latitude),
+                            float(longitude),
+                            int(population),
+                            country,
+                        ),
+                    )
+                )
+        rows.sort(key=lambda row: (row[0], -row[1][5]))
+        return [row[0] for row in rows], [row[1] for row in rows]
+
+    def lookup(self, address: str) -> list[Location]:
+        keys, entries = self._index()
+
+        city, _, country = str(address).partition(",")
+        city = self._fold(city)
+        country = self._fold(country)
+
+        lo = bisect.bisect_left(keys, city)
+        hi = bisect.bisect_right(keys, city)
+        if lo == hi:
+            # no exact match, fall back to prefix
+            hi = bisect.bisect_left(keys, city + "\uffff", lo)
+
+        candidates = entries[lo:hi]
+        if country:
+            candidates = [c for c in candidates if country in (c[1], c[2])]
+
+        candidates = sorted(candidates, key=lambda c: -c[5])
+        return [Location(c[3], c[4], f"{c[0]}, {c[6]}") for c in candidates]
+
+    def geocode(self, address: str) -> Location:
+        if not address or not str(address).strip():
+            raise AddressNotFound("Address not found: empty address")
+        candidates = self.lookup(address)
+        if not candidates:
+            raise AddressNotFound(f"Address not found in gazetteer: {address}")
+        return candidates[0]
+
+
+GEOCODERS = {
+    NominatimGeocoder.name: NominatimGeocoder,
+    GazetteerGeocoder.name: GazetteerGeocoder,
+}
+
+
+def get_geocoder(geocoder: [None, str, tuple[float, float], Geocoder] = None) -> Geocoder:
+    """
+    Resolve ``geocoder`` (None for Settings.GEOCODER, a name from
+    GEOCODERS, a (latitude, longitude) tuple or a Geocoder instance)
+    to a Geocoder instance.
+    """
+    if isinstance(geocoder, Geocoder):
+        return geocoder
+    if isinstance(geocoder, tuple):
+        return FixedGeocoder(*geocoder)
+    name = geocoder or Settings.GEOCODER.value
+    try:
+        return GEOCODERS[name]()
+    except KeyError:
+        raise MoonClockException(f"Unknown geocoder: {name} (choose from {', '.join(GEOCODERS)})") from None
@@ -1,5 +1,11 @@
+import collections
 import logging
-from PIL import ImageFile, Image, ImageDraw
+import mmap
+import os
+import pathlib
+import tempfile
+import threading
+from PIL import ImageFile, Image, ImageDraw, ImageEnhance
 from moon_clock.settings import Settings
 
 
@@ -101,3 +107,169 @@ class Resource(object):
         comp = Image.composite(image, bg, mask)
 
         return comp
+
+
+class TextureCache(object):
+    """
+    Squared and enhanced moon texture at each requested resolution,
+    computed at most once per process.
+
+    With a ``directory``, textures (up to
+    ``Settings.TEXTURE_CACHE_PERSIST_MAX_SIZE``) are also written there as
+    raw RGBA and memory-mapped by later processes, which then skip PNG
+    decoding, resizing and enhancing altogether.
+
+    The returned images are shared: never draw on them, ``copy()`` first.
+
+    ``region()`` computes a part of a texture without the whole texture
+    in memory (tiled rendering of very large sizes).
+
+    from moon_clock.images import TextureCache
+    moon_tex = TextureCache.shared().get(1792)
+    """
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, directory: [None, pathlib.Path] = None, max_entries: [None, int] = None):
+        self.directory = None if directory is None else pathlib.Path(directory)
+        self.max_entries = Settings.TEXTURE_CACHE_SIZE.value if max_entries is None else max_entries
+        self._textures = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._square = None
+        self._means = {}
+
+    @classmethod
+    def shared(cls):
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls(directory=Settings.TEXTURE_CACHE.value)
+            return cls._shared
+
+    def square(self) -> Image:
+        if self._square is None:
+            self._square = Resource().MOON_TEXTURE_SQUARE
+        return self._square
+
+    def get(self, size: int) -> Image:
+        with self._lock:
+            texture = self._textures.get(size)
+            if texture is not None:
+                self._textures.move_to_end(size)
+                return texture
+
+            texture = self._load(size)
+            if texture is None:
+                texture = self._enhance(self.square().resize((size, size)))
+                self._store(size, texture)
+
+            self._textures[size] = texture
+            while len(self._textures) > self.max_entries:
+                self._textures.popitem(last=False)
+
+            return texture
+
+    def region(self, size: int, box: tuple[int, int, int, int]) -> Image:
+        """
+        The ``box`` (left, top, right, bottom) of ``get(size)``, pixel for
+        pixel, resized and enhanced on its own unless the whole texture is
+        at hand anyway.
+        """
+        with self._lock:
+            texture = self._textures.get(size)
+        if texture is None:
+            texture = self._load(size)
+        if texture is not None:
+            return texture.crop(box)
+
+        square = self.square()
+        scale = square.width / size
+        moon_tex = square.resize((box[2] - box[0], box[3] - box[1]), box=tuple(c * scale for c in box))
+        return self._enhance(moon_tex, mean=self._mean(size))
+
+    def _mean(self, size: int) -> int:
+        # the contrast is relative to the mean grey of the whole texture
+        if Settings.CONTRAST.value == 1:
+            return 0  # blending with factor 1 ignores the mean
+        with self._lock:
+            if size not in self._means:
+                square = self.square()
+                scale = square.width / size
+                histogram = [0] * 256
+                rows = max(1, (1 << 22) // size)
+                for top in range(0, size, rows):
+                    bottom = min(top + rows, size)
+                    strip = square.resize((size, bottom - top), box=(0, top * scale, square.width, bottom * scale))
+                    histogram = [a + b for a, b in zip(histogram, strip.convert("L").histogram())]
+                self._means[size] = int(sum(i * n for i, n in enumerate(histogram)) / sum(histogram) + 0.5)
+            return self._means[size]
+
+    @staticmethod
+    def _enhance(moon_tex: Image, mean: [None, int] = None) -> Image:
+        if mean is None:
+            filter_contrast = ImageEnhance.Contrast(moon_tex)
+            moon_tex = filter_contrast.enhance(Settings.CONTRAST.value)
+        else:
+            # ImageEnhance.Contrast with the mean of the whole texture
+            degenerate = Image.new("L", moon_tex.size, mean).convert(moon_tex.mode)
+            if "A" in moon_tex.getbands():
+                degenerate.putalpha(moon_tex.getchannel("A"))
+            moon_tex = Image.blend(degenerate, moon_tex, Settings.CONTRAST.value)
+
+        filter_bright = ImageEnhance.Brightness(moon_tex)
+        moon_tex = filter_bright.enhance(Settings.BRIGHTNESS.value)
+
+        return moon_tex
+
+    def _path(self, size: int) -> [None, pathlib.Path]:
+        if self.directory is None or size > Settings.TEXTURE_CACHE_PERSIST_MAX_SIZE.value:
+            return None
+        source = os.stat(Settings.MOON_TEXTURE.value)
+        key = "_".join(
+            str(part) for part in (
+                size,
+                Settings.CONTRAST.value,
+                Settings.BRIGHTNESS.value,
+                source.st_size,
+                source.st_mtime_ns,
+                Image.__version__,
+            )
+        )
+        return self.directory / f"moon_{key}.rgba"
+
+    def _load(self, size: int) -> [None, Image]:
+        path = self._path(size)
+        if path is None or not path.exists():
+            return None
+        try:
+            with open(path, "rb") as f:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            if len(buffer) != size * size * 4:
+                LOG.warning(f"Ignoring truncated texture cache file {path}")
+                return None
+            LOG.debug(f"Mapping moon texture from {path}")
+            return Image.frombuffer("RGBA", (size, size), buffer, "raw", "RGBA", 0, 1)
+        except (OSError, ValueError) as e:
+            LOG.warning(f"Texture cache unavailable ({path}): {e}")
+            return None
+
+    def _store(self, size: int, texture: Image) -> None:
+        path = self._path(size)
+        if path is None:
+            return
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(texture.tobytes())
+                os.replace(tmp, path)
+            except BaseException:
+                os.unlink(tmp)
+                raise
+        except OSError as e:
+            LOG.warning(f"Texture cache unavailable ({path}): {e}")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._textures.clear()
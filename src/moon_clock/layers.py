@@ -0,0 +1,257 @@
+"""
+Time-invariant layers of the clock, drawn at the supersampled size.
+
+Every function here is memoized in a bounded LRU cache keyed by the
+options that affect its output, so renders (and renderers) with the
+same size, hours and mask options share them. The returned images are
+shared: never draw on them, ``copy()`` first.
+
+The ``draw_*`` functions draw the same layers uncached into any part of
+the canvas: ``offset`` is where ``image`` sits in the ``_size`` canvas
+(tiled rendering).
+"""
+
+import functools
+import logging
+import math
+
+from PIL import Image, ImageDraw, ImageFont
+
+from moon_clock.settings import Settings
+
+
+LOG = logging.getLogger(__name__)
+
+
+WHITE = (255, 255, 255, 255)
+
+edge_compensation = 1  # top and left edge to make sure, AA takes place in pixels adjacent to edges
+_edge_comp_2 = 1  # bottom and right edge in addition to edge_compensation
+
+INTERVALS = {
+    24: [
+        (0.5, 3.0),
+        # (0.0, 3.0),
+        (14.0, 16.0),
+        (29.0, 31.0),
+        # (42.0, 48.0),
+        (42.0, 44.5),
+        (45.5, 48.0),
+        (59.0, 61.0),
+        (74.0, 76.0),
+        # (87.0, 93.0),
+        (87.0, 89.5),
+        (90.5, 93.0),
+        (104.0, 106.0),
+        (119.0, 121.0),
+        # (132.0, 138.0),
+        (132.0, 134.5),
+        (135.5, 138.0),
+        (149.0, 151.0),
+        (164.0, 166.0),
+        # (177.0, 183.0),
+        (177.0, 179.5),
+        (180.5, 183.0),
+        (194.0, 196.0),
+        (209.0, 211.0),
+        # (222.0, 228.0),
+        (222.0, 224.5),
+        (225.5, 228.0),
+        (239.0, 241.0),
+        (254.0, 256.0),
+        # (267.0, 273.0),
+        (267.0, 269.5),
+        (270.5, 273.0),
+        (284.0, 286.0),
+        (299.0, 301.0),
+        # (312.0, 318.0),
+        (312.0, 314.5),
+        (315.5, 318.0),
+        (329.0, 331.0),
+        (344.0, 346.0),
+        # (357.0, 359.99),
+        (357.0, 359.5),
+    ],
+    12: [
+        (0.0, 3.0),
+        (29.0, 31.0),
+        (59.0, 61.0),
+        (87.0, 93.0),
+        (119.0, 121.0),
+        (149.0, 151.0),
+        (177.0, 183.0),
+        (209.0, 211.0),
+        (239.0, 241.0),
+        (267.0, 273.0),
+        (299.0, 301.0),
+        (329.0, 331.0),
+        (357.0, 359.99),
+    ],
+}
+
+
+def translate(xy, offset: tuple[int, int]) -> list[float]:
+    """
+    Canvas coordinates (points or a flat sequence) as a flat list
+    relative to ``offset``.
+    """
+    flat = []
+    for item in xy:
+        if isinstance(item, (tuple, list)):
+            flat.extend(item)
+        else:
+            flat.append(item)
+    # Pillow truncates float coordinates: floor first (the same for the
+    # non-negative canvas coordinates) so it does not matter where the
+    # tile is
+    return [math.floor(c) - offset[i % 2] for i, c in enumerate(flat)]
+
+
+@functools.lru_cache(maxsize=Settings.FONT_CACHE_SIZE.value)
+def font(path, size: int) -> ImageFont.FreeTypeFont:
+    return ImageFont.truetype(path, size)
+
+
+@functools.lru_cache(maxsize=Settings.LAYER_CACHE_SIZE.value)
+def background(_size: int, mask_square: bool, mask_moon_shadow: bool, dial_shadow_opacity: int) -> Image:
+    LOG.debug(f"Drawing background layer for {_size = }")
+
+    bg = Image.new(mode='RGBA', size=(_size, _size), color=(0, 0, 0, 0))
+    draw_background(bg, _size, mask_square, mask_moon_shadow, dial_shadow_opacity)
+    return bg
+
+
+def draw_background(
+        bg: Image,
+        _size: int,
+        mask_square: bool,
+        mask_moon_shadow: bool,
+        dial_shadow_opacity: int,
+        offset: tuple[int, int] = (0, 0),
+) -> None:
+    draw_bg = ImageDraw.Draw(bg)
+
+    # MASKS
+    # Get rid of ugly rim
+    # and create perfect circle out of
+    # imperfect moon texture
+    # rect:
+    if mask_square:
+        draw_bg.rectangle(
+            translate(
+                (
+                    edge_compensation,
+                    edge_compensation,
+                    _size-edge_compensation - _edge_comp_2,
+                    _size-edge_compensation - _edge_comp_2
+                ),
+                offset
+            ),
+            fill=(0, 0, 0, 255)
+        )
+    # circle:
+    if mask_moon_shadow:
+        draw_bg.ellipse(
+            translate(
+                (
+                    edge_compensation,
+                    edge_compensation,
+                    _size-edge_compensation - _edge_comp_2,
+                    _size-edge_compensation - _edge_comp_2
+                ),
+                offset
+            ),
+            fill=(0, 0, 0, dial_shadow_opacity)
+        )
+
+
+@functools.lru_cache(maxsize=Settings.LAYER_CACHE_SIZE.value)
+def dial(_size: int, hours: int) -> Image:
+    LOG.debug(f"Drawing dial layer for {_size = }, {hours = }")
+
+    _clock = Image.new(mode='RGBA', size=(_size, _size), color=(0, 0, 0, 0))
+    draw_dial(_clock, _size, hours)
+    return _clock
+
+
+def draw_dial(_clock: Image, _size: int, hours: int, offset: tuple[int, int] = (0, 0)) -> None:
+    draw = ImageDraw.Draw(_clock)
+
+    # center dot
+    draw.ellipse(
+        translate(
+            [
+                (
+                    round(_size * 0.482),
+                    round(_size * 0.482)
+                ),
+                (
+                    round(_size - _size * 0.482),
+                    round(_size - _size * 0.482)
+                )
+            ],
+            offset
+        ),
+        fill=WHITE,
+        outline=None,
+        width=round(_size * 0.312)
+    )
+
+    for start, end in INTERVALS[hours][::-1]:  # reversed
+        draw.arc(
+            translate(
+                [
+                    (
+                        round(_size * 0.022),
+                        round(_size * 0.022)
+                    ),
+                    (
+                        round(_size - _size * 0.022),
+                        round(_size - _size * 0.022)
+                    )
+                ],
+                offset
+            ),
+            start=start,
+            end=end,
+            fill=WHITE,
+            width=round(_size * 0.060)
+        )
+
+
+@functools.lru_cache(maxsize=Settings.LAYER_CACHE_SIZE.value)
+def text_mask(_size: int, text: str, font_path, font_size: int, y: float) -> tuple[Image, tuple[int, int]]:
+    """
+    ``text`` centered horizontally at ``y`` (fraction of ``_size``) as a
+    mask (mode ``L``) only as large as the glyph bounding box, clipped to
+    the ``_size`` canvas, and the offset of that box in the canvas.
+    """
+    _font = font(font_path, font_size)
+    length = _font.getlength(text)
+    xy = (
+        round(_size / 2) - length / 2,
+        round(_size * y)
+    )
+
+    left, top, right, bottom = ImageDraw.Draw(Image.new(mode='L', size=(1, 1))).textbbox(xy, text, font=_font)
+    left, top = max(math.floor(left), 0), max(math.floor(top), 0)
+    right, bottom = min(math.ceil(right), _size), min(math.ceil(bottom), _size)
+
+    # the fractional part of xy is kept for subpixel positioning
+    text_img = Image.new(mode='L', size=(max(right - left, 0), max(bottom - top, 0)), color=0)
+    ImageDraw.Draw(text_img).text(
+        (
+            xy[0] - left,
+            xy[1] - top
+        ),
+        text,
+        fill=255,
+        font=_font
+    )
+
+    return text_img, (left, top)
+
+
+def cache_clear() -> None:
+    for f in (font, background, dial, text_mask):
+        f.cache_clear()
@@ -0,0 +1,201 @@
+"""
+Mapping frames to the colours of a 7-colour e-ink panel (Pimoroni Inky
+Impression), so the panel driver gets a palette image (or index buffer)
+instead of quantizing and dithering full RGBA itself.
+
+The nearest palette colour of every RGB value is precomputed once into
+a lookup table (``Settings.PALETTE_LUT_BITS`` per channel), so mapping a
+frame (without error diffusion) is a single NumPy indexing operation.
+Dithers:
+
+- diffusion: Floyd-Steinberg error diffusion (Pillow's, in C; ~20 ms
+  for 448 px), the best quality
+- ordered: an 8x8 Bayer threshold added before the lookup (vectorized,
+  ~3x faster, and unchanged areas stay unchanged between frames, which
+  suits partial updates)
+- none: nearest colour only
+
+from moon_clock.palette import PaletteQuantizer, pack
+quantizer = PaletteQuantizer()  # Inky palette at Settings.PIMORONI_SATURATION
+image = quantizer.quantize(renderer.render())  # mode "P", 7 colours
+inky.set_image(image)
+buffer = pack(quantizer.indices(renderer.render()))  # 2 pixels per byte
+"""
+
+import functools
+import logging
+
+import numpy as np
+from PIL import Image
+
+from moon_clock.exceptions import MoonClockException
+from moon_clock.settings import Settings
+
+
+LOG = logging.getLogger(__name__)
+
+
+# the Inky Impression's colours (black, white, green, blue, red, yellow,
+# orange) as measured on the panel and as the driver sends them
+SATURATED_PALETTE = [
+    (57, 48, 57),
+    (255, 255, 255),
+    (58, 91, 70),
+    (61, 59, 94),
+    (156, 72, 75),
+    (208, 190, 71),
+    (177, 106, 73),
+]
+DESATURATED_PALETTE = [
+    (0, 0, 0),
+    (255, 255, 255),
+    (0, 255, 0),
+    (0, 0, 255),
+    (255, 0, 0),
+    (255, 255, 0),
+    (255, 140, 0),
+]
+
+BAYER_8 = np.array(
+    [
+        [0, 32, 8, 40, 2, 34, 10, 42],
+        [48, 16, 56, 24, 50, 18, 58, 26],
+        [12, 44, 4, 36, 14, 46, 6, 38],
+        [60, 28, 52, 20, 62, 30, 54, 22],
+        [3, 35, 11, 43, 1, 33, 9, 41],
+        [51, 19, 59, 27, 49, 17, 57, 25],
+        [15, 47, 7, 39, 13, 45, 5, 37],
+        [63, 31, 55, 23, 61, 29, 53, 21],
+    ]
+)
+
+
+def inky_palette(saturation: [None, float] = None) -> np.ndarray:
+    """
+    The panel colours blended like the Inky driver does:
+    ``saturation`` (default: ``Settings.PIMORONI_SATURATION``) 1 is the
+    measured, 0 the nominal colours.
+    """
+    saturation = Settings.PIMORONI_SATURATION.value if saturation is None else saturation
+    blend = np.array(SATURATED_PALETTE) * saturation + np.array(DESATURATED_PALETTE) * (1.0 - saturation)
+    return blend.astype(np.uint8)  # truncated like the driver
+
+
+@functools.lru_cache(maxsize=8)
+def _lookup_table(palette: bytes, bits: int) -> np.ndarray:
+    colours = np.frombuffer(palette, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+    # centres of the quantization cells of every channel
+    levels = ((np.arange(1 << bits) << (8 - bits)) + ((1 << (8 - bits)) >> 1)).astype(np.int32)
+    r, g, b = np.meshgrid(levels, levels, levels, indexing="ij")
+    cells = np.stack((r.ravel(), g.ravel(), b.ravel()), axis=1)
+
+    lut = np.zeros(len(cells), dtype=np.uint8)
+    best = np.full(len(cells), np.iinfo(np.int32).max)
+    for i, colour in enumerate(colours):
+        distance = ((cells - colour) ** 2).sum(axis=1)
+        closer = distance < best
+        lut[closer] = i
+        best[closer] = distance[closer]
+    return lut
+
+
+def lookup_table(palette: np.ndarray, bits: [None, int] = None) -> np.ndarray:
+    """
+    Index of the nearest colour of ``palette`` for every RGB value,
+    flattened: ``lut[(r >> s) << 2 * bits | (g >> s) << bits | b >> s]``
+    with ``s = 8 - bits``.
+    """
+    bits = Settings.PALETTE_LUT_BITS.value if bits is None else bits
+    if not 1 <= bits <= 7:
+        raise MoonClockException(f"bits must be between 1 and 7, got {bits}")
+    return _lookup_table(np.ascontiguousarray(palette, dtype=np.uint8).tobytes(), bits)
+
+
+def pack(indices: np.ndarray) -> bytes:
+    """
+    Two 4 bit indices per byte, the first pixel in the high nibble (the
+    Inky Impression's frame buffer layout).
+    """
+    flat = np.asarray(indices, dtype=np.uint8).ravel()
+    if len(flat) & 1:
+        flat = np.append(flat, np.uint8(0))
+    return ((flat[0::2] << 4) | (flat[1::2] & 0x0F)).astype(np.uint8).tobytes()
+
+
+class PaletteQuantizer(object):
+    """
+    Map images to ``palette`` (default: ``inky_palette()``) with
+    ``dither`` (one of ``Settings.DITHERS``, default
+    ``Settings.DITHER``). Transparent pixels are composited onto
+    ``background`` first.
+    """
+
+    def __init__(
+            self,
+            palette: [None, np.ndarray, list] = None,
+            dither: [None, str] = None,
+            background: [None, tuple[int, int, int]] = None,
+            bits: [None, int] = None,
+            spread: [None, float] = None,
+    ):
+        self.dither = Settings.DITHER.value if dither is None else dither
+        if self.dither not in Settings.DITHERS.value:
+            raise MoonClockException(f"dither can only be one of {Settings.DITHERS.value}")
+
+        self.palette = inky_palette() if palette is None else np.asarray(palette, dtype=np.uint8).reshape(-1, 3)
+        if not 2 <= len(self.palette) <= 16:
+            raise MoonClockException(f"palette needs 2 to 16 colours, got {len(self.palette)}")
+        self.background = Settings.PALETTE_BACKGROUND.value if background is None else tuple(background)
+        self.bits = Settings.PALETTE_LUT_BITS.value if bits is None else bits
+        self.spread = Settings.DITHER_SPREAD.value if spread is None else spread
+        self.lut = lookup_table(self.palette, self.bits)
+        self._threshold = None
+
+    def _rgb(self, image: Image) -> Image:
+        if image.mode == "RGBA":
+            flat = Image.new("RGB", image.size, self.background)
+            flat.paste(image, mask=image.getchannel("A"))
+            return flat
+        return image if image.mode == "RGB" else image.convert("RGB")
+
+    def _palette_image(self) -> Image:
+        # 256 entries: repeat the palette, indices are taken modulo its length
+        entries = np.resize(self.palette, (256, 3))
+        palette_image = Image.new("P", (1, 1))
+        palette_image.putpalette(entries.tobytes())
+        return palette_image
+
+    def _lookup(self, rgb: np.ndarray) -> np.ndarray:
+        shift = 8 - self.bits
+        rgb = rgb >> shift
+        return self.lut[(rgb[..., 0] << (2 * self.bits)) | (rgb[..., 1] << self.bits) | rgb[..., 2]]
+
+    def _ordered(self, rgb: np.ndarray) -> np.ndarray:
+        height, width = rgb.shape[:2]
+        if self._threshold is None:
+            self._threshold = ((BAYER_8 + 0.5) / 64 - 0.5) * self.spread
+        threshold = np.tile(self._threshold, (-(-height // 8), -(-width // 8)))[:height, :width]
+        dithered = rgb + threshold[..., None]
+        return np.clip(dithered, 0, 255).astype(np.int32)
+
+    def indices(self, image: Image) -> np.ndarray:
+        """
+        Palette index of every pixel, ``uint8`` of shape (height, width).
+        """
+        rgb = self._rgb(image)
+        if self.dither == "diffusion":
+            quantized = rgb.quantize(palette=self._palette_image(), dither=Image.Dither.FLOYDSTEINBERG)
+            return np.asarray(quantized) % len(self.palette)
+
+        pixels = np.asarray(rgb, dtype=np.int32)
+        if self.dither == "ordered":
+            pixels = self._ordered(pixels)
+        return self._lookup(pixels)
+
+    def quantize(self, image: Image) -> Image:
+        """
+        ``image`` as a palette ("P") image with the quantizer's colours.
+        """
+        quantized = Image.fromarray(self.indices(image).astype(np.uint8), mode="P")
+        quantized.putpalette(self.palette.tobytes())
+        return quantized
@@ -0,0 +1,113 @@
+"""
+The render as a pipeline of named layers with dependency-keyed caching.
+
+Every Layer declares what it depends on: inputs of the render (INPUTS)
+and the outputs of earlier layers. A layer's key is the values of its
+inputs and the keys of the layers it depends on, so it changes exactly
+when something the layer is drawn from changes. ``Pipeline.run()`` draws
+a layer (and what it depends on) only if its key is not the cached one;
+every layer keeps one entry, its last output.
+
+Rendering once a minute, only the layers depending on the minute are
+drawn again: the mask, dial and texture stay, the phase mask until the
+phase changes, the sun and moon arcs until their rise and set times do.
+
+Layers must not modify the outputs they get, these are cached. The
+exception are layers with ``cache=False``: their output is drawn for
+the run and may be modified by the (single) layer using it.
+
+from moon_clock.pipeline import Layer, Pipeline
+pipeline = Pipeline([
+    Layer("dial", ("size", "hours"), draw_dial),
+    Layer("indicator", ("dial", "minute"), draw_indicator, cache=False),
+])
+image = pipeline.run("indicator", {"size": 448, "hours": 24, "minute": now})
+"""
+
+import logging
+from typing import Any, Callable, NamedTuple
+
+from moon_clock.exceptions import MoonClockException
+
+
+LOG = logging.getLogger(__name__)
+
+
+INPUTS = (
+    "size",  # output size and supersampling
+    "hours",  # 12 or 24 hour dial
+    "location",  # latitude, longitude and timezone
+    "date",  # the local date
+    "minute",  # the local time, to the minute
+    "phase",  # the moon phase
+    "sun",  # start and end angle of the sun arc (location and time)
+    "moon",  # start and end angle of the moon arc (location and time)
+)
+
+
+class Layer(NamedTuple):
+    name: str
+    depends: tuple[str, ...]  # INPUTS and names of earlier layers
+    draw: Callable[..., Any]  # called with the values of ``depends``, in order
+    cache: bool = True
+
+
+class Pipeline(object):
+    """
+    Layers in drawing order; a layer can only depend on INPUTS and the
+    layers before it.
+    """
+
+    def __init__(self, layers: list[Layer]):
+        self.layers = {}
+        for layer in layers:
+            for name in layer.depends:
+                if name not in INPUTS and name not in self.layers:
+                    raise MoonClockException(f"Layer {layer.name} depends on unknown {name}")
+            if layer.name in self.layers or layer.name in INPUTS:
+                raise MoonClockException(f"Duplicate layer {layer.name}")
+            self.layers[layer.name] = layer
+        self._cache = {}
+        self.drawn = []  # the layers drawn by the last run
+
+    def key(self, name: str, inputs: dict, keys: [None, dict] = None) -> tuple:
+        keys = {} if keys is None else keys
+        if name not in keys:
+            keys[name] = tuple(
+                self.key(dep, inputs, keys) if dep in self.layers else inputs[dep]
+                for dep in self.layers[name].depends
+            )
+        return keys[name]
+
+    def run(self, name: str, inputs: dict) -> Any:
+        """
+        The output of layer ``name`` for ``inputs`` (a value for each of
+        the INPUTS it depends on, directly or not).
+        """
+        self.drawn = []
+        return self._get(name, inputs, {}, {})
+
+    def _get(self, name: str, inputs: dict, keys: dict, values: dict) -> Any:
+        if name in values:
+            return values[name]
+
+        layer = self.layers[name]
+        key = self.key(name, inputs, keys)
+        cached = self._cache.get(name)
+        if cached is not None and cached[0] == key:
+            values[name] = cached[1]
+            return cached[1]
+
+        args = [
+            self._get(dep, inputs, keys, values) if dep in self.layers else inputs[dep]
+            for dep in layer.depends
+        ]
+        value = layer.draw(*args)
+        if layer.cache:
+            self._cache[name] = (key, value)
+        self.drawn.append(name)
+        values[name] = value
+        return value
+
+    def clear(self) -> None:
+        self._cache.clear()
@@ -0,0 +1,157 @@
+"""
+Opt-in wall time and allocated pixels of the stages of a render.
+
+The renderer marks its stages (masks, dial, text, composite, phase mask,
+texture, ephemeris, arcs, downscale) with ``stage()``. Unless a Profile
+is active in the current thread that is a context variable lookup and a
+shared no-op context manager: ~15 us per render (a draft render takes
+~30 ms).
+
+from moon_clock import MoonClockRenderer
+image, profile = MoonClockRenderer(address="Sydney").render_profiled()
+print(profile.format())
+MoonClockRenderer(address="Sydney", profile_callback=print).render()
+
+Stages can nest (the ephemeris lookups happen while drawing the arcs):
+their time is included in the enclosing stage, pixels are counted by the
+innermost stage only. Stages that prepare the static layers only show up
+in the first render of a renderer.
+"""
+
+import contextlib
+import contextvars
+import time
+from typing import Iterator, NamedTuple
+
+
+class Stage(NamedTuple):
+    name: str
+    seconds: float
+    pixels: int  # of the images allocated in the stage
+    depth: int  # 0: not nested in another stage
+
+
+class _Timer(object):
+    __slots__ = ("pixels",)
+
+    def __init__(self):
+        self.pixels = 0
+
+    def add(self, *images) -> None:
+        """
+        Count the pixels of ``images`` as allocated by the stage.
+        """
+        for image in images:
+            if image is not None:
+                self.pixels += image.width * image.height
+
+
+class _Disabled(object):
+    __slots__ = ()
+
+    def add(self, *images) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_DISABLED = _Disabled()
+
+_current = contextvars.ContextVar("moon_clock_profile", default=None)
+
+
+class Profile(object):
+    """
+    Stages recorded while the profile is ``active()``, in the order they
+    finished.
+    """
+
+    def __init__(self):
+        self.stages = []
+        self.seconds = 0.0
+        self._depth = 0
+
+    @contextlib.contextmanager
+    def active(self) -> Iterator["Profile"]:
+        """
+        Record the stages run in this block (and thread); ``seconds`` is
+        the wall time of the block.
+        """
+        token = _current.set(self)
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.seconds += time.perf_counter() - start
+            _current.reset(token)
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[_Timer]:
+        timer = _Timer()
+        depth = self._depth
+        self._depth += 1
+        start = time.perf_counter()
+        try:
+            yield timer
+        finally:
+            seconds = time.perf_counter() - start
+            self._depth = depth
+            self.stages.append(Stage(name, seconds, timer.pixels, depth))
+
+    @property
+    def pixels(self) -> int:
+        return sum(s.pixels for s in self.stages)
+
+    def totals(self) -> dict[str, tuple[int, float, int]]:
+        """
+        Calls, seconds and pixels per stage name, in the order the names
+        first finished.
+        """
+        totals = {}
+        for s in self.stages:
+            calls, seconds, pixels = totals.get(s.name, (0, 0.0, 0))
+            totals[s.name] = (calls + 1, seconds + s.seconds, pixels + s.pixels)
+        return totals
+
+    def as_dict(self) -> dict:
+        return {
+            "seconds": self.seconds,
+            "pixels": self.pixels,
+            "stages": [s._asdict() for s in self.stages],
+        }
+
+    def format(self) -> str:
+        """
+        A table of the ``totals()`` and the wall time of the whole block.
+        """
+        lines = [f"{'stage':<12}{'calls':>6}{'ms':>10}{'Mpx':>8}"]
+        for name, (calls, seconds, pixels) in self.totals().items():
+            lines.append(f"{name:<12}{calls:>6}{seconds * 1000:>10.2f}{pixels / 1e6:>8.2f}")
+        lines.append(f"{'total':<12}{'':>6}{self.seconds * 1000:>10.2f}{self.pixels / 1e6:>8.2f}")
+        return "\n".join(lines)
+
+    def __str__(self):
+        return self.format()
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({len(self.stages)} stages, {self.seconds * 1000:.1f} ms)"
+
+
+def stage(name: str):
+    """
+    Context manager timing the block as stage ``name`` of the active
+    Profile, a no-op without one. Report the images allocated in the block
+    with ``add()``:
+
+    with profiling.stage("dial") as timer:
+        dial = Image.new(...)
+        timer.add(dial)
+    """
+    profile = _current.get()
+    if profile is None:
+        return _DISABLED
+    return profile.stage(name)
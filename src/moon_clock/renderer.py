@@ -0,0 +1,860 @@
+import datetime
+import logging
+import math
+from typing import Callable, Iterator
+
+from PIL import ImageFile, Image, ImageDraw, ImageOps, ImageChops
+
+from moon_clock import batch, geocoders, layers, profiling, tiles, timezones
+from moon_clock.encoders import Encoder
+from moon_clock.ephemeris import Ephemeris
+from moon_clock.exceptions import MoonClockException
+from moon_clock.frames import Frame, changed_rects
+from moon_clock.images import TextureCache
+from moon_clock.layers import WHITE, edge_compensation, _edge_comp_2
+from moon_clock.phase import coverage_mask, soft_terminator
+from moon_clock.pipeline import Layer, Pipeline
+from moon_clock.settings import Preset, Settings
+
+__author__ = "Michael Mussato"
+__copyright__ = "Michael Mussato"
+__license__ = "MIT"
+
+LOG = logging.getLogger(__name__)
+
+
+ImageFile.LOAD_TRUNCATED_IMAGES = True
+
+# inset of the sun and moon arcs (fraction of the size, bigger means a
+# smaller circle) and their colours
+SUN_ARC, SUN_COLOR = 0.17, (255, 128, 0, 255)
+MOON_ARC, MOON_COLOR = 0.20, (0, 128, 255, 255)
+
+
+class MoonClockRenderer(object):
+    """
+    Resolve-once render session for one location and one set of options.
+
+    Geocoding, timezone lookup, fonts, the moon texture and the static
+    dial are prepared once; ``render()`` only draws what depends on the
+    time. Use it wherever the same clock is rendered repeatedly:
+
+    from moon_clock import MoonClockRenderer
+    renderer = MoonClockRenderer(address="Sydney", size=640)
+    renderer.render().save("my-moon-clock.png")
+    """
+
+    def __init__(
+            self,
+            address: [None, str] = None,
+            draw_text: str = "MoonClock",
+            draw_tz: bool = True,
+            draw_date: bool = True,
+            size: int = 448,
+            hours: int = Settings.HOURS.value[1],
+            draw_sun: bool = True,
+            draw_moon: bool = True,
+            draw_moon_tex: bool = True,
+            draw_moon_phase: bool = True,
+            blur: bool = False,
+            blur_softness: [None, float] = None,
+            phase_mask: [None, str] = None,
+            preset: [None, str, Preset] = None,
+            dial_shadow_opacity: int = 255,
+            mask_moon_shadow: bool = True,
+            mask_square: bool = False,  # Todo: True is probably better
+            geocoder: [None, str, tuple[float, float], geocoders.Geocoder] = None,
+            profile_callback: [None, Callable[[profiling.Profile], None]] = None,
+            max_memory: [None, int] = None,
+            tile_size: [None, int] = None,
+    ):
+
+        if hours not in Settings.HOURS.value:
+            raise MoonClockException('hours can only be 12 or 24')
+
+        try:
+            self.preset = Preset.get(preset)
+        except KeyError:
+            raise MoonClockException(f"preset can only be one of {Preset.names()}") from None
+
+        phase_mask = phase_mask or self.preset.value.phase_mask
+        if phase_mask not in Settings.PHASE_MASKS.value:
+            raise MoonClockException(f"phase_mask can only be one of {Settings.PHASE_MASKS.value}")
+
+        self.address = address
+        self.draw_text = draw_text
+        self.draw_tz = draw_tz
+        self.draw_date = draw_date
+        self.size = size
+        self.hours = hours
+        self.draw_sun = draw_sun
+        self.draw_moon = draw_moon
+        self.draw_moon_tex = draw_moon_tex
+        self.draw_moon_phase = draw_moon_phase
+        self.blur = blur
+        self.blur_softness = Settings.BLUR_SOFTNESS.value if blur_softness is None else blur_softness
+        self.phase_mask = phase_mask
+        self.antialias = self.preset.value.antialias
+        self.resample = getattr(Image.Resampling, self.preset.value.resample)
+        # the drawn phase mask only exists supersampled
+        self.texture_resolution = "supersampled" if phase_mask == "drawn" else self.preset.value.texture_resolution
+        self.dial_shadow_opacity = dial_shadow_opacity
+        self.mask_moon_shadow = mask_moon_shadow
+        self.mask_square = mask_square
+        # called with the Profile of every render, see render_profiled()
+        self.profile_callback = profile_callback
+
+        # raises MoonClockException for unknown addresses: there is no clock without a location
+        location = geocoders.get_geocoder(geocoder).geocode(address)
+        LOG.info(f"Writing Clock PNG for location: {location.address}")
+        self.lat, self.long = location.latitude, location.longitude
+
+        self.tz = timezones.zone_at(lat=self.lat, lng=self.long)
+        LOG.info(f"Timezone: {self.tz}")
+
+        LOG.info(f"{size = }")
+        self._size = size * self.antialias
+        LOG.info(f"{self._size = } (for Antialiasing)")
+
+        # render tile by tile when a full render would need more than
+        # max_memory bytes, see moon_clock.tiles
+        self.max_memory = max_memory
+        if tile_size is None and max_memory is not None:
+            tile_size = tiles.tile_size(size, self.antialias, self.preset.value.resample, max_memory)
+        if tile_size is not None and tile_size < 1:
+            raise MoonClockException('tile_size must be positive')
+        self.tile_size = tile_size
+        if tile_size is not None:
+            LOG.info(f"Rendering in tiles of {tile_size} px")
+
+        if hours == 24:
+            self.arc_twelve = 90.0
+        else:
+            self.arc_twelve = 270.0
+
+        self._pipeline = self._build_pipeline()
+
+    @classmethod
+    def from_coords(cls, latitude: float, longitude: float, **kwargs):
+        return cls(geocoder=geocoders.FixedGeocoder(latitude, longitude), **kwargs)
+
+    def now(self) -> datetime.datetime:
+        return datetime.datetime.now(tz=self.tz)
+
+    # ---- layers ----
+
+    def _text_mask(self, text: str, font_size: float, y: float) -> tuple[Image, tuple[int, int]]:
+        return layers.text_mask(self._size, text, Settings.CALLIGRAPHIC.value, round(self._size * font_size), y)
+
+    @property
+    def _moon_at_output(self) -> bool:
+        # phase mask, texture and multiply at the output size, the arcs
+        # on top come from their own supersampled layer
+        return self.draw_moon_phase and self.texture_resolution == "output"
+
+    def _build_pipeline(self) -> Pipeline:
+        """
+        The layers of a full render and what they depend on, see
+        moon_clock.pipeline.
+        """
+        pipeline_layers = [
+            Layer("mask", ("size",), self._layer_mask),
+            Layer("dial", ("size", "hours"), self._layer_dial),
+            Layer("indicator", ("dial", "minute"), self._layer_indicator, cache=False),
+            Layer("text", ("size", "location"), self._layer_text),
+            Layer("date_text", ("size", "date"), self._layer_date_text),
+            Layer("clock", ("mask", "indicator", "text", "date_text"), self._layer_clock, cache=False),
+            Layer("phase_mask", ("size", "phase"), self._layer_phase_mask),
+            Layer("texture", ("size",), self._layer_texture),
+            Layer("sun_arc", ("size", "hours", "sun"), self._layer_sun_arc),
+            Layer("moon_arc", ("size", "hours", "moon"), self._layer_moon_arc),
+        ]
+        if self._moon_at_output:
+            pipeline_layers += [
+                Layer("arcs", ("sun_arc", "moon_arc"), self._layer_arcs),
+                Layer("image", ("clock", "phase_mask", "texture", "arcs"), self._layer_image_at_output, cache=False),
+            ]
+        else:
+            pipeline_layers += [
+                Layer("image", ("clock", "phase_mask", "texture", "sun_arc", "moon_arc"), self._layer_image, cache=False),
+            ]
+        return Pipeline(pipeline_layers)
+
+    def _inputs(self, now: datetime.datetime) -> dict:
+        return {
+            "size": (self.size, self.antialias),
+            "hours": self.hours,
+            "location": (self.lat, self.long, str(self.tz)),
+            "date": now.date(),
+            # wall time: aware datetimes compare equal across timezones
+            "minute": now.replace(second=0, microsecond=0, tzinfo=None),
+            "phase": self._phase(now) if self.draw_moon_phase else None,
+            "sun": self._sun_arc(now) if self.draw_sun else None,
+            "moon": self._moon_arc(now) if self.draw_moon else None,
+        }
+
+    def _prepare(self) -> None:
+        # draw the layers that do not depend on the time ahead of time
+        inputs = {"size": (self.size, self.antialias), "hours": self.hours, "location": (self.lat, self.long, str(self.tz))}
+        # tiles draw their part of the others themselves
+        names = ("text",) if self.tile_size is not None else ("mask", "dial", "text", "texture")
+        for name in names:
+            self._pipeline.run(name, inputs)
+
+    def _layer_mask(self, size: tuple[int, int]) -> Image:
+        with profiling.stage("masks") as timer:
+            bg = layers.background(self._size, self.mask_square, self.mask_moon_shadow, self.dial_shadow_opacity)
+            timer.add(bg)
+        return bg
+
+    def _layer_dial(self, size: tuple[int, int], hours: int) -> Image:
+        with profiling.stage("dial") as timer:
+            dial = layers.dial(self._size, hours)
+            timer.add(dial)
+        return dial
+
+    def _layer_indicator(self, dial: Image, minute: datetime.datetime) -> Image:
+        with profiling.stage("dial") as timer:
+            _clock = dial.copy()
+            timer.add(_clock)
+
+            self._draw_indicator(_clock, minute)
+        return _clock
+
+    def _layer_text(self, size: tuple[int, int], location: tuple) -> list[tuple[Image, tuple[int, int]]]:
+        text_masks = []
+        with profiling.stage("text") as timer:
+            if self.draw_text:
+                text_masks.append(self._text_mask(self.draw_text, 0.140, 0.536))
+
+            if self.draw_tz and self.tz is not None:
+                # "Australia/Sydney"
+                text_masks.append(self._text_mask(self.tz.key, 0.050, 0.3))
+
+            timer.add(*(text_img for text_img, _ in text_masks))
+        return text_masks
+
+    def _layer_date_text(self, size: tuple[int, int], date: datetime.date) -> [None, tuple[Image, tuple[int, int]]]:
+        if not self.draw_date:
+            return None
+
+        with profiling.stage("text") as timer:
+            date_img = self._text_mask(date.strftime(Settings.DATE_FORMAT.value), 0.120, 0.315)
+            timer.add(date_img[0])
+        return date_img
+
+    def _layer_clock(self, mask: Image, indicator: Image, text: list[tuple[Image, tuple[int, int]]], date_text) -> Image:
+        for text_mask in text:
+            self._paste_inverted(indicator, text_mask)
+        if date_text is not None:
+            self._paste_inverted(indicator, date_text)
+
+        with profiling.stage("composite") as timer:
+            comp = Image.alpha_composite(mask, indicator)
+            timer.add(comp)
+
+        if self._moon_at_output:
+            comp = self._downscale(comp)
+        return comp
+
+    def _layer_phase_mask(self, size: tuple[int, int], phase: [None, float]) -> [None, Image]:
+        if phase is None:
+            return None
+
+        with profiling.stage("phase_mask") as timer:
+            if self._moon_at_output:
+                softness = self.blur_softness if self.blur else 0.0
+                radius = (self._size / 2 - 1) / self.antialias
+                mask = coverage_mask(self.size, phase, softness, radius)
+            else:
+                mask = self._draw_phase_mask(phase)
+            timer.add(mask)
+        return mask
+
+    def _layer_texture(self, size: tuple[int, int]) -> [None, Image]:
+        if not (self.draw_moon_phase and self.draw_moon_tex):
+            return None
+
+        with profiling.stage("texture") as timer:
+            moon_tex = TextureCache.shared().get(self.size if self.texture_resolution == "output" else self._size)
+            timer.add(moon_tex)
+        return moon_tex
+
+    def _layer_sun_arc(self, size: tuple[int, int], hours: int, sun: [None, tuple[float, float]]):
+        return self._astral_layer(sun, SUN_ARC, SUN_COLOR)
+
+    def _layer_moon_arc(self, size: tuple[int, int], hours: int, moon: [None, tuple[float, float]]):
+        return self._astral_layer(moon, MOON_ARC, MOON_COLOR)
+
+    def _astral_layer(
+            self,
+            arc: [None, tuple[float, float]],
+            _size_astral: float,
+            color: tuple[int, int, int, int],
+    ) -> [None, tuple[Image, tuple[int, int]]]:
+        """
+        The arc on its own, cropped to its bounding box, and where it goes
+        (like the text masks). The arcs are drawn without antialiasing:
+        compositing them is the same as drawing them in place.
+        """
+        if arc is None:
+            return None
+
+        with profiling.stage("arcs") as timer:
+            layer = Image.new(mode='RGBA', size=(self._size, self._size), color=(0, 0, 0, 0))
+            self._draw_astral(layer, arc, _size_astral, color)
+            box = layer.getbbox()
+            if box is None:
+                return None
+            layer = layer.crop(box)
+            timer.add(layer)
+        return layer, box[:2]
+
+    def _layer_arcs(self, sun_arc, moon_arc) -> [None, tuple[Image, tuple[int, int]]]:
+        """
+        Sun and moon arcs downscaled to the output size. Only the square
+        around the arcs is resampled; returns the layer and where it goes
+        in the output.
+        """
+        if not (self.draw_sun or self.draw_moon):
+            return None
+
+        _size = self._size
+        aa = self.antialias
+
+        with profiling.stage("arcs") as timer:
+            arcs = Image.new(mode='RGBA', size=(_size, _size), color=(0, 0, 0, 0))
+            timer.add(arcs)
+
+            for arc in (sun_arc, moon_arc):
+                if arc is not None:
+                    arcs.alpha_composite(arc[0], dest=arc[1])
+
+        # outermost arc (sun) plus some room for the filter
+        inset = max(0, round(_size * SUN_ARC) // aa - 4)
+        arcs = self._downscale(arcs, (inset * aa, inset * aa, _size - inset * aa, _size - inset * aa))
+
+        return arcs, (inset, inset)
+
+    def _layer_image(self, clock: Image, phase_mask: [None, Image], texture: [None, Image], sun_arc, moon_arc) -> Image:
+        if phase_mask is not None:
+            self._paste_moon(clock, phase_mask, texture)
+
+        with profiling.stage("arcs"):
+            for arc in (sun_arc, moon_arc):
+                if arc is not None:
+                    clock.alpha_composite(arc[0], dest=arc[1])
+
+        # Orientation
+        #   0: landscape
+        #  90: portrait (90 CCW)
+        # 180: reverse landscape (180 CCW)
+        # 270: reverse portrait (270 CCW)
+        # comp = comp.rotate(0, expand=False)
+
+        return self._downscale(clock)
+
+    def _layer_image_at_output(self, clock: Image, phase_mask: Image, texture: [None, Image], arcs) -> Image:
+        self._paste_moon(clock, phase_mask, texture)
+
+        if arcs is not None:
+            with profiling.stage("composite"):
+                clock.alpha_composite(arcs[0], dest=arcs[1])
+
+        return clock
+
+    # ---- time dependent layers ----
+
+    def _draw_indicator(self, _clock: Image, now: datetime.datetime, offset: tuple[int, int] = (0, 0)) -> None:
+        _size = self._size
+        draw = ImageDraw.Draw(_clock)
+
+        decimal_h = float(now.strftime('%H')) + float(now.strftime('%M')) / 60
+        arc_length_h = decimal_h / self.hours * 360.0
+
+        # indicator
+        size_h = [
+            (
+                round(_size * 0.112),
+                round(_size * 0.112)
+            ),
+            (
+                round(_size - _size * 0.112),
+                round(_size - _size * 0.112)
+            )
+        ]
+        width = round(_size * 0.134)
+        indicator_thickness = 6
+        draw.arc(
+            layers.translate(size_h, offset),
+            start=(self.arc_twelve + arc_length_h - indicator_thickness/2),
+            end=(self.arc_twelve + arc_length_h + indicator_thickness/2),
+            fill=WHITE,
+            width=width
+        )
+
+    @staticmethod
+    def _paste_inverted(
+            _clock: Image,
+            text_mask: tuple[Image, tuple[int, int]],
+            offset: tuple[int, int] = (0, 0),
+    ) -> None:
+        # invert only within the bounding box of the text
+        text_img, (left, top) = text_mask
+        box = (left - offset[0], top - offset[1], left - offset[0] + text_img.width, top - offset[1] + text_img.height)
+        if offset != (0, 0):
+            # the part of the text on this tile
+            clipped = (max(box[0], 0), max(box[1], 0), min(box[2], _clock.width), min(box[3], _clock.height))
+            if clipped[0] >= clipped[2] or clipped[1] >= clipped[3]:
+                return
+            text_img = text_img.crop((clipped[0] - box[0], clipped[1] - box[1], clipped[2] - box[0], clipped[3] - box[1]))
+            box = clipped
+        with profiling.stage("text") as timer:
+            _crop = _clock.crop(box)
+            _rgb = _crop.convert('RGB')
+            _inv = ImageOps.invert(_rgb)
+            _clock.paste(_inv, box, mask=text_img)
+            timer.add(_crop, _rgb, _inv)
+
+    def _ephemeris(self) -> Ephemeris:
+        return Ephemeris.shared(self.lat, self.long, self.tz)
+
+    def _phase(self, now: datetime.datetime) -> float:
+        with profiling.stage("ephemeris"):
+            phase = round(
+                float(
+                    self._ephemeris().phase(
+                        now
+                    )) * 2,
+                4
+            )
+        LOG.info(f'Moon phase: {phase} / 4')
+        return phase
+
+    def _draw_phase_mask(self, phase: float, box: [None, tuple[int, int, int, int]] = None) -> Image:
+        _size = self._size
+
+        if self.phase_mask == "analytic":
+            softness = self.blur_softness * self.antialias if self.blur else 0.0
+            return coverage_mask(_size, phase, softness, _size / 2 - 1, box=box)
+
+        if self.blur:
+            return soft_terminator(_size, phase, self.blur_softness * self.antialias, box=box)
+
+        box = box or (0, 0, _size, _size)
+        offset = box[:2]
+        _draw_moon_image = Image.new(mode='RGBA', size=(box[2] - box[0], box[3] - box[1]), color=(0, 0, 0, 0))
+        _draw_moon = ImageDraw.Draw(_draw_moon_image)
+        _draw_moon.ellipse(
+            layers.translate(((edge_compensation-1, edge_compensation), (_size-edge_compensation-_edge_comp_2, _size-edge_compensation-_edge_comp_2+1)), offset),
+            fill=WHITE
+        )
+
+        spherical = math.cos(phase * math.pi)
+
+        center = _size / 2
+
+        if 0.0 <= phase <= 0.5:  # new to half moon
+            _draw_moon.rectangle(
+                layers.translate((0, 0, _size / 2, _size), offset),
+                fill=(0, 0, 0, 0)
+            )
+            _draw_moon.ellipse(
+                layers.translate(
+                    (
+                        center - (spherical * center) + edge_compensation,
+                        0 + edge_compensation,
+                        center + (spherical * center) - edge_compensation,
+                        _size - edge_compensation
+                    ),
+                    offset
+                ),
+                fill=(0, 0, 0, 0)
+            )
+
+        elif 0.5 <= phase <= 1.0:  # half to full moon
+            _draw_moon.rectangle(
+                layers.translate((0, 0, _size / 2, _size), offset),
+                fill=(0, 0, 0, 0)
+            )
+            _draw_moon.ellipse(
+                layers.translate(
+                    (
+                        center + (spherical * center) + edge_compensation,
+                        0 + edge_compensation,
+                        center - (spherical * center) - edge_compensation -_edge_comp_2,
+                        _size - edge_compensation - _edge_comp_2
+                    ),
+                    offset
+                ),
+                fill=WHITE
+            )
+
+        elif 1.0 < phase <= 1.5:  # full to half moon
+            _draw_moon.rectangle(
+                layers.translate((_size / 2, 0, _size, _size), offset),
+                fill=(0, 0, 0, 0)
+            )
+            _draw_moon.ellipse(
+                layers.translate(
+                    (
+                        center + (spherical * center) + edge_compensation,
+                        0 + edge_compensation,
+                        center - (spherical * center) - edge_compensation-_edge_comp_2,
+                        _size - edge_compensation-_edge_comp_2
+                    ),
+                    offset
+                ),
+                fill=WHITE
+            )
+
+        elif 1.5 < phase <= 2.0:  # half to new moon
+            _draw_moon.rectangle(
+                layers.translate((_size / 2, 0, _size, _size), offset),
+                fill=(0, 0, 0, 0)
+            )
+            _draw_moon.ellipse(
+                layers.translate(
+                    (
+                        center - (spherical * center) + edge_compensation,
+                        0 + edge_compensation,
+                        center + (spherical * center) - edge_compensation,
+                        _size - edge_compensation
+                    ),
+                    offset
+                ),
+                fill=(0, 0, 0, 0)
+            )
+
+        return _draw_moon_image
+
+    def _sun_arc(self, now: datetime.datetime) -> [None, tuple[float, float]]:
+        hours = self.hours
+
+        with profiling.stage("ephemeris"):
+            times = self._ephemeris().sun(now)
+        if times is None:
+            LOG.info('No sunrise or sunset (polar day or night)')
+            return None
+        _sun = dict(zip(('sunrise', 'sunset'), times))
+
+        decimal_sunrise = float(_sun['sunrise'].strftime('%H')) + float(_sun['sunrise'].strftime('%M')) / 60
+        arc_length_sunrise = decimal_sunrise / hours * 360.0
+        LOG.info(f'Sunrise: {str(_sun["sunrise"].strftime("%H:%M"))}')
+
+        decimal_sunset = float(_sun['sunset'].strftime('%H')) + float(_sun['sunset'].strftime('%M')) / 60
+        arc_length_sunset = decimal_sunset / hours * 360.0
+        LOG.info(f'Sunset: {str(_sun["sunset"].strftime("%H:%M"))}')
+
+        return arc_length_sunrise+self.arc_twelve, arc_length_sunset+self.arc_twelve
+
+    def _moon_arc(self, now: datetime.datetime) -> [None, tuple[float, float]]:
+        hours = self.hours
+
+        # the moonset of the relevant cycle needs to be at most 2 hours
+        # in the past, its moonrise is the last one before it
+        with profiling.stage("ephemeris"):
+            times = self._ephemeris().moon(now)
+        if times is None:
+            LOG.info('No Moon Rise found that happens before Moon Set')
+            return None
+        moon_rise, moon_set = times
+        LOG.debug(f'Moon Rise for relevant cycle is: {moon_rise}')
+        LOG.debug(f'Moon Set for relevant cycle is: {moon_set}')
+
+        decimal_moonrise = float(moon_rise.strftime('%H')) + float(moon_rise.strftime('%M')) / 60
+        arc_length_moonrise = decimal_moonrise / hours * 360.0
+        LOG.info(f'Moonrise: {str(moon_rise.strftime("%H:%M"))}')
+
+        decimal_moonset = float(moon_set.strftime('%H')) + float(moon_set.strftime('%M')) / 60
+        arc_length_moonset = decimal_moonset / hours * 360.0
+        LOG.info(f'Moonset: {str(moon_set.strftime("%H:%M"))}')
+
+        return arc_length_moonrise+self.arc_twelve, arc_length_moonset+self.arc_twelve
+
+    def _draw_astral(
+            self,
+            comp: Image,
+            arc: tuple[float, float],
+            _size_astral: float,
+            color: tuple[int, int, int, int],
+            offset: tuple[int, int] = (0, 0),
+    ) -> None:
+        _size = self._size
+        _width = 0.012
+        size_astral = [
+            (
+                round(_size * _size_astral),
+                round(_size * _size_astral)
+            ),
+            (
+                round(_size - _size * _size_astral),
+                round(_size - _size * _size_astral)
+            )
+        ]
+        width_astral = round(_size * _width)
+        ImageDraw.Draw(comp).arc(
+            layers.translate(size_astral, offset),
+            start=arc[0],
+            end=arc[1],
+            fill=color,
+            width=width_astral
+        )
+
+    def _paste_moon(self, comp: Image, mask: Image, moon_tex: [None, Image]) -> None:
+        with profiling.stage("texture") as timer:
+            _comp_rgb = comp.convert('RGB')
+            _comp_inv = ImageOps.invert(_comp_rgb)
+            timer.add(_comp_rgb, _comp_inv)
+
+            if self.draw_moon_tex:
+                _comp_inv = _comp_inv.convert('RGBA')
+                moon_tex = ImageChops.multiply(moon_tex, _comp_inv)
+                timer.add(_comp_inv, moon_tex)
+
+                comp.paste(moon_tex, mask=mask)
+
+            else:
+                comp.paste(_comp_inv, mask=mask)
+
+    def _downscale(self, comp: Image, box: [None, tuple[int, int, int, int]] = None) -> Image:
+        with profiling.stage("downscale") as timer:
+            if box is None:
+                comp = comp.resize(
+                    (
+                        round(self._size/self.antialias),
+                        round(self._size/self.antialias),
+                    ),
+                    self.resample
+                )
+            else:
+                comp = comp.resize(
+                    (
+                        (box[2] - box[0]) // self.antialias,
+                        (box[3] - box[1]) // self.antialias,
+                    ),
+                    self.resample,
+                    box=box,
+                )
+            timer.add(comp)
+        return comp
+
+    # ---- render ----
+
+    def _at(self, at: [None, str, datetime.datetime]) -> datetime.datetime:
+        if at is None:
+            return self.now()
+        if isinstance(at, str):
+            return datetime.datetime.fromisoformat(at)
+        return at
+
+    def series(
+            self,
+            start: [str, datetime.datetime],
+            end: [str, datetime.datetime],
+            step: datetime.timedelta = datetime.timedelta(hours=1),
+    ) -> Iterator[datetime.datetime]:
+        """
+        Timestamps from ``start`` to ``end`` (inclusive) every ``step``.
+        Naive timestamps are taken as local time at the location.
+        """
+        if step <= datetime.timedelta(0):
+            raise MoonClockException("step must be positive")
+
+        start, end = self._at(start), self._at(end)
+        if start.tzinfo is None and self.tz is not None:
+            start = start.replace(tzinfo=self.tz)
+        if end.tzinfo is None and start.tzinfo is not None:
+            end = end.replace(tzinfo=start.tzinfo)
+
+        at = start
+        while at <= end:
+            yield at
+            at = at + step
+
+    def render_series(
+            self,
+            start: [str, datetime.datetime],
+            end: [str, datetime.datetime],
+            step: datetime.timedelta = datetime.timedelta(hours=1),
+            workers: [None, int] = None,
+    ) -> Iterator[tuple[datetime.datetime, Image]]:
+        """
+        Render every timestamp of ``series()``, yielding
+        ``(timestamp, image)`` in order as soon as each frame is done.
+        ``workers`` > 1 renders on that many processes (0: one per CPU).
+        """
+        return batch.imap(self, batch.render_job, self.series(start, end, step), workers)
+
+    def save_series(
+            self,
+            pattern: str,
+            start: [str, datetime.datetime],
+            end: [str, datetime.datetime],
+            step: datetime.timedelta = datetime.timedelta(hours=1),
+            workers: [None, int] = None,
+            encoder: [None, Encoder] = None,
+    ) -> Iterator[tuple[datetime.datetime, str]]:
+        """
+        Like ``render_series()``, but every frame is saved to
+        ``timestamp.strftime(pattern)`` (with ``encoder`` if given) by the
+        process that rendered it; yields ``(timestamp, path)``.
+        """
+        jobs = ((at, at.strftime(str(pattern)), encoder) for at in self.series(start, end, step))
+        return batch.imap(self, batch.save_job, jobs, workers)
+
+    def _state(self, now: datetime.datetime) -> tuple:
+        # everything time dependent is drawn with minute resolution, except the phase
+        return now.strftime("%Y-%m-%d %H:%M %z"), self._phase(now) if self.draw_moon_phase else None
+
+    def render_frame(self, at: [None, str, datetime.datetime] = None, previous: [None, Frame] = None) -> Frame:
+        """
+        Render ``at`` like ``render()`` and return it as a Frame with the
+        rectangles that differ from ``previous`` (everything if None).
+        If nothing time dependent changed since ``previous``, its image
+        is returned as is, without rendering.
+        """
+        now = self._at(at)
+        state = self._state(now)
+
+        if previous is not None and previous.state == state:
+            return Frame(previous.image, state, [])
+
+        image = self.render(at=now)
+        return Frame(image, state, changed_rects(None if previous is None else previous.image, image))
+
+    def render(self, at: [None, str, datetime.datetime] = None) -> Image:
+        """
+        Render the clock for ``at`` (a datetime or an ISO timestamp like
+        '2019-01-04T16:41:24+02:00'); defaults to now at the location.
+        """
+        if self.profile_callback is None:
+            return self._render(at)
+
+        image, profile = self.render_profiled(at=at)
+        self.profile_callback(profile)
+        return image
+
+    def render_profiled(self, at: [None, str, datetime.datetime] = None) -> tuple[Image, profiling.Profile]:
+        """
+        ``render(at)`` and the wall time and allocated pixels of its
+        stages, see moon_clock.profiling.
+        """
+        profile = profiling.Profile()
+        with profile.active():
+            image = self._render(at)
+        return image, profile
+
+    def _render(self, at: [None, str, datetime.datetime]) -> Image:
+        now = self._at(at)
+
+        LOG.info(f"{now = }")
+
+        if self.tile_size is not None:
+            return self._render_tiled(now)
+
+        return self._pipeline.run("image", self._inputs(now))
+
+    def _render_tiled(self, now: datetime.datetime) -> Image:
+        """
+        ``_render()`` one output tile at a time, with the same result.
+        """
+        inputs = self._inputs(now)
+        text_masks = list(self._pipeline.run("text", inputs))
+        if self.draw_date:
+            text_masks.append(self._pipeline.run("date_text", inputs))
+
+        _size = self._size
+        aa = self.antialias
+        margin = tiles.margin(aa, self.preset.value.resample)
+
+        # the phase mask, texture and arcs at the output size as in _render()
+        at_output = self._moon_at_output
+        phase, sun_arc, moon_arc = inputs["phase"], inputs["sun"], inputs["moon"]
+        texture = TextureCache.shared() if self.draw_moon_phase and self.draw_moon_tex else None
+        inset = max(0, round(_size * SUN_ARC) // aa - 4)
+
+        image = Image.new(mode='RGBA', size=(self.size, self.size))
+        for box in tiles.boxes(self.size, self.tile_size):
+            region = tiles.region(box, aa, margin, _size)
+            offset = region[:2]
+            region_size = (region[2] - region[0], region[3] - region[1])
+            # the tile in the coordinates of the region
+            downscale_box = tuple(c * aa - offset[i % 2] for i, c in enumerate(box))
+
+            with profiling.stage("masks") as timer:
+                bg = Image.new(mode='RGBA', size=region_size, color=(0, 0, 0, 0))
+                layers.draw_background(bg, _size, self.mask_square, self.mask_moon_shadow, self.dial_shadow_opacity, offset)
+                timer.add(bg)
+
+            with profiling.stage("dial") as timer:
+                _clock = Image.new(mode='RGBA', size=region_size, color=(0, 0, 0, 0))
+                layers.draw_dial(_clock, _size, self.hours, offset)
+                timer.add(_clock)
+
+                self._draw_indicator(_clock, now, offset)
+
+            for text_mask in text_masks:
+                self._paste_inverted(_clock, text_mask, offset)
+
+            with profiling.stage("composite") as timer:
+                comp = Image.alpha_composite(bg, _clock)
+                timer.add(comp)
+            del bg, _clock
+
+            if at_output:
+                tile = self._downscale(comp, downscale_box)
+                del comp
+
+                softness = self.blur_softness if self.blur else 0.0
+                radius = (_size / 2 - 1) / aa
+                with profiling.stage("phase_mask") as timer:
+                    mask = coverage_mask(self.size, phase, softness, radius, box=box)
+                    timer.add(mask)
+                with profiling.stage("texture") as timer:
+                    moon_tex = None if texture is None else texture.region(self.size, box)
+                    timer.add(moon_tex)
+                self._paste_moon(tile, mask, moon_tex)
+
+                arcs_box = (max(box[0], inset), max(box[1], inset), min(box[2], self.size - inset), min(box[3], self.size - inset))
+                if (sun_arc or moon_arc) and arcs_box[0] < arcs_box[2] and arcs_box[1] < arcs_box[3]:
+                    with profiling.stage("arcs") as timer:
+                        arcs = Image.new(mode='RGBA', size=region_size, color=(0, 0, 0, 0))
+                        timer.add(arcs)
+                        if sun_arc:
+                            self._draw_astral(arcs, sun_arc, SUN_ARC, SUN_COLOR, offset)
+                        if moon_arc:
+                            self._draw_astral(arcs, moon_arc, MOON_ARC, MOON_COLOR, offset)
+                    arcs = self._downscale(arcs, tuple(c * aa - offset[i % 2] for i, c in enumerate(arcs_box)))
+                    with profiling.stage("composite"):
+                        tile.alpha_composite(arcs, dest=(arcs_box[0] - box[0], arcs_box[1] - box[1]))
+
+            else:
+                if self.draw_moon_phase:
+                    with profiling.stage("phase_mask") as timer:
+                        mask = self._draw_phase_mask(phase, box=region)
+                        timer.add(mask)
+                    with profiling.stage("texture") as timer:
+                        moon_tex = None if texture is None else texture.region(_size, region)
+                        timer.add(moon_tex)
+                    self._paste_moon(comp, mask, moon_tex)
+
+                with profiling.stage("arcs"):
+                    if sun_arc:
+                        self._draw_astral(comp, sun_arc, SUN_ARC, SUN_COLOR, offset)
+                    if moon_arc:
+                        self._draw_astral(comp, moon_arc, MOON_ARC, MOON_COLOR, offset)
+
+                tile = self._downscale(comp, downscale_box)
+                del comp
+
+            image.paste(tile, box[:2])
+
+        return image
+
+    def render_bytes(self, at: [None, str, datetime.datetime] = None, format: str = "png", **options) -> bytes:
+        """
+        ``render(at)`` encoded in memory, see moon_clock.encoders.Encoder
+        for ``format`` and ``options``.
+        """
+        return Encoder(format, **options).encode(self.render(at=at))
@@ -0,0 +1,397 @@
+"""
+A small asyncio HTTP server for clock images.
+
+GET /clock.png?address=Sydney
+GET /clock.webp?lat=-33.8688&lon=151.2093&size=256&hours=12&preset=draft
+
+Query parameters: ``address`` or ``lat``/``lon``, ``size``, ``hours``,
+``preset``, ``shadow`` (dial shadow opacity) and ``at`` (ISO timestamp,
+default: now).
+
+The image only changes from one minute (or moon phase) to the next, so
+encoded responses are kept in memory keyed by location, options, format
+and the renderer's time dependent state; they are sent with ETag and
+Last-Modified headers and conditional requests are answered with 304.
+Renderers (geocoded location, prepared assets, ephemeris) are kept warm
+per location and options. Geocoding and rendering run on an executor,
+so the event loop never blocks on them.
+
+import asyncio
+from moon_clock.server import RenderServer
+asyncio.run(RenderServer(port=8448).serve_forever())
+"""
+
+import asyncio
+import collections
+import concurrent.futures
+import datetime
+import email.utils
+import hashlib
+import http
+import logging
+import threading
+import urllib.parse
+
+from moon_clock import geocoders
+from moon_clock.encoders import Encoder
+from moon_clock.exceptions import AddressNotFound, MoonClockException
+from moon_clock.renderer import MoonClockRenderer
+from moon_clock.settings import Preset, Settings
+
+
+LOG = logging.getLogger(__name__)
+
+
+FORMATS = {
+    "/": "png",
+    "/clock.png": "png",
+    "/clock.webp": "webp",
+}
+
+MAX_LINE = 8192  # bytes per request or header line
+MAX_HEADERS = 100
+
+
+class BadRequest(MoonClockException):
+    pass
+
+
+class Response(object):
+
+    def __init__(self, status: http.HTTPStatus, body: bytes = b"", headers: [None, dict] = None):
+        self.status = status
+        self.body = body
+        self.headers = dict(headers or {})
+
+    def encode(self, head: bool = False) -> bytes:
+        headers = dict(self.headers)
+        headers["Content-Length"] = str(len(self.body))
+        headers["Connection"] = "close"
+        lines = [f"HTTP/1.1 {self.status.value} {self.status.phrase}"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        return "\r\n".join(lines).encode("latin-1") + b"\r\n\r\n" + (b"" if head else self.body)
+
+
+def _error(status: http.HTTPStatus, message: [None, str] = None) -> Response:
+    return Response(
+        status,
+        f"{message or status.phrase}\n".encode(),
+        {"Content-Type": "text/plain; charset=utf-8"},
+    )
+
+
+def _int(query: dict, name: str, default: [None, int]) -> [None, int]:
+    if name not in query:
+        return default
+    try:
+        return int(query[name])
+    except ValueError:
+        raise BadRequest(f"{name} must be an integer") from None
+
+
+def _float(query: dict, name: str) -> [None, float]:
+    if name not in query:
+        return None
+    try:
+        return float(query[name])
+    except ValueError:
+        raise BadRequest(f"{name} must be a number") from None
+
+
+class CacheEntry(object):
+
+    def __init__(self, state: tuple, body: bytes, last_modified: datetime.datetime):
+        self.state = state
+        self.body = body
+        self.etag = f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+        self.last_modified = last_modified
+
+
+class _SharedRenderer(object):
+    """
+    A renderer used by all executor threads. Its layer cache is not
+    thread safe: one thread at a time renders with it.
+    """
+
+    def __init__(self, renderer: MoonClockRenderer):
+        self.renderer = renderer
+        self.lock = threading.Lock()
+
+    def state(self, now: datetime.datetime) -> tuple:
+        with self.lock:
+            return self.renderer._state(now)
+
+    def encode(self, now: datetime.datetime, encoder: Encoder) -> bytes:
+        with self.lock:
+            image = self.renderer.render(at=now)
+        return encoder.encode(image)
+
+
+class RenderServer(object):
+    """
+    Serve renders over HTTP on ``host``:``port`` (port 0: any free
+    port, see ``port`` after ``start()``). ``encoders`` maps format
+    names ('png', 'webp') to the Encoder used for them.
+    """
+
+    def __init__(
+            self,
+            host: [None, str] = None,
+            port: [None, int] = None,
+            geocoder: [None, str, geocoders.Geocoder] = None,
+            executor: [None, concurrent.futures.ThreadPoolExecutor] = None,
+            workers: [None, int] = None,
+            renderers: [None, int] = None,
+            cache_size: [None, int] = None,
+            encoders: [None, dict[str, Encoder]] = None,
+    ):
+        self.host = Settings.SERVER_HOST.value if host is None else host
+        self.port = Settings.SERVER_PORT.value if port is None else port
+        self.geocoder = geocoders.get_geocoder(geocoder)
+        self._own_executor = executor is None
+        self.executor = executor or concurrent.futures.ThreadPoolExecutor(
+            max_workers=Settings.SERVER_WORKERS.value if workers is None else workers,
+            thread_name_prefix="moon-clock-render",
+        )
+        self.max_renderers = Settings.SERVER_RENDERERS.value if renderers is None else renderers
+        self.cache_size = Settings.SERVER_CACHE_SIZE.value if cache_size is None else cache_size
+        self.encoders = {name: Encoder(name) for name in set(FORMATS.values())}
+        self.encoders.update(encoders or {})
+
+        self._renderers = collections.OrderedDict()  # options -> future of a _SharedRenderer
+        self._cache = collections.OrderedDict()  # (options, format) -> CacheEntry
+        self._pending = {}  # (options, format, state) -> future of a CacheEntry
+        self._server = None
+
+    # ---- lifecycle ----
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, self.host, self.port, limit=MAX_LINE)
+        self.port = self._server.sockets[0].getsockname()[1]
+        LOG.info(f"Serving clocks on http://{self.host}:{self.port}/clock.png")
+
+    async def serve_forever(self) -> None:
+        if self._server is None:
+            await self.start()
+        try:
+            async with self._server:
+                await self._server.serve_forever()
+        finally:
+            self.close()
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self._server.close()
+        await self._server.wait_closed()
+        self.close()
+
+    def close(self) -> None:
+        if self._own_executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+    # ---- HTTP ----
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        head = False
+        try:
+            try:
+                method, target, headers = await self._read_request(reader)
+                head = method == "HEAD"
+                response = await self.respond(method, target, headers)
+            except BadRequest as e:
+                response = _error(http.HTTPStatus.BAD_REQUEST, str(e))
+            except Exception as e:
+                LOG.exception(e)
+                response = _error(http.HTTPStatus.INTERNAL_SERVER_ERROR)
+            writer.write(response.encode(head=head))
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _read_request(reader: asyncio.StreamReader) -> tuple[str, str, dict]:
+        try:
+            line = await reader.readuntil(b"\r\n")
+            parts = line.decode("latin-1").split()
+            if len(parts) != 3:
+                raise BadRequest("Malformed request line")
+            headers = {}
+            while True:
+                line = await reader.readuntil(b"\r\n")
+                if line == b"\r\n":
+                    break
+                if len(headers) >= MAX_HEADERS:
+                    raise BadRequest("Too many headers")
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+        except asyncio.LimitOverrunError:
+            raise BadRequest("Request too large") from None
+        return parts[0], parts[1], headers
+
+    async def respond(self, method: str, target: str, headers: dict) -> Response:
+        if method not in ("GET", "HEAD"):
+            response = _error(http.HTTPStatus.METHOD_NOT_ALLOWED)
+            response.headers["Allow"] = "GET, HEAD"
+            return response
+
+        url = urllib.parse.urlsplit(target)
+        if url.path not in FORMATS:
+            return _error(http.HTTPStatus.NOT_FOUND)
+        encoder = self.encoders[FORMATS[url.path]]
+        query = dict(urllib.parse.parse_qsl(url.query))
+
+        options = self._options(query)
+        try:
+            renderer = await self._renderer(options)
+        except AddressNotFound:
+            return _error(http.HTTPStatus.NOT_FOUND, f"Address not found: {options[0]}")
+        except MoonClockException as e:
+            # the geocoder (usually a web service) failed
+            LOG.warning(f"Geocoding {options[0]!r} failed: {e}")
+            return _error(http.HTTPStatus.BAD_GATEWAY, f"Geocoding failed: {options[0]}")
+        try:
+            now = renderer.renderer._at(query.get("at"))
+        except ValueError:
+            raise BadRequest("at must be an ISO timestamp") from None
+
+        entry = await self._entry(renderer, options, encoder, now)
+
+        headers_out = {
+            "Content-Type": encoder.content_type,
+            "ETag": entry.etag,
+            "Last-Modified": email.utils.format_datetime(entry.last_modified, usegmt=True),
+            "Cache-Control": f"max-age={60 - now.second}",
+        }
+        if self._not_modified(headers, entry):
+            return Response(http.HTTPStatus.NOT_MODIFIED, headers=headers_out)
+        return Response(http.HTTPStatus.OK, entry.body, headers_out)
+
+    @staticmethod
+    def _not_modified(headers: dict, entry: CacheEntry) -> bool:
+        if "if-none-match" in headers:
+            tags = [tag.strip() for tag in headers["if-none-match"].split(",")]
+            return "*" in tags or entry.etag in tags or f"W/{entry.etag}" in tags
+        if "if-modified-since" in headers:
+            try:
+                since = email.utils.parsedate_to_datetime(headers["if-modified-since"])
+            except (TypeError, ValueError):
+                return False
+            return since.tzinfo is not None and entry.last_modified <= since
+        return False
+
+    # ---- rendering ----
+
+    def _options(self, query: dict) -> tuple:
+        lat, lon = _float(query, "lat"), _float(query, "lon")
+        address = query.get("address")
+        if lat is not None and lon is not None:
+            if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+                raise BadRequest("lat/lon out of range")
+            location = (round(lat, 4), round(lon, 4))
+        elif lat is not None or lon is not None:
+            raise BadRequest("lat and lon must be given together")
+        elif address:
+            location = address.strip()
+        else:
+            raise BadRequest("address or lat/lon required")
+
+        size = _int(query, "size", 448)
+        if not 16 <= size <= Settings.SERVER_MAX_SIZE.value:
+            raise BadRequest(f"size must be between 16 and {Settings.SERVER_MAX_SIZE.value}")
+        hours = _int(query, "hours", Settings.HOURS.value[1])
+        if hours not in Settings.HOURS.value:
+            raise BadRequest("hours can only be 12 or 24")
+        preset = query.get("preset", Settings.PRESET.value)
+        if preset not in Preset.names():
+            raise BadRequest(f"preset can only be one of {Preset.names()}")
+        shadow = _int(query, "shadow", 127)
+        if not 0 <= shadow <= 255:
+            raise BadRequest("shadow must be between 0 and 255")
+
+        return location, size, hours, preset, shadow
+
+    def _create_renderer(self, options: tuple) -> _SharedRenderer:
+        location, size, hours, preset, shadow = options
+        if isinstance(location, tuple):
+            renderer = MoonClockRenderer.from_coords(
+                *location, size=size, hours=hours, preset=preset, dial_shadow_opacity=shadow
+            )
+        else:
+            renderer = MoonClockRenderer(
+                address=location,
+                size=size,
+                hours=hours,
+                preset=preset,
+                dial_shadow_opacity=shadow,
+                geocoder=self.geocoder,
+            )
+        # warm up: static layers and the ephemeris
+        renderer._prepare()
+        renderer._state(renderer.now())
+        return _SharedRenderer(renderer)
+
+    async def _renderer(self, options: tuple) -> _SharedRenderer:
+        future = self._renderers.get(options)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self.executor, self._create_renderer, options)
+            self._renderers[options] = future
+            while len(self._renderers) > self.max_renderers:
+                self._renderers.popitem(last=False)
+        else:
+            self._renderers.move_to_end(options)
+        try:
+            return await asyncio.shield(future)
+        except Exception:
+            self._renderers.pop(options, None)
+            raise
+
+    async def _entry(
+            self,
+            renderer: _SharedRenderer,
+            options: tuple,
+            encoder: Encoder,
+            now: datetime.datetime,
+    ) -> CacheEntry:
+        key = options, encoder.format
+        # the ephemeris may load or build a table for ``now``, off the event loop
+        loop = asyncio.get_running_loop()
+        state = await loop.run_in_executor(self.executor, renderer.state, now)
+
+        entry = self._cache.get(key)
+        if entry is not None and entry.state == state:
+            self._cache.move_to_end(key)
+            return entry
+
+        # concurrent requests for the same image wait for one render
+        pending = key + (state,)
+        future = self._pending.get(pending)
+        if future is None:
+            future = asyncio.ensure_future(self._render(renderer, encoder, key, state, now))
+            self._pending[pending] = future
+            future.add_done_callback(lambda _: self._pending.pop(pending, None))
+        return await asyncio.shield(future)
+
+    async def _render(
+            self,
+            renderer: _SharedRenderer,
+            encoder: Encoder,
+            key: tuple,
+            state: tuple,
+            now: datetime.datetime,
+    ) -> CacheEntry:
+        loop = asyncio.get_running_loop()
+        body = await loop.run_in_executor(self.executor, renderer.encode, now, encoder)
+        minute = now.replace(second=0, microsecond=0).astimezone(datetime.timezone.utc)
+        entry = CacheEntry(state, body, minute)
+
+        self._cache[key] = entry
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return entry
@@ -1,17 +1,30 @@
 import logging
+import os
 import pathlib
 import enum
+from typing import NamedTuple
 
 
 class Settings(enum.Enum):
     BASE_DIR = pathlib.Path(__file__).resolve().parent
     RESOURCES = BASE_DIR / "data"
+    CACHE_DIR = pathlib.Path(
+        os.environ.get(
+            "MOON_CLOCK_CACHE_DIR",
+            pathlib.Path(os.environ.get("XDG_CACHE_HOME", pathlib.Path.home() / ".cache")) / "moon-clock",
+        )
+    )
 
     GLOBAL_LOGGING_LEVEL = logging.DEBUG
 
     # INKY
     PIMORONI_SATURATION = 0.5  # Default: 0.5
     BUTTONS = [5, 6, 16, 24]
+    DITHERS = ["ordered", "diffusion", "none"]
+    DITHER = "diffusion"
+    DITHER_SPREAD = 160  # amplitude of the ordered dither threshold per channel (0-255)
+    PALETTE_LUT_BITS = 6  # bits per channel of the colour lookup table (2 ** 18 entries)
+    PALETTE_BACKGROUND = (255, 255, 255)  # behind transparent pixels
 
     # CLOCK
     ANTIALIAS = 4  # Warning: expensive calculation
@@ -20,10 +33,92 @@ class Settings(enum.Enum):
     CLOCK_UPDATE_INTERVAL = 15  # in minutes
     MOON_TEXTURE = RESOURCES / "img" / "moon_texture_small.png"
     HOURS = [12, 24]
+    LAYER_CACHE_SIZE = 8  # per layer type
+    FONT_CACHE_SIZE = 16
+
+    # GEOCODING
+    GEOCODER = "nominatim"
+    GAZETTEER = RESOURCES / "gazetteer" / "cities.tsv"
+    GEOCODE_MAX_TRIES = 5
+    GEOCODE_CACHE = CACHE_DIR / "geocode.sqlite3"
+    GEOCODE_CACHE_TTL = 60 * 60 * 24 * 90  # in seconds
+    GEOCODE_CACHE_MAX_ENTRIES = 4096
+
+    # TIMEZONES
+    TIMEZONE_QUANTIZATION = 0.001  # in degrees (~100 m)
+    TIMEZONE_CACHE_SIZE = 1024
+
+    # EPHEMERIS
+    EPHEMERIS_CACHE = CACHE_DIR / "ephemeris"
+    EPHEMERIS_SPAN = 366  # days per table
+    EPHEMERIS_MARGIN = 3  # days added on either side of a table
+    EPHEMERIS_PHASE_STEP = 60 * 60  # seconds between moon phase samples
+    EPHEMERIS_QUANTIZATION = 0.0001  # in degrees (~10 m)
+    EPHEMERIS_CACHE_SIZE = 32  # locations kept in memory
+
+    # BATCH
+    BATCH_QUEUE_PER_WORKER = 2  # frames in flight per worker process
+
+    # FRAMES
+    DIRTY_TILE_SIZE = 16  # changed rectangles are aligned to tiles of this many pixels
+    ANIMATION_FRAME_DURATION = 100  # in milliseconds
+
+    # TILES
+    TILE_BYTES_PER_PIXEL = 32  # working set of a tiled render per supersampled pixel (layers and temporaries)
+
+    # OUTPUT
+    PNG_COMPRESS_LEVEL = 6  # zlib level 0-9 (Pillow's default); 1 is ~3x faster for ~6% larger files
+    WEBP_QUALITY = 80
+    WEBP_METHOD = 4  # 0 (fast) - 6 (small)
+
+    # SERVER
+    SERVER_HOST = "127.0.0.1"
+    SERVER_PORT = 8448
+    SERVER_WORKERS = 4  # render threads
+    SERVER_RENDERERS = 16  # locations/options kept warm
+    SERVER_CACHE_SIZE = 64  # encoded responses kept in memory
+    SERVER_MAX_SIZE = 2048  # largest image size a request may ask for
 
     # MOON TEXTURE
     CONTRAST = 1
     BRIGHTNESS = 1.2
+    BLUR_SOFTNESS = 3.0  # soft terminator, standard deviation in output pixels
+    PHASE_MASKS = ["analytic", "drawn"]
+    TEXTURE_RESOLUTIONS = ["output", "supersampled"]
+    PRESET = "display"
+    TEXTURE_CACHE = CACHE_DIR / "textures"
+    TEXTURE_CACHE_SIZE = 4  # resolutions kept in memory
+    TEXTURE_CACHE_PERSIST_MAX_SIZE = 2048  # larger textures are not written to disk
 
     # TEXT
     DATE_FORMAT = ['%-d.%-m.%Y'][0]
+
+
+class Quality(NamedTuple):
+    antialias: int  # supersampling factor
+    resample: str  # PIL.Image.Resampling used for the final downscale
+    phase_mask: str  # one of Settings.PHASE_MASKS
+    texture_resolution: str  # one of Settings.TEXTURE_RESOLUTIONS, where moon texture and phase mask are applied
+
+
+class Preset(enum.Enum):
+    """
+    Named quality/performance trade-offs for the renderer.
+
+    draft: cheap, e.g. for e-ink panels or previews
+    display: the default look
+    print: expensive, for exports
+    """
+    DRAFT = Quality(antialias=2, resample="BOX", phase_mask="analytic", texture_resolution="output")
+    DISPLAY = Quality(antialias=Settings.ANTIALIAS.value, resample="LANCZOS", phase_mask="analytic", texture_resolution="output")
+    PRINT = Quality(antialias=8, resample="LANCZOS", phase_mask="analytic", texture_resolution="supersampled")
+
+    @classmethod
+    def get(cls, preset: [None, str, "Preset"] = None) -> "Preset":
+        if isinstance(preset, cls):
+            return preset
+        return cls[(preset or Settings.PRESET.value).upper()]
+
+    @classmethod
+    def names(cls) -> list[str]:
+        return [preset.name.lower() for preset in cls]
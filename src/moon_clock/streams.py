@@ -0,0 +1,320 @@
+"""
+Streaming output for frame sequences (time-lapses).
+
+Every writer takes one frame at a time and writes it out immediately,
+so memory stays constant however long the sequence is:
+
+- APNGWriter: animated PNG
+- WebPWriter: animated WebP
+- RawWriter: raw RGBA frames, e.g. piped into an external encoder
+
+from moon_clock import MoonClockRenderer
+from moon_clock.streams import open_writer
+renderer = MoonClockRenderer(address="Sydney")
+with open_writer("timelapse.webp") as writer:
+    for at, image in renderer.render_series(start, end, step):
+        writer.write(image)
+
+After the first frame, animated formats only store the bounding box of
+what changed since the previous frame.
+"""
+
+import io
+import logging
+import pathlib
+import struct
+import sys
+import zlib
+
+from PIL import Image, ImageChops
+
+from moon_clock.encoders import Encoder
+from moon_clock.exceptions import MoonClockException
+from moon_clock.settings import Settings
+
+
+LOG = logging.getLogger(__name__)
+
+
+class FrameWriter(object):
+    """
+    Base class: ``write()`` frames, then ``close()`` (or use it as a
+    context manager). Writers opened from a path own and close the file.
+    """
+
+    def __init__(self, fp):
+        if isinstance(fp, (str, pathlib.Path)):
+            self.fp = open(fp, "wb")
+            self._owns_fp = True
+        else:
+            self.fp = fp
+            self._owns_fp = False
+        self.frames = 0
+        self.size = None
+        self._previous = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _prepare(self, image: Image) -> Image:
+        if image.mode != "RGBA":
+            image = image.convert("RGBA")
+        if self.size is None:
+            self.size = image.size
+        elif image.size != self.size:
+            raise MoonClockException(f"Frame size {image.size} differs from {self.size}")
+        return image
+
+    def _changed_box(self, image: Image) -> tuple[int, int, int, int]:
+        """
+        Bounding box of what changed since the previous frame (never
+        empty; identical frames get a single pixel).
+        """
+        box = ImageChops.difference(self._previous, image).getbbox(alpha_only=False)
+        return box or (0, 0, 1, 1)
+
+    def write(self, image: Image) -> None:
+        image = self._prepare(image)
+        self._write(image)
+        self._previous = image
+        self.frames += 1
+
+    def _write(self, image: Image) -> None:
+        raise NotImplementedError
+
+    def _finish(self) -> None:
+        pass
+
+    def close(self) -> None:
+        if self.fp is None:
+            return
+        try:
+            self._finish()
+            self.fp.flush()
+        finally:
+            if self._owns_fp:
+                self.fp.close()
+            self.fp = None
+
+
+class RawWriter(FrameWriter):
+    """
+    Raw 8 bit RGBA, frame after frame, no header. For example:
+
+    moon-clock ... -f - | ffmpeg -f rawvideo -pix_fmt rgba -s 448x448 -r 25 -i - clock.mp4
+    """
+
+    def _write(self, image: Image) -> None:
+        self.fp.write(image.tobytes())
+
+
+def _png_chunks(data: bytes):
+    pos = 8  # signature
+    while pos < len(data):
+        length, kind = struct.unpack(">I4s", data[pos:pos + 8])
+        yield kind, data[pos + 8:pos + 8 + length]
+        pos += length + 12
+
+
+class APNGWriter(FrameWriter):
+    """
+    Animated PNG. The number of frames goes into the header: pass
+    ``frames`` if it is known up front, otherwise ``fp`` must be seekable
+    so it can be filled in on ``close()``.
+    """
+
+    def __init__(
+            self,
+            fp,
+            duration: [None, int] = None,
+            loop: int = 0,
+            frames: [None, int] = None,
+            compress_level: [None, int] = None,
+    ):
+        super().__init__(fp)
+        self.duration = Settings.ANIMATION_FRAME_DURATION.value if duration is None else duration
+        self.loop = loop
+        self.expected_frames = frames
+        self.compress_level = Settings.PNG_COMPRESS_LEVEL.value if compress_level is None else compress_level
+        self._sequence = 0
+        self._actl_offset = None
+
+        if frames is None and not self.fp.seekable():
+            raise MoonClockException("APNG to a non-seekable stream needs the number of frames up front")
+
+    def _chunk(self, kind: bytes, data: bytes) -> None:
+        self.fp.write(struct.pack(">I", len(data)) + kind + data)
+        self.fp.write(struct.pack(">I", zlib.crc32(kind + data) & 0xffffffff))
+
+    def _actl(self, frames: int) -> bytes:
+        return struct.pack(">II", frames, self.loop)
+
+    def _encode(self, image: Image) -> tuple[bytes, bytes]:
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG", compress_level=self.compress_level)
+        ihdr, idat = b"", []
+        for kind, data in _png_chunks(buffer.getvalue()):
+            if kind == b"IHDR":
+                ihdr = data
+            elif kind == b"IDAT":
+                idat.append(data)
+        return ihdr, b"".join(idat)
+
+    def _fctl(self, box: tuple[int, int, int, int]) -> None:
+        left, top, right, bottom = box
+        self._chunk(
+            b"fcTL",
+            struct.pack(
+                ">IIIIIHHBB",
+                self._sequence,
+                right - left,
+                bottom - top,
+                left,
+                top,
+                self.duration,
+                1000,
+                0,  # dispose: none
+                0,  # blend: source
+            ),
+        )
+        self._sequence += 1
+
+    def _write(self, image: Image) -> None:
+        if self._previous is None:
+            ihdr, idat = self._encode(image)
+            self.fp.write(b"\x89PNG\r\n\x1a\n")
+            self._chunk(b"IHDR", ihdr)
+            if self.expected_frames is None:
+                self._actl_offset = self.fp.tell()
+            self._chunk(b"acTL", self._actl(self.expected_frames or 0))
+            self._fctl((0, 0, *image.size))
+            self._chunk(b"IDAT", idat)
+            return
+
+        box = self._changed_box(image)
+        _, idat = self._encode(image.crop(box))
+        self._fctl(box)
+        self._chunk(b"fdAT", struct.pack(">I", self._sequence) + idat)
+        self._sequence += 1
+
+    def _finish(self) -> None:
+        if not self.frames:
+            return
+        self._chunk(b"IEND", b"")
+        if self._actl_offset is not None:
+            end = self.fp.tell()
+            self.fp.seek(self._actl_offset)
+            self._chunk(b"acTL", self._actl(self.frames))
+            self.fp.seek(end)
+        elif self.frames != self.expected_frames:
+            LOG.warning(f"APNG header announced {self.expected_frames} frames, {self.frames} were written")
+
+
+def _riff_chunks(data: bytes):
+    pos = 12  # RIFF header
+    while pos < len(data):
+        kind, length = struct.unpack("<4sI", data[pos:pos + 8])
+        yield kind, data[pos + 8:pos + 8 + length]
+        pos += 8 + length + (length & 1)
+
+
+def _u24(value: int) -> bytes:
+    return struct.pack("<I", value)[:3]
+
+
+class WebPWriter(FrameWriter):
+    """
+    Animated WebP. The RIFF header holds the file size, so ``fp`` must be
+    seekable.
+    """
+
+    def __init__(
+            self,
+            fp,
+            duration: [None, int] = None,
+            loop: int = 0,
+            lossless: bool = False,
+            quality: [None, int] = None,
+            method: [None, int] = None,
+    ):
+        super().__init__(fp)
+        if not self.fp.seekable():
+            raise MoonClockException("Animated WebP needs a seekable output")
+        self.duration = Settings.ANIMATION_FRAME_DURATION.value if duration is None else duration
+        self.loop = loop
+        self.lossless = lossless
+        self.quality = Settings.WEBP_QUALITY.value if quality is None else quality
+        self.method = Settings.WEBP_METHOD.value if method is None else method
+        self._start = None
+
+    def _chunk(self, kind: bytes, data: bytes) -> None:
+        self.fp.write(struct.pack("<4sI", kind, len(data)) + data)
+        if len(data) & 1:
+            self.fp.write(b"\0")
+
+    def _encode(self, image: Image) -> bytes:
+        buffer = io.BytesIO()
+        image.save(buffer, format="WEBP", lossless=self.lossless, quality=self.quality, method=self.method)
+        # the bitstream chunks (ALPH, VP8 or VP8L) make up the frame data
+        frame = io.BytesIO()
+        for kind, data in _riff_chunks(buffer.getvalue()):
+            if kind in (b"ALPH", b"VP8 ", b"VP8L"):
+                frame.write(struct.pack("<4sI", kind, len(data)) + data + (b"\0" if len(data) & 1 else b""))
+        return frame.getvalue()
+
+    def _write(self, image: Image) -> None:
+        if self._previous is None:
+            width, height = image.size
+            self._start = self.fp.tell()
+            self.fp.write(b"RIFF\0\0\0\0WEBP")
+            self._chunk(b"VP8X", bytes([0x10 | 0x02, 0, 0, 0]) + _u24(width - 1) + _u24(height - 1))  # alpha, animation
+            self._chunk(b"ANIM", struct.pack("<4BH", 0, 0, 0, 0, self.loop))
+            box = (0, 0, width, height)
+        else:
+            left, top, right, bottom = self._changed_box(image)
+            # frame offsets are stored halved
+            box = (left & ~1, top & ~1, right, bottom)
+
+        left, top, right, bottom = box
+        self._chunk(
+            b"ANMF",
+            _u24(left // 2) + _u24(top // 2)
+            + _u24(right - left - 1) + _u24(bottom - top - 1)
+            + _u24(self.duration)
+            + bytes([0x02])  # do not blend, no disposal
+            + self._encode(image.crop(box)),
+        )
+
+    def _finish(self) -> None:
+        if not self.frames:
+            return
+        end = self.fp.tell()
+        self.fp.seek(self._start + 4)
+        self.fp.write(struct.pack("<I", end - self._start - 8))
+        self.fp.seek(end)
+
+
+def open_writer(out, encoder: [None, Encoder] = None, **kwargs) -> FrameWriter:
+    """
+    Writer for ``out``: '-' streams raw RGBA to stdout, otherwise the
+    suffix picks the format ('.webp' or '.png'/'.apng'). The frames are
+    compressed with the options of ``encoder`` if given.
+    """
+    if str(out) == "-":
+        return RawWriter(sys.stdout.buffer)
+
+    suffix = pathlib.Path(out).suffix.lower()
+    if suffix == ".webp":
+        if encoder is not None:
+            kwargs.update(lossless=encoder.lossless, quality=encoder.quality, method=encoder.method)
+        return WebPWriter(out, **kwargs)
+    if suffix in (".png", ".apng"):
+        if encoder is not None:
+            kwargs.update(compress_level=encoder.compress_level)
+        return APNGWriter(out, **kwargs)
+    if suffix in (".rgba", ".raw"):
+        return RawWriter(out)
+    raise MoonClockException(f"Unknown animation format: {suffix} (use .webp, .png, .apng or '-')")
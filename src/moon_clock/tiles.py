@@ -0,0 +1,89 @@
+"""
+Tiled rendering of very large clocks with bounded memory.
+
+At ``size=4096`` the supersampled canvas of the display preset is 16384
+pixels square, 1 GiB per RGBA layer, and a full render holds several of
+them at once. A tiled render produces the output tile by tile instead:
+every tile draws its part of each layer (plus the margin the downscale
+filter reads) at the supersampled size and is downscaled on its own.
+Shapes, masks and the moon texture are positioned on the whole canvas,
+so the result is pixel for pixel that of a full render.
+
+from moon_clock import MoonClockRenderer
+renderer = MoonClockRenderer(address="Sydney", size=4096, max_memory=512 * 2 ** 20)
+renderer.render().save("poster.png")
+
+``max_memory`` bounds the working set of a tile; the output image
+(4 bytes per pixel) and the text masks come on top.
+"""
+
+import math
+from typing import Iterator
+
+from moon_clock.exceptions import MoonClockException
+from moon_clock.settings import Settings
+
+
+# half the width of the resampling filters in source pixels per output pixel
+SUPPORT = {
+    "NEAREST": 0.5,
+    "BOX": 0.5,
+    "BILINEAR": 1.0,
+    "HAMMING": 1.0,
+    "BICUBIC": 2.0,
+    "LANCZOS": 3.0,
+}
+
+# output tiles are multiples of this many pixels
+ALIGN = 16
+
+
+def margin(antialias: int, resample: str) -> int:
+    """
+    Supersampled pixels around a tile that the downscale reads.
+    """
+    return math.ceil(SUPPORT[resample] * antialias) + 1
+
+
+def working_set(side: int) -> int:
+    """
+    Bytes needed to render a supersampled region ``side`` pixels square.
+    """
+    return side * side * Settings.TILE_BYTES_PER_PIXEL.value
+
+
+def tile_size(size: int, antialias: int, resample: str, max_memory: int) -> [None, int]:
+    """
+    The largest output tile (a multiple of ALIGN) whose working set fits
+    ``max_memory`` bytes, None if a full render fits.
+    """
+    if working_set(size * antialias) <= max_memory:
+        return None
+    side = math.isqrt(max_memory // Settings.TILE_BYTES_PER_PIXEL.value)
+    tile = (side - 2 * margin(antialias, resample)) // antialias // ALIGN * ALIGN
+    if tile < ALIGN:
+        raise MoonClockException(
+            f"max_memory must be at least {working_set(ALIGN * antialias + 2 * margin(antialias, resample))} bytes"
+        )
+    return tile
+
+
+def boxes(size: int, tile: int) -> Iterator[tuple[int, int, int, int]]:
+    """
+    The output tiles (left, top, right, bottom), row by row.
+    """
+    for top in range(0, size, tile):
+        for left in range(0, size, tile):
+            yield left, top, min(left + tile, size), min(top + tile, size)
+
+
+def region(box: tuple[int, int, int, int], antialias: int, _margin: int, _size: int) -> tuple[int, int, int, int]:
+    """
+    The supersampled region an output ``box`` is downscaled from.
+    """
+    return (
+        max(box[0] * antialias - _margin, 0),
+        max(box[1] * antialias - _margin, 0),
+        min(box[2] * antialias + _margin, _size),
+        min(box[3] * antialias + _margin, _size),
+    )
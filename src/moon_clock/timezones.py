@@ -0,0 +1,74 @@
+"""
+Process-wide timezone resolution.
+
+Building a ``TimezoneFinder`` loads the timezone polygon data, so it is
+done at most once per process and shared by all renders. Lookups are
+memoized on coordinates quantized to ``Settings.TIMEZONE_QUANTIZATION``
+degrees, which makes repeated renders for the same (or a nearby) place
+free.
+
+from moon_clock import timezones
+timezones.warm()
+tz = timezones.zone_at(lat=-33.87, lng=151.21)
+"""
+
+import functools
+import logging
+import threading
+import zoneinfo
+
+from moon_clock.settings import Settings
+
+
+LOG = logging.getLogger(__name__)
+
+
+_finder = None
+_finder_lock = threading.Lock()
+
+
+def get_finder():
+    global _finder
+    if _finder is None:
+        with _finder_lock:
+            if _finder is None:
+                from timezonefinder import TimezoneFinder
+                LOG.debug("Loading timezone data")
+                _finder = TimezoneFinder()
+    return _finder
+
+
+def quantize(lat: float, lng: float) -> tuple[int, int]:
+    step = Settings.TIMEZONE_QUANTIZATION.value
+    return round(lat / step), round(lng / step)
+
+
+@functools.lru_cache(maxsize=Settings.TIMEZONE_CACHE_SIZE.value)
+def _timezone_at(q_lat: int, q_lng: int) -> [None, str]:
+    step = Settings.TIMEZONE_QUANTIZATION.value
+    return get_finder().timezone_at(lng=q_lng * step, lat=q_lat * step)
+
+
+def timezone_at(lat: float, lng: float) -> [None, str]:
+    return _timezone_at(*quantize(lat, lng))
+
+
+def zone_at(lat: float, lng: float) -> [None, zoneinfo.ZoneInfo]:
+    key = timezone_at(lat, lng)
+    if key is None:
+        return None
+    return zoneinfo.ZoneInfo(key=key)
+
+
+def warm(*coords: tuple[float, float]) -> None:
+    """
+    Load the timezone data now rather than on the first render and
+    optionally prime the memo cache for ``(lat, lng)`` pairs.
+    """
+    get_finder()
+    for lat, lng in coords:
+        timezone_at(lat, lng)
+
+
+def cache_clear() -> None:
+    _timezone_at.cache_clear()
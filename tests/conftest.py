@@ -1,10 +1,44 @@
 """
-    Dummy conftest.py for moon_clock.
-
-    If you don't know what this is for, just leave it empty.
-    Read more about conftest.py under:
-    - https://docs.pytest.org/en/stable/fixture.html
-    - https://docs.pytest.org/en/stable/writing_plugins.html
+Fixtures for all tests: the on-disk caches live in temporary directories.
 """
 
-# import pytest
+import collections
+
+import pytest
+
+from moon_clock import geocache
+from moon_clock.ephemeris import Ephemeris
+from moon_clock.images import TextureCache
+from moon_clock.settings import Settings
+
+
+def _use_cache_dir(monkeypatch, directory):
+    monkeypatch.setenv("MOON_CLOCK_CACHE_DIR", str(directory))  # subprocesses
+    monkeypatch.setattr(Settings.CACHE_DIR, "_value_", directory)
+    monkeypatch.setattr(Settings.TEXTURE_CACHE, "_value_", directory / "textures")
+    monkeypatch.setattr(Settings.EPHEMERIS_CACHE, "_value_", directory / "ephemeris")
+    monkeypatch.setattr(Settings.GEOCODE_CACHE, "_value_", directory / "geocode.sqlite3")
+    monkeypatch.setattr(TextureCache, "_shared", None)
+    monkeypatch.setattr(Ephemeris, "_shared", collections.OrderedDict())
+    monkeypatch.setattr(geocache, "_default", None)
+
+
+@pytest.fixture(scope="session", autouse=True)
+def session_cache_dir(tmp_path_factory):
+    # for fixtures with a wider scope than a test
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        directory = tmp_path_factory.mktemp("session_cache")
+        _use_cache_dir(monkeypatch, directory)
+        yield directory
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path_factory, monkeypatch):
+    """
+    Every test gets empty on-disk caches (textures, ephemeris tables,
+    geocoding results) instead of the user's ~/.cache/moon-clock, and
+    fresh process wide instances reading them.
+    """
+    directory = tmp_path_factory.mktemp("cache")
+    _use_cache_dir(monkeypatch, directory)
+    return directory
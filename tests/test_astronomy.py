@@ -0,0 +1,72 @@
+import datetime
+
+import numpy as np
+import pytest
+
+from moon_clock import astronomy
+
+__author__ = "Michael Mussato"
+__copyright__ = "Michael Mussato"
+__license__ = "MIT"
+
+
+RNG = np.random.default_rng(7)
+TS = np.floor(RNG.uniform(1.6e9, 1.9e9, 50))
+LAT = RNG.uniform(-60, 60, 50)
+LNG = RNG.uniform(-180, 180, 50)
+
+
+def local(ts: float) -> datetime.datetime:
+    # suncalc reads naive datetimes as machine local time
+    return datetime.datetime.fromtimestamp(ts)
+
+
+def test_positions_and_illumination():
+    suncalc = pytest.importorskip("suncalcPy.suncalc")
+    sun = astronomy.sun_position(TS, LAT, LNG)
+    moon = astronomy.moon_position(TS, LAT, LNG)
+    illumination = astronomy.moon_illumination(TS)
+    for i, (ts, lat, lng) in enumerate(zip(TS, LAT, LNG)):
+        expected = suncalc.getPosition(local(ts), lat, lng)
+        assert np.isclose(sun.altitude[i], expected["altitude"])
+        assert np.isclose(sun.azimuth[i], expected["azimuth"])
+
+        expected = suncalc.getMoonPosition(local(ts), lat, lng)
+        assert np.isclose(moon.altitude[i], expected["altitude"])
+        assert np.isclose(moon.azimuth[i], expected["azimuth"])
+        assert np.isclose(moon.distance[i], expected["distance"])
+
+        expected = suncalc.getMoonIllumination(local(ts))
+        assert np.isclose(illumination.fraction[i], expected["fraction"])
+        assert np.isclose(illumination.phase[i], expected["phase"])
+
+
+def test_sun_times():
+    suncalc = pytest.importorskip("suncalcPy.suncalc")
+    times = astronomy.sun_times(TS, LAT, LNG)
+    for i, (ts, lat, lng) in enumerate(zip(TS, LAT, LNG)):
+        expected = suncalc.getTimes(local(ts), lat, lng)
+        assert abs(times.rise[i] - expected["sunrise"].timestamp()) < 1
+        assert abs(times.set[i] - expected["sunset"].timestamp()) < 1
+
+
+def test_moon_times():
+    suncalc = pytest.importorskip("suncalcPy.suncalc")
+    midnights = np.array([local(ts).replace(hour=0, minute=0, second=0, microsecond=0).timestamp() for ts in TS])
+    times = astronomy.moon_times(midnights, LAT, LNG)
+    for i, (midnight, lat, lng) in enumerate(zip(midnights, LAT, LNG)):
+        expected = suncalc.getMoonTimes(local(midnight), lat, lng)
+        for key, value in (("rise", times.rise[i]), ("set", times.set[i])):
+            if key in expected:
+                # suncalc steps in wall clock hours, which differs on DST changes
+                assert abs(value - expected[key].timestamp()) < 10
+            else:
+                assert np.isnan(value)
+
+
+def test_polar():
+    # Longyearbyen: polar night in December, midnight sun in June
+    ts = astronomy.timestamps(np.array(["2024-12-21T12:00", "2024-06-21T12:00"], dtype="datetime64"))
+    times = astronomy.sun_times(ts, 78.2232, 15.6267)
+    assert np.isnan(times.rise).all() and np.isnan(times.set).all()
+    assert not np.isnan(times.noon).any()
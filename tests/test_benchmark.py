@@ -0,0 +1,40 @@
+from moon_clock import benchmark
+
+__author__ = "Michael Mussato"
+__copyright__ = "Michael Mussato"
+__license__ = "MIT"
+
+
+def test_render_cases():
+    names = [case["name"] for case in benchmark.render_cases()]
+    assert len(names) == len(set(names))
+    assert "size_448" in names and "blur" in names
+    assert {case["name"] for case in benchmark.render_cases(quick=True)} < set(names)
+
+
+def test_measure_render():
+    result = benchmark.measure_render({"name": "tiny", "options": {"size": 64, "hours": 12}}, repeat=1)
+    assert result["image_size"] == [64, 64]
+    assert result["get_clock_s"]["n"] == 1
+    assert result["render_s"]["min"] > 0
+    assert result["traced_peak_kib"] >= 0
+    assert "downscale" in result["stages_s"]
+
+
+def test_compare():
+    base = {
+        "render": [{"name": "a", "get_clock_s": {"median": 2.0}, "render_s": {"median": 1.0}, "traced_peak_kib": 10}],
+        "batch": [{"requested_workers": None, "frames_per_s": 4.0}],
+        "startup": {"python": {"min_s": 0.02}},
+    }
+    new = {
+        "render": [{"name": "a", "get_clock_s": {"median": 1.0}, "render_s": {"median": 1.0}, "traced_peak_kib": 20}],
+        "batch": [{"requested_workers": None, "frames_per_s": 8.0}],
+    }
+    ratios = {key: ratio for key, _, _, ratio in benchmark.compare(base, new)}
+    assert ratios == {
+        "render/a/get_clock_median_s": 0.5,
+        "render/a/render_median_s": 1.0,
+        "render/a/traced_peak_kib": 2.0,
+        "batch/workers_None/frames_per_s": 2.0,
+    }
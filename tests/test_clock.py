@@ -0,0 +1,87 @@
+import datetime
+import io
+
+import pytest
+from PIL import Image
+
+from moon_clock.clock import main, parse_step
+
+__author__ = "Michael Mussato"
+__copyright__ = "Michael Mussato"
+__license__ = "MIT"
+
+
+def test_parse_step():
+    assert parse_step("15m") == datetime.timedelta(minutes=15)
+    assert parse_step("1h30m") == datetime.timedelta(hours=1, minutes=30)
+    assert parse_step("1d") == datetime.timedelta(days=1)
+    for step in ("", "1", "h", "0h", "1y", "1h-"):
+        with pytest.raises(Exception):
+            parse_step(step)
+
+
+def test_main_series(tmp_path):
+    with pytest.raises(SystemExit) as e:
+        main(
+            [
+                "--lat", "-33.8688", "--lon", "151.2093",
+                "--start", "2019-01-01T00:00:00+11:00",
+                "--end", "2019-01-01T02:00:00+11:00",
+                "--step", "1h",
+                "-f", (tmp_path / "clock_%H%M.png").as_posix(),
+            ]
+        )
+    assert e.value.code == 0
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["clock_0000.png", "clock_0100.png", "clock_0200.png"]
+
+
+def test_main_animation(tmp_path):
+    with pytest.raises(SystemExit) as e:
+        main(
+            [
+                "--lat", "-33.8688", "--lon", "151.2093",
+                "--start", "2019-01-01T00:00:00+11:00",
+                "--end", "2019-01-01T02:00:00+11:00",
+                "-f", (tmp_path / "clock.webp").as_posix(),
+            ]
+        )
+    assert e.value.code == 0
+    assert Image.open(tmp_path / "clock.webp").n_frames == 3
+
+
+def test_main_stdout(capsysbinary):
+    with pytest.raises(SystemExit) as e:
+        main(
+            [
+                "--lat", "-33.8688", "--lon", "151.2093",
+                "--iso", "2019-01-01T00:00:00+11:00",
+                "--format", "webp", "--lossless",
+                "-f", "-",
+            ]
+        )
+    assert e.value.code == 0
+    assert Image.open(io.BytesIO(capsysbinary.readouterr().out)).format == "WEBP"
+
+
+def test_main_profile(tmp_path, capsys):
+    with pytest.raises(SystemExit) as e:
+        main(
+            [
+                "--lat", "-33.8688", "--lon", "151.2093",
+                "--iso", "2019-01-01T00:00:00+11:00",
+                "-f", (tmp_path / "clock.png").as_posix(),
+                "--profile",
+            ]
+        )
+    assert e.value.code == 0
+    lines = capsys.readouterr().err.splitlines()
+    assert lines[0].split() == ["stage", "calls", "ms", "Mpx"]
+    assert lines[-1].startswith("total")
+
+
+def test_main_unknown_address(tmp_path, caplog):
+    with pytest.raises(SystemExit) as e:
+        main(["-g", "gazetteer", "-a", "Atlantis", "-f", (tmp_path / "clock.png").as_posix()])
+    assert e.value.code == 1
+    assert "Address not found" in caplog.text
+    assert not (tmp_path / "clock.png").exists()
@@ -0,0 +1,69 @@
+import datetime
+import zoneinfo
+
+from PIL import Image
+
+from moon_clock import MoonClockRenderer
+from moon_clock.clock import parse_args
+from moon_clock.daemon import ClockDaemon, atomic_save, next_boundary
+
+__author__ = "Michael Mussato"
+__copyright__ = "Michael Mussato"
+__license__ = "MIT"
+
+
+SYDNEY = (-33.8688, 151.2093)
+
+
+def test_atomic_save(tmp_path):
+    path = tmp_path / "clock.png"
+    atomic_save(Image.new("RGBA", (8, 8), (255, 0, 0, 255)), path)
+    atomic_save(Image.new("RGBA", (8, 8), (0, 255, 0, 255)), path)
+    assert Image.open(path).getpixel((0, 0)) == (0, 255, 0, 255)
+    assert [p.name for p in tmp_path.iterdir()] == ["clock.png"]
+
+    atomic_save(Image.new("RGB", (8, 8)), tmp_path / "clock.webp")
+    assert Image.open(tmp_path / "clock.webp").format == "WEBP"
+
+
+def test_next_boundary():
+    tz = zoneinfo.ZoneInfo("Australia/Sydney")
+    now = datetime.datetime(2024, 11, 20, 22, 50, 30, tzinfo=tz)
+    assert next_boundary(now, datetime.timedelta(minutes=1)) == now.replace(minute=51, second=0)
+    assert next_boundary(now, datetime.timedelta(minutes=15)) == now.replace(hour=23, minute=0, second=0)
+    assert next_boundary(now.replace(minute=45, second=0), datetime.timedelta(minutes=15)) == now.replace(
+        hour=23, minute=0, second=0
+    )
+    # 7 minutes do not divide a day: restart at midnight
+    late = datetime.datetime(2024, 11, 20, 23, 58, tzinfo=tz)
+    assert next_boundary(late, datetime.timedelta(minutes=7)) == datetime.datetime(2024, 11, 21, tzinfo=tz)
+
+
+def test_update(tmp_path):
+    renderer = MoonClockRenderer.from_coords(*SYDNEY, size=64)
+    path = tmp_path / "clock.png"
+    clock_daemon = ClockDaemon(renderer, path)
+
+    assert clock_daemon.update("2024-11-20T22:50:00+11:00").rects
+    mtime = path.stat().st_mtime_ns
+    assert clock_daemon.update("2024-11-20T22:50:30+11:00").rects == []
+    assert path.stat().st_mtime_ns == mtime
+    assert clock_daemon.update("2024-11-20T22:51:00+11:00").rects
+
+    expected = renderer.render(at="2024-11-20T22:51:00+11:00")
+    assert Image.open(path).tobytes() == expected.tobytes()
+
+
+def test_run(tmp_path):
+    renderer = MoonClockRenderer.from_coords(*SYDNEY, size=64)
+    path = tmp_path / "clock.png"
+    ClockDaemon(renderer, path).run(updates=1)
+    assert path.exists()
+
+
+def test_parse_args_daemon(tmp_path):
+    args = parse_args(
+        ["--lat", "-33.8688", "--lon", "151.2093", "-f", (tmp_path / "clock.png").as_posix(), "--interval", "5"],
+        daemon=True,
+    )
+    assert args.interval == 5
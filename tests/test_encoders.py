@@ -0,0 +1,71 @@
+import io
+
+import pytest
+from PIL import Image
+
+from moon_clock import MoonClockRenderer
+from moon_clock.encoders import Encoder, encode
+from moon_clock.exceptions import MoonClockException
+
+__author__ = "Michael Mussato"
+__copyright__ = "Michael Mussato"
+__license__ = "MIT"
+
+
+SYDNEY = (-33.8688, 151.2093)
+AT = "2024-11-20T22:50:00+11:00"
+
+
+@pytest.fixture(scope="module")
+def image():
+    return MoonClockRenderer.from_coords(*SYDNEY, size=64).render(at=AT)
+
+
+def test_png(image):
+    fast = encode(image, "png", compress_level=1)
+    small = encode(image, "png", compress_level=9)
+    for data in (fast, small):
+        decoded = Image.open(io.BytesIO(data))
+        assert decoded.format == "PNG"
+        assert decoded.tobytes() == image.tobytes()
+    assert len(small) <= len(fast)
+
+
+def test_webp(image):
+    data = Encoder("webp", lossless=True).encode(image)
+    decoded = Image.open(io.BytesIO(data))
+    assert decoded.format == "WEBP"
+    # lossless, up to the colour of fully transparent pixels
+    black = Image.new("RGBA", image.size, (0, 0, 0, 255))
+    expected = Image.alpha_composite(black, image)
+    assert Image.alpha_composite(black, decoded.convert("RGBA")).tobytes() == expected.tobytes()
+
+
+def test_rgba_and_file_like(image, tmp_path):
+    assert encode(image, "rgba") == image.tobytes()
+
+    buffer = io.BytesIO()
+    Encoder("rgba").write(image.convert("RGB"), buffer)
+    assert len(buffer.getvalue()) == 64 * 64 * 4
+
+    Encoder.for_path(tmp_path / "clock.webp").save(image, tmp_path / "clock.webp")
+    assert Image.open(tmp_path / "clock.webp").format == "WEBP"
+
+
+def test_render_bytes():
+    renderer = MoonClockRenderer.from_coords(*SYDNEY, size=64)
+    data = renderer.render_bytes(at=AT, compress_level=1)
+    assert Image.open(io.BytesIO(data)).tobytes() == renderer.render(at=AT).tobytes()
+
+
+@pytest.mark.parametrize(
+    "format, options",
+    [
+        ("gif", {}),
+        ("png", {"compress_level": 10}),
+        ("webp", {"quality": 101}),
+    ],
+)
+def test_invalid(format, options):
+    with pytest.raises(MoonClockException):
+        Encoder(format, **options)
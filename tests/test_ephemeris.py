@@ -0,0 +1,80 @@
+import datetime
+import math
+import zoneinfo
+
+import pytest
+
+from moon_clock.ephemeris import Ephemeris, EphemerisTable
+
+__author__ = "Michael Mussato"
+__copyright__ = "Michael Mussato"
+__license__ = "MIT"
+
+
+SYDNEY = (-33.8688, 151.2093)
+TZ = zoneinfo.ZoneInfo("Australia/Sydney")
+
+
+def test_matches_suncalc(tmp_path):
+    suncalc = pytest.importorskip("suncalcPy.suncalc")
+    ephemeris = Ephemeris(*SYDNEY, directory=tmp_path, span=30)
+    for hours in range(0, 24 * 30, 7):
+        at = datetime.datetime(2024, 11, 1, tzinfo=TZ) + datetime.timedelta(hours=hours)
+        local = datetime.datetime.fromtimestamp(at.timestamp())  # what suncalc expects
+
+        times = suncalc.getTimes(local, *SYDNEY)
+        sunrise, sunset = ephemeris.sun(at)
+        assert sunrise.tzinfo == TZ
+        assert abs(sunrise.timestamp() - times["sunrise"].timestamp()) < 1
+        assert abs(sunset.timestamp() - times["sunset"].timestamp()) < 1
+
+        expected = suncalc.getMoonIllumination(local)["phase"]
+        difference = abs(ephemeris.phase(at) - expected)
+        assert min(difference, 1 - difference) < 1e-3
+
+
+def test_moon():
+    ephemeris = Ephemeris(*SYDNEY, span=30)
+    at = datetime.datetime(2024, 11, 20, 22, 50, tzinfo=TZ)
+    moonrise, moonset = ephemeris.moon(at)
+    assert moonrise < moonset
+    assert moonset > at - datetime.timedelta(hours=2)
+    assert moonset - moonrise < datetime.timedelta(days=1)
+
+
+def test_persisted(tmp_path):
+    at = datetime.datetime(2024, 11, 20, 22, 50, tzinfo=TZ)
+    expected = Ephemeris(*SYDNEY, directory=tmp_path, span=30).sun(at)
+    assert len(list(tmp_path.iterdir())) == 1
+
+    table = EphemerisTable.load(next(tmp_path.iterdir()))
+    assert table.sun_rise == sorted(table.sun_rise)
+    assert Ephemeris(*SYDNEY, directory=tmp_path, span=30).sun(at) == expected
+
+
+def test_polar_night():
+    # no sunrise or sunset in Longyearbyen in December
+    ephemeris = Ephemeris(78.2232, 15.6267, span=30)
+    at = datetime.datetime(2024, 12, 21, 12, tzinfo=datetime.timezone.utc)
+    assert ephemeris.sun(at) is None
+    assert not math.isnan(ephemeris.phase(at))
+
+
+def test_high_latitude_summer():
+    # the sun rises and sets in London in June (there is no astronomical night)
+    ephemeris = Ephemeris(51.5074, -0.1278, span=30)
+    at = datetime.datetime(2024, 6, 21, 12, tzinfo=zoneinfo.ZoneInfo("Europe/London"))
+    sunrise, sunset = ephemeris.sun(at)
+    assert sunrise.hour == 4 and sunset.hour == 21
+
+
+def test_shared(cache_dir):
+    at = datetime.datetime(2024, 11, 20, 22, 50, tzinfo=TZ)
+    ephemeris = Ephemeris.shared(*SYDNEY, tz=TZ)
+    assert Ephemeris.shared(SYDNEY[0] + 1e-5, SYDNEY[1], tz=TZ) is ephemeris  # same quantized location
+    expected = ephemeris.sun(at)
+
+    # persisted to Settings.EPHEMERIS_CACHE (a temporary directory, see conftest.py)
+    directory = cache_dir / "ephemeris"
+    assert ephemeris.directory == directory and len(list(directory.iterdir())) == 1
+    assert Ephemeris(*SYDNEY, tz=TZ, directory=directory).sun(at) == expected
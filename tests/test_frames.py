@@ -0,0 +1,46 @@
+import numpy as np
+from PIL import Image
+
+from moon_clock import MoonClockRenderer
+from moon_clock.frames import changed_rects
+
+__author__ = "Michael Mussato"
+__copyright__ = "Michael Mussato"
+__license__ = "MIT"
+
+
+SYDNEY = (-33.8688, 151.2093)
+
+
+def test_changed_rects():
+    a = Image.new("RGBA", (100, 60))
+    b = a.copy()
+    assert changed_rects(a, b, tile=16) == []
+    assert changed_rects(None, b, tile=16) == [(0, 0, 100, 60)]
+
+    b.putpixel((5, 5), (255, 0, 0, 255))
+    b.putpixel((20, 5), (255, 0, 0, 255))
+    b.putpixel((99, 59), (255, 0, 0, 255))
+    assert changed_rects(a, b, tile=16) == [(0, 0, 32, 16), (96, 48, 100, 60)]
+
+
+def test_render_frame():
+    renderer = MoonClockRenderer.from_coords(*SYDNEY, size=128)
+    first = renderer.render_frame(at="2024-11-20T22:50:00+11:00")
+    assert first.rects == [(0, 0, 128, 128)]
+
+    same = renderer.render_frame(at="2024-11-20T22:50:30+11:00", previous=first)
+    assert same.image is first.image
+    assert same.rects == []
+
+    second = renderer.render_frame(at="2024-11-20T22:51:00+11:00", previous=first)
+    assert second.image.tobytes() == renderer.render(at="2024-11-20T22:51:00+11:00").tobytes()
+    assert second.rects
+
+    # outside the changed rectangles the frames are identical
+    mask = np.ones((128, 128), dtype=bool)
+    for left, top, right, bottom in second.rects:
+        mask[top:bottom, left:right] = False
+    a = np.asarray(first.image)
+    b = np.asarray(second.image)
+    assert (a[mask] == b[mask]).all()
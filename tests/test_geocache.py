@@ -0,0 +1,41 @@
+from moon_clock.geocache import GeocodeCache, default_cache
+from moon_clock.geocoders import NominatimGeocoder
+
+__author__ = "Michael Mussato"
+__copyright__ = "Michael Mussato"
+__license__ = "MIT"
+
+
+def test_roundtrip(tmp_path):
+    cache = GeocodeCache(path=tmp_path / "geocode.sqlite3")
+    assert cache.get("Sydney") is None
+    cache.set("Sydney", -33.8688, 151.2093, "Sydney, NSW, Australia")
+    assert cache.get("Sydney") == (-33.8688, 151.2093, "Sydney, NSW, Australia")
+    # addresses are normalized
+    assert cache.get("  sydney ") == (-33.8688, 151.2093, "Sydney, NSW, Australia")
+    # shared between instances (and processes)
+    assert GeocodeCache(path=tmp_path / "geocode.sqlite3").get("SYDNEY") is not None
+
+
+def test_ttl(tmp_path):
+    cache = GeocodeCache(path=tmp_path / "geocode.sqlite3", ttl=0)
+    cache.set("Sydney", -33.8688, 151.2093)
+    assert cache.get("Sydney") is None
+
+
+def test_eviction(tmp_path):
+    cache = GeocodeCache(path=tmp_path / "geocode.sqlite3", max_entries=2)
+    cache.set("Sydney", -33.8688, 151.2093)
+    cache.set("Zurich", 47.3769, 8.5417)
+    assert cache.get("Sydney") is not None  # Zurich is now least recently used
+    cache.set("Tokyo", 35.6762, 139.6503)
+    assert cache.get("Zurich") is None
+    assert cache.get("Sydney") is not None
+    assert cache.get("Tokyo") is not None
+
+
+def test_default_cache(cache_dir):
+    # one cache (and database setup) for all geocoders
+    cache = NominatimGeocoder().cache
+    assert NominatimGeocoder().cache is cache is default_cache()
+    assert cache.path == cache_dir / "geocode.sqlite3"
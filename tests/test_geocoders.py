@@ -0,0 +1,43 @@
+import pytest
+
+from moon_clock.exceptions import AddressNotFound, MoonClockException
+from moon_clock.geocoders import FixedGeocoder, GazetteerGeocoder, get_geocoder
+
+__author__ = "Michael Mussato"
+__copyright__ = "Michael Mussato"
+__license__ = "MIT"
+
+
+def test_gazetteer():
+    geocoder = get_geocoder("gazetteer")
+    sydney = geocoder.geocode("Sydney")
+    assert sydney.latitude == pytest.approx(-33.87, abs=0.01)
+    assert sydney.longitude == pytest.approx(151.21, abs=0.01)
+    assert sydney.address == "Sydney, Australia"
+    # accents, case and whitespace are folded
+    assert geocoder.geocode("  zürich ").address == "Zurich, Switzerland"
+    assert geocoder.geocode("Sao Paulo").address == "São Paulo, Brazil"
+    # most populous wins unless a country is given
+    assert geocoder.geocode("London").address == "London, United Kingdom"
+    assert geocoder.geocode("London, CA").address == "London, Canada"
+    assert geocoder.geocode("london, canada").address == "London, Canada"
+    # prefix lookup
+    assert geocoder.geocode("Buenos").address == "Buenos Aires, Argentina"
+
+
+def test_gazetteer_not_found():
+    with pytest.raises(AddressNotFound):
+        GazetteerGeocoder().geocode("Atlantis")
+    with pytest.raises(AddressNotFound):
+        GazetteerGeocoder().geocode("Sydney, Switzerland")
+
+
+def test_fixed():
+    location = get_geocoder((47.3769, 8.5417)).geocode("ignored")
+    assert location == (47.3769, 8.5417, "47.3769, 8.5417")
+    assert FixedGeocoder(1, 2, address="Here").geocode(None).address == "Here"
+
+
+def test_unknown():
+    with pytest.raises(MoonClockException):
+        get_geocoder("nope")
@@ -0,0 +1,32 @@
+import concurrent.futures
+
+from moon_clock.images import TextureCache
+
+__author__ = "Michael Mussato"
+__copyright__ = "Michael Mussato"
+__license__ = "MIT"
+
+
+def test_texture_cache():
+    cache = TextureCache()
+    texture = cache.get(64)
+    assert texture.size == (64, 64)
+    assert texture.mode == "RGBA"
+    assert cache.get(64) is texture
+
+
+def test_texture_cache_persisted(tmp_path):
+    texture = TextureCache(directory=tmp_path).get(64)
+    assert len(list(tmp_path.glob("*.rgba"))) == 1
+    # a cold cache maps the file instead of decoding the PNG again
+    cold = TextureCache(directory=tmp_path)
+    mapped = cold.get(64)
+    assert cold._square is None
+    assert mapped.tobytes() == texture.tobytes()
+
+
+def test_texture_cache_shared(cache_dir):
+    with concurrent.futures.ThreadPoolExecutor(max_workers=8) as pool:
+        caches = list(pool.map(lambda _: TextureCache.shared(), range(32)))
+    assert all(cache is caches[0] for cache in caches)
+    assert caches[0].directory == cache_dir / "textures"
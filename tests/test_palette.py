@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from moon_clock import MoonClockRenderer
+from moon_clock.encoders import Encoder
+from moon_clock.exceptions import MoonClockException
+from moon_clock.palette import DESATURATED_PALETTE, PaletteQuantizer, inky_palette, lookup_table, pack
+
+__author__ = "Michael Mussato"
+__copyright__ = "Michael Mussato"
+__license__ = "MIT"
+
+
+def test_inky_palette():
+    assert inky_palette(0.0).tolist() == [list(colour) for colour in DESATURATED_PALETTE]
+    assert inky_palette(0.5)[4].tolist() == [205, 36, 37]  # red, as the Inky driver blends it
+
+
+def test_lookup_table():
+    palette = inky_palette()
+    lut = lookup_table(palette, bits=6)
+    for i, (r, g, b) in enumerate(palette.astype(int) >> 2):
+        assert lut[(r << 12) | (g << 6) | b] == i
+
+
+@pytest.mark.parametrize("dither", ["ordered", "diffusion", "none"])
+def test_quantize(dither):
+    quantizer = PaletteQuantizer(dither=dither)
+    palette = quantizer.palette
+
+    # black stays black, transparency becomes the (white) background
+    image = Image.new("RGBA", (40, 30), (0, 0, 0, 0))
+    image.paste((0, 0, 0, 255), (0, 0, 20, 30))
+    indices = quantizer.indices(image)
+    assert indices.shape == (30, 40)
+    assert (indices[:, :20] == 0).all()
+    assert (indices[:, 20:] == 1).all()
+
+    quantized = quantizer.quantize(image)
+    assert quantized.mode == "P"
+    assert quantized.convert("RGB").getpixel((0, 0)) == tuple(palette[0])
+
+
+@pytest.mark.parametrize("dither", ["ordered", "diffusion"])
+def test_dither_grey(dither):
+    # mid grey is not in the palette: dithering mixes black and white
+    palette = [(0, 0, 0), (255, 255, 255)]
+    indices = PaletteQuantizer(palette=palette, dither=dither).indices(Image.new("RGB", (64, 64), (128, 128, 128)))
+    assert 0.4 < indices.mean() < 0.6
+
+
+def test_pack():
+    assert pack(np.array([[1, 2], [3, 4], [5, 6]])) == bytes([0x12, 0x34, 0x56])
+    assert pack(np.array([6, 5, 4])) == bytes([0x65, 0x40])
+
+
+def test_encoder_index():
+    renderer = MoonClockRenderer.from_coords(-33.8688, 151.2093, size=64)
+    image = renderer.render(at="2024-11-20T22:50:00+11:00")
+    quantizer = PaletteQuantizer()
+    data = Encoder("index", quantizer=quantizer).encode(image)
+    assert len(data) == 64 * 64
+    assert max(data) < 7
+    assert data == quantizer.indices(image).tobytes()
+
+    with pytest.raises(MoonClockException):
+        Encoder("index")
@@ -0,0 +1,62 @@
+import math
+
+import numpy as np
+import pytest
+
+from moon_clock.phase import coverage_mask, erf, soft_terminator
+
+__author__ = "Michael Mussato"
+__copyright__ = "Michael Mussato"
+__license__ = "MIT"
+
+
+def test_erf():
+    x = np.linspace(-4, 4, 101)
+    assert erf(x) == pytest.approx([math.erf(v) for v in x], abs=2e-7)
+
+
+def test_soft_terminator_extremes():
+    full = np.asarray(soft_terminator(64, 1.0, 0))
+    new = np.asarray(soft_terminator(64, 0.0, 0))
+    assert full[32, 1:63].min() == 255
+    assert full[0, 0] == 0
+    assert new.max() == 0
+
+
+@pytest.mark.parametrize("phase", [0.25, 0.75, 1.25, 1.75])
+def test_soft_terminator_side(phase):
+    mask = np.asarray(soft_terminator(64, phase, 4)).astype(int)
+    row = mask[32]
+    # waxing moons are lit on the right, waning ones on the left
+    if phase < 1:
+        assert row[48] > row[16]
+        assert (np.diff(row[2:62]) >= 0).all()
+    else:
+        assert row[16] > row[48]
+        assert (np.diff(row[2:62]) <= 0).all()
+
+
+@pytest.mark.parametrize(
+    "phase, lit",
+    [
+        (0.0, 0.0),
+        (0.5, 0.5),
+        (1.0, 1.0),
+        (1.5, 0.5),
+        (2.0, 0.0),
+        # lit fraction of the disk is (1 - cos(phase * pi)) / 2
+        (0.25, (1 - math.cos(0.25 * math.pi)) / 2),
+        (1.75, (1 - math.cos(1.75 * math.pi)) / 2),
+    ]
+)
+def test_coverage_mask_area(phase, lit):
+    radius = 100
+    mask = np.asarray(coverage_mask(256, phase, radius=radius)) / 255
+    assert mask.sum() == pytest.approx(lit * math.pi * radius * radius, abs=radius)
+
+
+def test_coverage_mask_antialiased():
+    mask = np.asarray(coverage_mask(256, 0.75))
+    edge = ((mask > 0) & (mask < 255)).sum()
+    # a thin band of partially covered pixels along limb and terminator
+    assert 0 < edge < 4 * 256
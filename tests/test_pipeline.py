@@ -0,0 +1,70 @@
+import datetime
+
+import pytest
+
+from moon_clock import MoonClockRenderer
+from moon_clock.exceptions import MoonClockException
+from moon_clock.pipeline import Layer, Pipeline
+
+__author__ = "Michael Mussato"
+__copyright__ = "Michael Mussato"
+__license__ = "MIT"
+
+
+SYDNEY = (-33.8688, 151.2093)
+AT = datetime.datetime.fromisoformat("2024-11-20T22:50:00+11:00")
+
+
+def test_pipeline():
+    pipeline = Pipeline([
+        Layer("dial", ("size", "hours"), lambda size, hours: f"dial {size} {hours}"),
+        Layer("indicator", ("dial", "minute"), lambda dial, minute: f"{dial} {minute}", cache=False),
+    ])
+    inputs = {"size": 100, "hours": 24, "minute": 1}
+
+    assert pipeline.run("indicator", inputs) == "dial 100 24 1"
+    assert pipeline.drawn == ["dial", "indicator"]
+
+    assert pipeline.run("indicator", dict(inputs, minute=2)) == "dial 100 24 2"
+    assert pipeline.drawn == ["indicator"]
+
+    pipeline.run("dial", inputs)
+    assert pipeline.drawn == []
+
+    pipeline.run("indicator", dict(inputs, hours=12))
+    assert pipeline.drawn == ["dial", "indicator"]
+
+    pipeline.clear()
+    pipeline.run("dial", inputs)
+    assert pipeline.drawn == ["dial"]
+
+
+def test_pipeline_invalid():
+    with pytest.raises(MoonClockException):
+        Pipeline([Layer("dial", ("size", "seconds"), print)])
+    with pytest.raises(MoonClockException):
+        # layers can only depend on the layers before them
+        Pipeline([Layer("indicator", ("dial",), print), Layer("dial", ("size",), print)])
+    with pytest.raises(MoonClockException):
+        Pipeline([Layer("dial", ("size",), print), Layer("dial", ("hours",), print)])
+
+
+@pytest.mark.parametrize("preset", ["draft", "display"])
+def test_render_cached(preset):
+    renderer = MoonClockRenderer.from_coords(*SYDNEY, size=96, preset=preset)
+    pipeline = renderer._pipeline
+
+    renderer.render(AT)
+    assert {"mask", "dial", "text", "date_text", "phase_mask", "texture", "image"} <= set(pipeline.drawn)
+
+    # a minute later only the indicator and what is drawn on it
+    image = renderer.render(AT + datetime.timedelta(minutes=1))
+    assert "indicator" in pipeline.drawn
+    assert not {"mask", "dial", "text", "date_text", "texture"} & set(pipeline.drawn)
+
+    # the cached layers are not modified by a render
+    fresh = MoonClockRenderer.from_coords(*SYDNEY, size=96, preset=preset)
+    assert fresh.render(AT + datetime.timedelta(minutes=1)).tobytes() == image.tobytes()
+
+    renderer.render(AT + datetime.timedelta(days=1))
+    assert "date_text" in pipeline.drawn and "phase_mask" in pipeline.drawn
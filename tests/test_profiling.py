@@ -0,0 +1,62 @@
+import pytest
+from PIL import Image
+
+from moon_clock import MoonClockRenderer, profiling
+
+__author__ = "Michael Mussato"
+__copyright__ = "Michael Mussato"
+__license__ = "MIT"
+
+
+SYDNEY = (-33.8688, 151.2093)
+AT = "2024-11-20T22:50:00+11:00"
+
+
+def test_disabled():
+    with profiling.stage("dial") as timer:
+        timer.add(Image.new("L", (4, 4)))
+    assert timer is profiling.stage("text")  # the shared no-op
+
+
+def test_profile():
+    profile = profiling.Profile()
+    with profile.active():
+        with profiling.stage("arcs") as timer:
+            timer.add(Image.new("RGBA", (4, 4)), None)
+            with profiling.stage("ephemeris"):
+                pass
+        with profiling.stage("ephemeris") as timer:
+            timer.add(Image.new("L", (2, 3)))
+    assert [(s.name, s.pixels, s.depth) for s in profile.stages] == [
+        ("ephemeris", 0, 1),
+        ("arcs", 16, 0),
+        ("ephemeris", 6, 0),
+    ]
+    assert profile.pixels == 22
+    assert profile.seconds >= profile.stages[1].seconds >= profile.stages[0].seconds
+    assert [(name, calls) for name, (calls, _, _) in profile.totals().items()] == [("ephemeris", 2), ("arcs", 1)]
+    assert profile.format().splitlines()[-1].startswith("total")
+    assert profiling.stage("arcs") is profiling._DISABLED
+
+
+@pytest.mark.parametrize("preset", ["draft", "display"])
+def test_render_profiled(preset):
+    renderer = MoonClockRenderer.from_coords(*SYDNEY, size=96, preset=preset)
+    image, profile = renderer.render_profiled(at=AT)
+    assert image.tobytes() == MoonClockRenderer.from_coords(*SYDNEY, size=96, preset=preset).render(at=AT).tobytes()
+    names = set(profile.totals())
+    assert {"masks", "dial", "text", "composite", "phase_mask", "texture", "ephemeris", "arcs", "downscale"} <= names
+
+    # the static layers are prepared once
+    _, profile = renderer.render_profiled(at=AT)
+    assert "masks" not in profile.totals()
+    assert profile.totals()["downscale"][2] >= 96 * 96
+
+
+def test_profile_callback():
+    profiles = []
+    renderer = MoonClockRenderer.from_coords(*SYDNEY, size=64, preset="draft", profile_callback=profiles.append)
+    renderer.render(at=AT)
+    renderer.render_frame(at=AT)
+    assert len(profiles) == 2
+    assert all(isinstance(p, profiling.Profile) for p in profiles)
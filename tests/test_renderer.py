@@ -0,0 +1,150 @@
+import datetime
+import pathlib
+import zoneinfo
+
+import pytest
+from PIL import Image
+
+from moon_clock import MoonClock, MoonClockRenderer, layers, timezones
+from moon_clock.exceptions import MoonClockException
+from moon_clock.settings import Preset, Settings
+
+__author__ = "Michael Mussato"
+__copyright__ = "Michael Mussato"
+__license__ = "MIT"
+
+
+SYDNEY = (-33.8688, 151.2093)
+DATA = pathlib.Path(__file__).parent / "data"
+
+
+def test_render():
+    renderer = MoonClockRenderer.from_coords(*SYDNEY, size=128)
+    assert renderer.tz.key == "Australia/Sydney"
+    at = datetime.datetime(2024, 11, 20, 22, 50, tzinfo=renderer.tz)
+    image = renderer.render(at=at)
+    assert image.size == (128, 128)
+    assert image.mode == "RGBA"
+    assert renderer.render(at=at).tobytes() == image.tobytes()
+
+
+def test_matches_get_clock():
+    iso = "2024-11-20T22:50:00+11:00"
+    renderer = MoonClockRenderer(geocoder=SYDNEY, size=128, hours=12, draw_moon=False)
+    renderer.render(at="2024-11-21T03:00:00+11:00")  # a previous render must not leak into the next one
+    expected = MoonClock.get_clock(address=None, geocoder=SYDNEY, iso=iso, size=128, hours=12, draw_moon=False)
+    assert renderer.render(at=iso).tobytes() == expected.tobytes()
+
+
+def test_matches_baseline():
+    # The drawn phase mask is the original clock, pixel for pixel; the
+    # analytic mask of the presets differs at antialiased edges. The
+    # reference was rendered by the original MoonClock.get_clock (on a
+    # machine in Sydney's timezone, which it depended on), without sun and
+    # moon arcs: these are taken from the ephemeris now.
+    image = MoonClock.get_clock(
+        address=None, geocoder=SYDNEY, iso="2024-11-20T22:50:00+11:00", size=128,
+        draw_sun=False, draw_moon=False, phase_mask="drawn",
+    )
+    with Image.open(DATA / "baseline_128.png") as expected:
+        assert image.tobytes() == expected.convert("RGBA").tobytes()
+
+
+def test_unknown_address():
+    with pytest.raises(MoonClockException, match="Address not found"):
+        MoonClockRenderer(address="Atlantis", geocoder="gazetteer", size=64)
+
+
+def test_now():
+    renderer = MoonClockRenderer.from_coords(*SYDNEY, size=64)
+    assert renderer.now().tzinfo == zoneinfo.ZoneInfo("Australia/Sydney")
+
+
+def test_static_layers_shared():
+    layers.cache_clear()
+    at = "2024-11-20T22:50:00+11:00"
+    MoonClockRenderer.from_coords(*SYDNEY, size=64).render(at=at)
+    MoonClockRenderer.from_coords(*SYDNEY, size=64).render(at=at)
+    assert layers.dial.cache_info().misses == 1
+    assert layers.dial.cache_info().hits == 1
+    assert layers.background.cache_info().hits == 1
+
+
+@pytest.mark.parametrize("preset", Preset.names())
+def test_presets(preset):
+    renderer = MoonClockRenderer.from_coords(*SYDNEY, size=96, preset=preset)
+    assert renderer.antialias == Preset.get(preset).value.antialias
+    assert renderer.render(at="2024-11-20T22:50:00+11:00").size == (96, 96)
+
+
+def test_unknown_preset():
+    with pytest.raises(MoonClockException):
+        MoonClockRenderer.from_coords(*SYDNEY, size=96, preset="poster")
+
+
+def test_text_mask_bbox():
+    mask, (left, top) = layers.text_mask(1792, "MoonClock", Settings.CALLIGRAPHIC.value, 251, 0.536)
+    assert mask.mode == "L"
+    assert mask.width < 1792 and mask.height < 1792
+    assert top >= round(1792 * 0.536) - mask.height
+    assert mask.getbbox() is not None
+
+
+def test_render_series():
+    renderer = MoonClockRenderer.from_coords(*SYDNEY, size=64)
+    frames = list(renderer.render_series("2019-06-01T00:00", "2019-06-01T01:00", datetime.timedelta(minutes=30)))
+    assert [at.strftime("%H:%M") for at, _ in frames] == ["00:00", "00:30", "01:00"]
+    assert all(at.tzinfo == renderer.tz for at, _ in frames)
+    assert frames[1][1].tobytes() == renderer.render(at=frames[1][0]).tobytes()
+
+
+def test_render_series_interleaved():
+    # in-process series iterated together each render with their own renderer
+    args = ("2019-06-01T00:00", "2019-06-01T01:00", datetime.timedelta(minutes=30))
+    r24 = MoonClockRenderer.from_coords(*SYDNEY, size=64)
+    r12 = MoonClockRenderer.from_coords(*SYDNEY, size=64, hours=12)
+    for (at, image_24), (_, image_12) in zip(r24.render_series(*args), r12.render_series(*args)):
+        assert image_24.tobytes() == r24.render(at=at).tobytes()
+        assert image_12.tobytes() == r12.render(at=at).tobytes()
+
+
+def test_historical_moon_arc_is_deterministic(monkeypatch):
+    # the moon arc must follow the rendered timestamp, not the wall clock
+    renderer = MoonClockRenderer.from_coords(*SYDNEY, size=64, draw_sun=False, draw_moon_phase=False)
+    at = "2019-01-01T12:00:00+11:00"
+    expected = renderer.render(at=at).tobytes()
+
+    class Tomorrow(datetime.datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime.datetime.now(tz) + datetime.timedelta(days=1)
+
+        @classmethod
+        def today(cls):
+            return cls.now()
+
+    monkeypatch.setattr(datetime, "datetime", Tomorrow)
+    assert renderer.render(at=at).tobytes() == expected
+
+
+def test_render_series_workers():
+    renderer = MoonClockRenderer.from_coords(*SYDNEY, size=64)
+    args = ("2019-06-01T00:00", "2019-06-01T03:00", datetime.timedelta(hours=1))
+    serial = list(renderer.render_series(*args))
+    parallel = list(renderer.render_series(*args, workers=2))
+    assert [at for at, _ in parallel] == [at for at, _ in serial]
+    assert [image.tobytes() for _, image in parallel] == [image.tobytes() for _, image in serial]
+
+
+def test_save_series(tmp_path):
+    renderer = MoonClockRenderer.from_coords(*SYDNEY, size=64)
+    saved = list(renderer.save_series(tmp_path / "clock_%H.png", "2019-06-01T00:00", "2019-06-01T02:00", workers=2))
+    assert [path for _, path in saved] == [(tmp_path / f"clock_{h:02}.png").as_posix() for h in range(3)]
+    assert all((tmp_path / f"clock_{h:02}.png").exists() for h in range(3))
+
+
+def test_no_timezone(monkeypatch):
+    monkeypatch.setattr(timezones, "zone_at", lambda lat, lng: None)
+    renderer = MoonClockRenderer.from_coords(*SYDNEY, size=64)
+    assert renderer.tz is None
+    assert renderer.render(at="2024-11-20T22:50:00+11:00").size == (64, 64)
@@ -0,0 +1,141 @@
+import asyncio
+import io
+import urllib.error
+import urllib.request
+
+import pytest
+from PIL import Image
+
+from moon_clock import MoonClockRenderer
+from moon_clock.encoders import Encoder
+from moon_clock.geocoders import Geocoder, NominatimGeocoder
+from moon_clock.server import RenderServer
+
+__author__ = "Michael Mussato"
+__copyright__ = "Michael Mussato"
+__license__ = "MIT"
+
+
+SYDNEY = "lat=-33.8688&lon=151.2093&size=64"
+AT = "2024-11-20T22:50:00%2B11:00"
+
+
+def fetch(url, headers=None):
+    request = urllib.request.Request(url, headers=headers or {})
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, dict(response.headers), response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, dict(e.headers), e.read()
+
+
+def serve(*requests, geocoder=None):
+    """
+    Run a server on a free localhost port and fetch ``requests`` (path,
+    headers) one after the other.
+    """
+    async def run():
+        async with RenderServer(host="127.0.0.1", port=0, workers=2, geocoder=geocoder) as server:
+            loop = asyncio.get_running_loop()
+            results = []
+            for path, headers in requests:
+                url = f"http://127.0.0.1:{server.port}{path}"
+                results.append(await loop.run_in_executor(None, fetch, url, headers))
+            return server, results
+
+    return asyncio.run(run())
+
+
+def test_png_and_cache():
+    server, [(status, headers, body), (status_2, headers_2, body_2)] = serve(
+        (f"/clock.png?{SYDNEY}&at={AT}", None),
+        (f"/clock.png?{SYDNEY}&at={AT}", None),
+    )
+    assert status == 200
+    assert headers["Content-Type"] == "image/png"
+    assert headers["Last-Modified"] == "Wed, 20 Nov 2024 11:50:00 GMT"
+    assert Image.open(io.BytesIO(body)).size == (64, 64)
+    # served from the cache
+    assert (status_2, headers_2["ETag"], body_2) == (200, headers["ETag"], body)
+    assert len(server._cache) == 1 and len(server._renderers) == 1
+
+
+def test_conditional():
+    _, [(_, headers, _)] = serve((f"/clock.webp?{SYDNEY}&at={AT}", None))
+    assert headers["Content-Type"] == "image/webp"
+
+    _, results = serve(
+        (f"/clock.webp?{SYDNEY}&at={AT}", {"If-None-Match": headers["ETag"]}),
+        (f"/clock.webp?{SYDNEY}&at={AT}", {"If-Modified-Since": headers["Last-Modified"]}),
+        (f"/clock.webp?{SYDNEY}&at=2024-11-20T22:51:00%2B11:00", {"If-None-Match": headers["ETag"]}),
+    )
+    assert [status for status, _, _ in results] == [304, 304, 200]
+    assert results[0][2] == b""
+
+
+@pytest.mark.parametrize(
+    "path, status",
+    [
+        ("/clock.png", 400),
+        (f"/clock.png?{SYDNEY}&size=abc", 400),
+        (f"/clock.png?{SYDNEY}&hours=7", 400),
+        ("/clock.png?lat=-33.8688", 400),
+        (f"/clock.png?{SYDNEY}&at=yesterday", 400),
+        ("/clock.gif", 404),
+    ],
+)
+def test_errors(path, status):
+    _, [(code, _, body)] = serve((path, None))
+    assert code == status
+    assert body
+
+
+def test_unknown_address():
+    server, [(code, _, body)] = serve((f"/clock.png?address=Nowhere%20Special&at={AT}", None), geocoder="gazetteer")
+    assert code == 404
+    assert b"Address not found" in body
+    assert not server._renderers
+
+
+class UnavailableGeolocator(object):
+
+    def geocode(self, address):
+        from geopy.exc import GeocoderUnavailable
+        raise GeocoderUnavailable("Service unavailable")
+
+
+def test_geocoder_unavailable(monkeypatch):
+    monkeypatch.setattr(NominatimGeocoder, "_geolocator", UnavailableGeolocator())
+    server, [(code, _, body)] = serve((f"/clock.png?address=Sydney&at={AT}", None), geocoder="nominatim")
+    assert code == 502
+    assert b"Geocoding failed" in body
+    assert not server._renderers
+
+
+class BrokenGeocoder(Geocoder):
+
+    def geocode(self, address):
+        raise RuntimeError("bug")
+
+
+def test_renderer_error():
+    # not a geocoding failure
+    server, [(code, _, _)] = serve((f"/clock.png?address=Sydney&at={AT}", None), geocoder=BrokenGeocoder())
+    assert code == 500
+    assert not server._renderers
+
+
+def test_concurrent_minutes():
+    # one renderer, rendering different minutes on several threads
+    minutes = range(50, 58)
+
+    async def run():
+        async with RenderServer(host="127.0.0.1", port=0, workers=4) as server:
+            loop = asyncio.get_running_loop()
+            urls = [f"http://127.0.0.1:{server.port}/clock.png?{SYDNEY}&at=2024-11-20T22:{m}:00%2B11:00" for m in minutes]
+            return await asyncio.gather(*(loop.run_in_executor(None, fetch, url) for url in urls))
+
+    renderer = MoonClockRenderer.from_coords(-33.8688, 151.2093, size=64, dial_shadow_opacity=127)  # server defaults
+    for m, (status, _, body) in zip(minutes, asyncio.run(run())):
+        assert status == 200
+        assert body == Encoder("png").encode(renderer.render(at=f"2024-11-20T22:{m}:00+11:00"))
@@ -0,0 +1,42 @@
+import json
+import subprocess
+import sys
+
+import pytest
+
+__author__ = "Michael Mussato"
+__copyright__ = "Michael Mussato"
+__license__ = "MIT"
+
+
+# what keeps ``import moon_clock`` and the CLI's argument parsing fast: the
+# time itself is measured by the benchmark (``startup``), see benchmark.py
+HEAVY = ["PIL", "numpy", "geopy", "timezonefinder", "suncalc", "suncalcPy", "asyncio"]
+
+
+def run_python(code: str) -> str:
+    return subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+
+
+def loaded_after(code: str) -> list[str]:
+    stdout = run_python(f"{code}\nimport json, sys\nprint(json.dumps([m for m in {HEAVY!r} if m in sys.modules]))")
+    return json.loads(stdout)
+
+
+@pytest.mark.parametrize(
+    "code",
+    [
+        "import moon_clock",
+        "import moon_clock.clock",
+        "from moon_clock.clock import parse_args; parse_args(['-a', 'Sydney', '-f', 'clock.webp', '--lossless'])",
+    ],
+)
+def test_no_heavy_imports(code):
+    assert loaded_after(code) == []
+
+
+def test_lazy_attributes():
+    assert loaded_after("import moon_clock; moon_clock.MoonClockRenderer")[:2] == ["PIL", "numpy"]
+    stdout = run_python("import moon_clock; print(moon_clock.__version__)")
+    assert stdout.strip()
+
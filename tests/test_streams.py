@@ -0,0 +1,82 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+from moon_clock.exceptions import MoonClockException
+from moon_clock.streams import APNGWriter, RawWriter, WebPWriter, open_writer
+
+__author__ = "Michael Mussato"
+__copyright__ = "Michael Mussato"
+__license__ = "MIT"
+
+
+def frames(n=4, size=(40, 30)):
+    for i in range(n):
+        image = Image.new("RGBA", size, (0, 0, 64, 255))
+        ImageDraw.Draw(image).rectangle((i * 5, 3, i * 5 + 7, 11), fill=(255, 128, 0, 255))
+        yield image
+
+
+def read_back(data: bytes) -> list[np.ndarray]:
+    image = Image.open(io.BytesIO(data))
+    result = []
+    for i in range(image.n_frames):
+        image.seek(i)
+        result.append(np.asarray(image.convert("RGBA")))
+    return result
+
+
+@pytest.mark.parametrize("writer", [APNGWriter, lambda fp: WebPWriter(fp, lossless=True)])
+def test_animation_roundtrip(writer):
+    fp = io.BytesIO()
+    with writer(fp) as w:
+        for frame in frames():
+            w.write(frame)
+    decoded = read_back(fp.getvalue())
+    assert len(decoded) == 4
+    for frame, expected in zip(decoded, frames()):
+        assert (frame == np.asarray(expected)).all()
+
+
+def test_raw():
+    fp = io.BytesIO()
+    with RawWriter(fp) as w:
+        for frame in frames(3):
+            w.write(frame)
+    assert len(fp.getvalue()) == 3 * 40 * 30 * 4
+
+
+def test_frame_size_mismatch():
+    with pytest.raises(MoonClockException):
+        with RawWriter(io.BytesIO()) as w:
+            w.write(Image.new("RGBA", (4, 4)))
+            w.write(Image.new("RGBA", (5, 4)))
+
+
+class Pipe(io.BytesIO):
+    def seekable(self):
+        return False
+
+
+def test_non_seekable():
+    with pytest.raises(MoonClockException):
+        WebPWriter(Pipe())
+    with pytest.raises(MoonClockException):
+        APNGWriter(Pipe())
+
+    fp = Pipe()
+    with APNGWriter(fp, frames=4) as w:
+        for frame in frames():
+            w.write(frame)
+    assert len(read_back(fp.getvalue())) == 4
+
+
+def test_open_writer(tmp_path):
+    with open_writer(tmp_path / "a.webp") as w:
+        assert isinstance(w, WebPWriter)
+    with open_writer(tmp_path / "a.apng") as w:
+        assert isinstance(w, APNGWriter)
+    with pytest.raises(MoonClockException):
+        open_writer(tmp_path / "a.gif")
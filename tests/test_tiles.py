@@ -0,0 +1,66 @@
+import pytest
+
+from moon_clock import MoonClockRenderer, phase, tiles
+from moon_clock.exceptions import MoonClockException
+from moon_clock.images import TextureCache
+
+__author__ = "Michael Mussato"
+__copyright__ = "Michael Mussato"
+__license__ = "MIT"
+
+
+SYDNEY = (-33.8688, 151.2093)
+AT = "2024-11-20T22:50:00+11:00"
+
+
+def test_boxes():
+    boxes = list(tiles.boxes(100, 32))
+    assert len(boxes) == 16
+    assert boxes[0] == (0, 0, 32, 32) and boxes[-1] == (96, 96, 100, 100)
+    assert sum((r - l) * (b - t) for l, t, r, b in boxes) == 100 * 100
+
+
+def test_tile_size():
+    assert tiles.tile_size(448, 4, "LANCZOS", 2 ** 30) is None  # fits
+    tile = tiles.tile_size(4096, 4, "LANCZOS", 256 * 2 ** 20)
+    assert tile % tiles.ALIGN == 0
+    assert tiles.working_set(tile * 4 + 2 * tiles.margin(4, "LANCZOS")) <= 256 * 2 ** 20
+    with pytest.raises(MoonClockException):
+        tiles.tile_size(4096, 4, "LANCZOS", 1024)
+
+
+def test_region_masks():
+    box = (40, 8, 72, 50)
+    full = phase.coverage_mask(96, 0.7, 1.5)
+    assert phase.coverage_mask(96, 0.7, 1.5, box=box).tobytes() == full.crop(box).tobytes()
+    full = phase.soft_terminator(96, 1.3, 2.0)
+    assert phase.soft_terminator(96, 1.3, 2.0, box=box).tobytes() == full.crop(box).tobytes()
+
+    textures = TextureCache()
+    box = (100, 300, 260, 371)
+    assert textures.region(896, box).tobytes() == textures.get(896).crop(box).tobytes()
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        {"preset": "draft"},
+        {"preset": "display"},
+        {"preset": "print"},
+        {"phase_mask": "drawn"},
+        {"blur": True, "hours": 12, "mask_square": True},
+    ],
+)
+def test_tiled_matches_full(options):
+    full = MoonClockRenderer.from_coords(*SYDNEY, size=136, **options).render(at=AT)
+    tiled = MoonClockRenderer.from_coords(*SYDNEY, size=136, tile_size=48, **options)
+    assert tiled.render(at=AT).tobytes() == full.tobytes()
+    assert "mask" not in tiled._pipeline._cache  # no full size layers
+
+
+def test_max_memory():
+    renderer = MoonClockRenderer.from_coords(*SYDNEY, size=128, max_memory=2 ** 30)
+    assert renderer.tile_size is None
+    renderer = MoonClockRenderer.from_coords(*SYDNEY, size=128, max_memory=2 ** 20)
+    assert renderer.tile_size is not None and renderer.tile_size < 128
+    assert renderer.render(at=AT).size == (128, 128)
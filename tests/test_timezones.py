@@ -0,0 +1,22 @@
+from moon_clock import timezones
+
+__author__ = "Michael Mussato"
+__copyright__ = "Michael Mussato"
+__license__ = "MIT"
+
+
+def test_zone_at():
+    timezones.cache_clear()
+    timezones.warm()
+    assert timezones.timezone_at(lat=-33.8688, lng=151.2093) == "Australia/Sydney"
+    assert timezones.zone_at(lat=47.3769, lng=8.5417).key == "Europe/Zurich"
+
+
+def test_memoized():
+    timezones.cache_clear()
+    timezones.warm((-33.8688, 151.2093))
+    timezones.timezone_at(lat=-33.86881, lng=151.20931)  # same quantized cell
+    info = timezones._timezone_at.cache_info()
+    assert info.misses == 1
+    assert info.hits == 1
+    assert timezones.get_finder() is timezones.get_finder()